@@ -1,91 +1,242 @@
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
+from flask import Blueprint, Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, stream_with_context, current_app
+import sqlalchemy
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_principal import Principal, Permission, RoleNeed, identity_loaded, UserNeed
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_socketio import SocketIO, emit
+from werkzeug.security import generate_password_hash
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 import os
-import subprocess
-import git
-from datetime import datetime
-import requests
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///guardian.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Inicializar extensões
-db = SQLAlchemy(app)
+import io
+import hmac
+import threading
+import time
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from models import db, configure as configure_db, User, SystemConfig, Device, IPBlock, PhoneNumber, ChatMessage, UpdateJob, UPDATE_ACTIVE_STATUSES
+from ip_allocator import IPAllocator, PrefixConflict
+import bulk_import
+from chat_queue import MessageBatcher, create_client_manager
+from jobs import CommandRunner, JobAlreadyRunning
+from instrumentation import Instrumentation
+
+# Extensões sem aplicação: ligadas em create_app. Módulos com numpy (índice de
+# números, telemetria) só são importados no primeiro uso.
+bp = Blueprint('guardian', __name__)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'guardian.login'
 login_manager.login_message = 'Por favor, faça login para acessar esta página.'
 login_manager.login_message_category = 'info'
+principal = Principal()
+socketio = SocketIO()
+
+# Métricas por rota/SQL e profiler por amostragem (opcionais: GUARDIAN_METRICS=1)
+instrumentation = Instrumentation.from_env('guardian')
+if instrumentation is not None:
+    instrumentation.instrument_engine(sqlalchemy.engine.Engine)
 
-principal = Principal(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Aplicação usada pelas tarefas em segundo plano (jobs, lotes do chat), fora de requisições
+_background_app = None
+
+def create_app(config=None):
+    """Aplicação com as extensões e rotas registradas; `config` sobrescreve o ambiente"""
+    global _background_app
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    app.config.update(config or {})
+    configure_db(app)
+    login_manager.init_app(app)
+    principal.init_app(app)
+    # Com SOCKETIO_MESSAGE_QUEUE (redis://... ou local://...) vários workers compartilham as salas
+    socketio.init_app(app, cors_allowed_origins="*", **create_client_manager(
+        os.environ.get('SOCKETIO_MESSAGE_QUEUE'), os.environ.get('SOCKETIO_CHANNEL', 'guardian-socketio')
+    ))
+    if instrumentation is not None:
+        instrumentation.init_app(app)
+    identity_loaded.connect_via(app)(on_identity_loaded)
+    app.register_blueprint(bp)
+    _background_app = app
+    return app
 
 # Permissões
 admin_permission = Permission(RoleNeed('admin'))
 super_admin_permission = Permission(RoleNeed('super_admin'))
 
-# Modelos
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    role = db.Column(db.String(50), default='user')
-    status = db.Column(db.String(20), default='pending')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    approved_at = db.Column(db.DateTime)
-    approved_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-class SystemConfig(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    key = db.Column(db.String(100), unique=True, nullable=False)
-    value = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class Device(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    ip_address = db.Column(db.String(15), nullable=False)
-    mac_address = db.Column(db.String(17))
-    device_type = db.Column(db.String(50))
-    status = db.Column(db.String(20), default='active')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class IPBlock(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    network = db.Column(db.String(18), nullable=False)  # CIDR
-    gateway = db.Column(db.String(15))
-    client_name = db.Column(db.String(100))
-    allocated_network = db.Column(db.String(18))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class PhoneNumber(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    client_name = db.Column(db.String(100), nullable=False)
-    number = db.Column(db.String(20), nullable=False, unique=True)
-    portability_status = db.Column(db.String(20), default='jbm_line')
-    provider = db.Column(db.String(50), default='tsinfo')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+# Cache de usuários: evita uma consulta ao banco por requisição e por evento de socket.
+# Alterações no User (aprovação, papel, senha) invalidam a entrada neste processo;
+# nos demais workers a entrada expira em USER_CACHE_TTL segundos.
+# Guarda só os valores das colunas: cada requisição recebe a sua instância transitória,
+# sem objeto ORM compartilhado entre threads/greenlets.
+class UserCache:
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _snapshot(obj):
+        mapper = sqlalchemy.inspect(obj).mapper
+        return mapper.class_, {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+
+    def get(self, user_id, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                cls, values = entry[1]
+                return cls(**values)
+            self.stats['misses'] += 1
+        user = loader(user_id)
+        if user is None or self.ttl <= 0:
+            return user
+        cls, values = self._snapshot(user)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, (cls, values))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cls(**values)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self.stats['invalidations'] += 1
+
+user_cache = UserCache(float(os.environ.get('USER_CACHE_TTL', '30')))
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+# Cache das configurações: carregado uma vez por processo e recarregado só quando a
+# versão (linha CONFIG_VERSION_KEY, trocada a cada save_config) muda. A versão é
+# conferida no banco no máximo a cada CONFIG_CHECK_INTERVAL segundos.
+CONFIG_VERSION_KEY = '_config_version'
+CONFIG_TRUE_VALUES = ('1', 'true', 'yes', 'on', 'sim')
+
+class ConfigCache:
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'loads': 0, 'checks': 0}
+
+    def _current_version(self):
+        return db.session.execute(
+            db.select(SystemConfig.value).where(SystemConfig.key == CONFIG_VERSION_KEY)
+        ).scalar()
+
+    def _load(self):
+        rows = db.session.execute(db.select(SystemConfig.key, SystemConfig.value)).all()
+        values = {key: value for key, value in rows}
+        self._version = values.pop(CONFIG_VERSION_KEY, None)
+        self._values = values
+        self._checked_at = time.monotonic()
+        self.stats['loads'] += 1
+
+    def _fresh(self):
+        with self._lock:
+            if self._values is None:
+                self._load()
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                self.stats['checks'] += 1
+                self._checked_at = time.monotonic()
+                if self._current_version() != self._version:
+                    self._load()
+            return self._values
+
+    def all(self):
+        return dict(self._fresh())
+
+    def get(self, key, default=None):
+        return self._fresh().get(key, default)
+
+    def get_int(self, key, default=0):
+        try:
+            return int(self.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    def get_float(self, key, default=0.0):
+        try:
+            return float(self.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key, default=False):
+        value = self.get(key)
+        if value is None or value == '':
+            return default
+        return value.strip().lower() in CONFIG_TRUE_VALUES
+
+    def get_json(self, key, default=None):
+        try:
+            return json.loads(self.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    def save(self, values):
+        """Grava todas as chaves em um único upsert e troca a versão na mesma transação"""
+        now = datetime.utcnow()
+        version = str(time.time_ns())
+        rows = [{'key': key, 'value': value, 'created_at': now, 'updated_at': now}
+                for key, value in {**values, CONFIG_VERSION_KEY: version}.items()]
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            statement = insert(SystemConfig).values(rows)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[SystemConfig.key],
+                set_={'value': statement.excluded.value, 'updated_at': statement.excluded.updated_at}
+            ))
+        else:
+            existing = dict(db.session.execute(
+                db.select(SystemConfig.key, SystemConfig.id).where(SystemConfig.key.in_([row['key'] for row in rows]))
+            ).all())
+            updates = [{'id': existing[row['key']], 'value': row['value'], 'updated_at': now}
+                       for row in rows if row['key'] in existing]
+            inserts = [row for row in rows if row['key'] not in existing]
+            if updates:
+                # UPDATE em lote pela chave primária (executemany)
+                db.session.execute(db.update(SystemConfig), updates)
+            if inserts:
+                db.session.execute(db.insert(SystemConfig), inserts)
+        db.session.commit()
+        with self._lock:
+            if self._values is not None:
+                self._values.update(values)
+                self._version = version
+                self._checked_at = time.monotonic()
+
+config_cache = ConfigCache(float(os.environ.get('CONFIG_CHECK_INTERVAL', '5')))
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), lambda key: db.session.get(User, key))
+
+def run_blocking(func, *args):
+    """Executa trabalho pesado de CPU (hash de senha) fora da greenlet que serve as requisições"""
+    if socketio.async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(func, *args)
+    if socketio.async_mode == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
 
-@identity_loaded.connect_via(app)
 def on_identity_loaded(sender, identity):
     identity.user = current_user
     if hasattr(current_user, 'id'):
@@ -94,25 +245,25 @@ def on_identity_loaded(sender, identity):
         identity.provides.add(RoleNeed(current_user.role))
 
 # Rotas principais
-@app.route('/')
+@bp.route('/')
 def index():
     if current_user.is_authenticated:
         if current_user.status != 'approved':
             return render_template('pending_approval.html')
         return render_template('dashboard.html')
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
+        if user and run_blocking(user.check_password, password):
             if user.status == 'approved':
                 login_user(user, remember=True)
-                return redirect(url_for('index'))
+                return redirect(url_for('.index'))
             else:
                 flash('Sua conta está pendente de aprovação.', 'warning')
         else:
@@ -120,7 +271,7 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         email = request.form['email']
@@ -131,182 +282,836 @@ def register():
             return render_template('register.html')
         
         user = User(email=email)
-        user.set_password(password)
+        user.password_hash = run_blocking(generate_password_hash, password)
         db.session.add(user)
         db.session.commit()
         
         flash('Conta criada! Aguarde aprovação do administrador.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     return render_template('register.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/admin/users')
+@bp.route('/admin/users')
 @login_required
 def admin_users():
     if current_user.role not in ['admin', 'super_admin']:
         flash('Acesso negado.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     users = User.query.all()
     return render_template('admin_users.html', users=users)
 
-@app.route('/admin/approve_user/<int:user_id>')
+@bp.route('/admin/approve_user/<int:user_id>')
 @login_required
 def approve_user(user_id):
     if current_user.role not in ['admin', 'super_admin']:
         return jsonify({'error': 'Acesso negado'}), 403
     
     user = User.query.get_or_404(user_id)
+    # ?tenant=<organização>: define a organização do usuário (salas de chat compartilhadas)
+    tenant = (request.values.get('tenant') or '').strip()
+    if tenant:
+        user.tenant = tenant[:100]
     user.status = 'approved'
     user.approved_at = datetime.utcnow()
     user.approved_by = current_user.id
     db.session.commit()
     
     flash(f'Usuário {user.email} aprovado com sucesso!', 'success')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('.admin_users'))
 
-@app.route('/config')
+@bp.route('/config')
 @login_required
 def config():
     if current_user.role != 'super_admin':
         flash('Acesso negado.', 'error')
-        return redirect(url_for('index'))
-    
-    configs = {}
-    config_items = SystemConfig.query.all()
-    for item in config_items:
-        configs[item.key] = item.value
+        return redirect(url_for('.index'))
     
-    return render_template('config.html', configs=configs)
+    return render_template('config.html', configs=config_cache.all())
+
+# Atualização do sistema em segundo plano (saída transmitida pela sala job:<id>)
+UPDATE_SCRIPT = os.environ.get('UPDATE_SCRIPT', '/opt/guardian-voip-v3/update.sh')
+UPDATE_TIMEOUT = int(os.environ.get('UPDATE_TIMEOUT', '300'))
+
+def persist_job_output(job_id, text):
+    """Anexa um bloco de log sem reler a coluna"""
+    with _background_app.app_context():
+        db.session.execute(
+            db.update(UpdateJob).where(UpdateJob.id == job_id)
+            .values(output=db.func.coalesce(UpdateJob.output, '') + text)
+        )
+        db.session.commit()
+
+def persist_job_status(job_id, status, return_code=None):
+    values = {'status': status, 'return_code': return_code}
+    if status not in UPDATE_ACTIVE_STATUSES:
+        values['finished_at'] = datetime.utcnow()
+    with _background_app.app_context():
+        db.session.execute(db.update(UpdateJob).where(UpdateJob.id == job_id).values(**values))
+        db.session.commit()
 
-@app.route('/api/update_system', methods=['POST'])
+update_runner = CommandRunner(socketio, persist_output=persist_job_output, persist_status=persist_job_status,
+                              timeout=UPDATE_TIMEOUT)
+
+def active_update_job():
+    """Job em andamento em qualquer worker; jobs abandonados (worker reiniciado) são encerrados"""
+    stale = datetime.utcnow() - timedelta(seconds=UPDATE_TIMEOUT + 60)
+    db.session.execute(
+        db.update(UpdateJob)
+        .where(UpdateJob.status.in_(UPDATE_ACTIVE_STATUSES), UpdateJob.created_at < stale)
+        .values(status='interrupted', finished_at=datetime.utcnow())
+    )
+    return UpdateJob.query.filter(UpdateJob.status.in_(UPDATE_ACTIVE_STATUSES)).first()
+
+@bp.route('/api/update_system', methods=['POST'])
 @login_required
 def update_system():
     if current_user.role != 'super_admin':
         return jsonify({'error': 'Acesso negado'}), 403
     
+    running = active_update_job()
+    if running is not None:
+        db.session.commit()
+        return jsonify({'error': 'Atualização já em andamento', 'job_id': running.id}), 409
+    
+    job = UpdateJob(command=UPDATE_SCRIPT, started_by=current_user.id)
+    db.session.add(job)
     try:
-        # Executar script de atualização
-        result = subprocess.run(['/opt/guardian-voip-v3/update.sh'], 
-                              capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True, 
-                'message': 'Sistema atualizado com sucesso!',
-                'output': result.stdout
-            })
-        else:
-            return jsonify({
-                'success': False, 
-                'message': 'Erro na atualização',
-                'error': result.stderr
-            }), 500
-            
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            'success': False, 
-            'message': 'Timeout na atualização'
-        }), 500
-    except Exception as e:
-        return jsonify({
-            'success': False, 
-            'message': f'Erro: {str(e)}'
-        }), 500
+        db.session.commit()
+    except sqlalchemy.exc.IntegrityError:
+        # Outro worker criou um job ativo entre a consulta e o INSERT (índice uq_update_job_active)
+        db.session.rollback()
+        running = UpdateJob.query.filter(UpdateJob.status.in_(UPDATE_ACTIVE_STATUSES)).first()
+        return jsonify({'error': 'Atualização já em andamento', 'job_id': running.id if running else None}), 409
+    try:
+        update_runner.start(job.id, [UPDATE_SCRIPT])
+    except JobAlreadyRunning as e:
+        db.session.delete(job)
+        db.session.commit()
+        return jsonify({'error': 'Atualização já em andamento', 'job_id': e.job_id}), 409
+    
+    return jsonify({
+        'success': True,
+        'message': 'Atualização iniciada',
+        'job_id': job.id,
+        'room': update_runner.room(job.id)
+    }), 202
 
-@app.route('/api/config', methods=['POST'])
+@bp.route('/api/update_system/<job_id>')
+@login_required
+def update_system_status(job_id):
+    if current_user.role != 'super_admin':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    job = db.get_or_404(UpdateJob, job_id)
+    # offset: caracteres do log já recebidos pelo cliente (polling incremental)
+    return jsonify(job.to_dict(offset=max(request.args.get('offset', 0, type=int), 0)))
+
+@bp.route('/api/config', methods=['POST'])
 @login_required
 def save_config():
     if current_user.role != 'super_admin':
         return jsonify({'error': 'Acesso negado'}), 403
     
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corpo JSON deve ser um objeto'}), 400
+    if any(not key or len(key) > 100 or key == CONFIG_VERSION_KEY for key in data):
+        return jsonify({'error': 'Chave de configuração inválida'}), 400
     
-    for key, value in data.items():
-        config = SystemConfig.query.filter_by(key=key).first()
-        if config:
-            config.value = value
-            config.updated_at = datetime.utcnow()
-        else:
-            config = SystemConfig(key=key, value=value)
-            db.session.add(config)
-    
-    db.session.commit()
+    values = {
+        key: value if isinstance(value, str) or value is None else json.dumps(value)
+        for key, value in data.items()
+    }
+    if values:
+        config_cache.save(values)
     return jsonify({'success': True, 'message': 'Configurações salvas!'})
 
+# Paginação por cursor (keyset) e streaming NDJSON
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+
+def _list_query(model, filter_fields):
+    """Monta a consulta filtrada a partir dos parâmetros da requisição"""
+    query = model.query
+    for field in filter_fields:
+        value = request.args.get(field)
+        if value:
+            query = query.filter(getattr(model, field) == value)
+    return query.order_by(model.id)
+
+def _paginated_response(model, filter_fields):
+    """Responde com uma página (cursor = último id) ou com o stream NDJSON completo"""
+    query = _list_query(model, filter_fields)
+
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            for row in query.yield_per(STREAM_BATCH_SIZE):
+                yield json.dumps(row.to_dict()) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        cursor = int(request.args.get('cursor', 0))
+    except ValueError:
+        return jsonify({'error': 'Parâmetros limit/cursor inválidos'}), 400
+    if limit < 1:
+        return jsonify({'error': 'Parâmetros limit/cursor inválidos'}), 400
+
+    # Busca um registro a mais para saber se existe próxima página
+    rows = query.filter(model.id > cursor).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return jsonify({
+        'items': [row.to_dict() for row in rows],
+        'next_cursor': rows[-1].id if has_more else None
+    })
+
 # APIs para Guardian VoIP
-@app.route('/api/devices')
+@bp.route('/api/devices')
 @login_required
 def get_devices():
     if current_user.status != 'approved':
         return jsonify({'error': 'Acesso negado'}), 403
     
-    devices = Device.query.all()
-    return jsonify([{
-        'id': d.id,
-        'name': d.name,
-        'ip_address': d.ip_address,
-        'mac_address': d.mac_address,
-        'device_type': d.device_type,
-        'status': d.status,
-        'created_at': d.created_at.isoformat()
-    } for d in devices])
-
-@app.route('/api/ip_blocks')
+    return _paginated_response(Device, ['status', 'device_type'])
+
+@bp.route('/api/ip_blocks')
 @login_required
 def get_ip_blocks():
     if current_user.status != 'approved':
         return jsonify({'error': 'Acesso negado'}), 403
     
-    blocks = IPBlock.query.all()
-    return jsonify([{
-        'id': b.id,
-        'name': b.name,
-        'network': b.network,
-        'gateway': b.gateway,
-        'client_name': b.client_name,
-        'allocated_network': b.allocated_network,
-        'created_at': b.created_at.isoformat()
-    } for b in blocks])
-
-@app.route('/api/phone_numbers')
+    return _paginated_response(IPBlock, ['client_name'])
+
+@bp.route('/api/phone_numbers')
 @login_required
 def get_phone_numbers():
     if current_user.status != 'approved':
         return jsonify({'error': 'Acesso negado'}), 403
     
-    numbers = PhoneNumber.query.all()
-    return jsonify([{
-        'id': n.id,
-        'client_name': n.client_name,
-        'number': n.number,
-        'portability_status': n.portability_status,
-        'provider': n.provider,
-        'created_at': n.created_at.isoformat()
-    } for n in numbers])
+    return _paginated_response(PhoneNumber, ['client_name', 'portability_status', 'provider'])
+
+# Importação/exportação em lote (bulk_import.run_bulk_import / iter_bulk_export)
+def _bulk_endpoint(target):
+    if request.method == 'GET':
+        if current_user.status != 'approved':
+            return jsonify({'error': 'Acesso negado'}), 403
+        fmt = request.args.get('format', 'csv')
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({'error': 'Formato não suportado'}), 400
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(bulk_import.iter_bulk_export(target, fmt)), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename={target}.{fmt}'})
+    
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    upload = request.files.get('file')
+    if upload is not None:
+        raw, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        raw, filename, content_type = request.stream, None, request.mimetype
+    fmt = request.args.get('format') or bulk_import.detect_format(filename, content_type)
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Formato não suportado'}), 400
+    
+    stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    report = bulk_import.run_bulk_import(target, stream, fmt, request.args.get('country_code'))
+    return jsonify(report)
+
+@bp.route('/api/phone_numbers/bulk', methods=['GET', 'POST'])
+@login_required
+def bulk_phone_numbers():
+    return _bulk_endpoint('phone_numbers')
+
+@bp.route('/api/devices/bulk', methods=['GET', 'POST'])
+@login_required
+def bulk_devices():
+    return _bulk_endpoint('devices')
+
+# Índice de números (prefixo, faixa e alocação de DIDs livres)
+NUMBER_SEARCH_MAX = 1000
+NUMBER_ALLOCATE_MAX = 10000
+number_index = None  # criado no primeiro uso (numpy)
+_number_index_lock = threading.Lock()
+_number_index_synced = 0.0
+_number_index_reloaded_at = 0.0
+_number_index_reloading = False
+_number_index_interval = float(os.environ.get('NUMBER_INDEX_SYNC_INTERVAL', '1'))
+_number_index_reload_interval = float(os.environ.get('NUMBER_INDEX_RELOAD_INTERVAL', '300'))
+
+def _reload_number_index():
+    """Recarga completa em segundo plano; as requisições seguem com o índice anterior"""
+    global _number_index_reloading
+    try:
+        with _background_app.app_context():
+            rows = (db.session.query(PhoneNumber.id, PhoneNumber.number).order_by(PhoneNumber.id)
+                    .yield_per(STREAM_BATCH_SIZE * 10))
+            number_index.reload(_cooperative(rows, STREAM_BATCH_SIZE * 10))
+    except Exception:
+        _background_app.logger.exception('Falha na recarga do índice de números')
+    finally:
+        with _number_index_lock:
+            _number_index_reloading = False
+
+def _cooperative(rows, every):
+    """Cede o worker (eventlet) a cada `every` linhas durante a carga"""
+    for position, row in enumerate(rows, 1):
+        yield row
+        if position % every == 0:
+            socketio.sleep(0)
+
+def get_number_index(force=False):
+    """Índice de números; None até a primeira carga completa terminar
+
+    Linhas novas (id maior) são incorporadas a cada NUMBER_INDEX_SYNC_INTERVAL.
+    O sync por id não vê ids commitados fora de ordem nem remoções: a cada
+    NUMBER_INDEX_RELOAD_INTERVAL o índice é recarregado por inteiro numa tarefa
+    em segundo plano (uma por processo), nunca dentro da requisição.
+    """
+    global number_index, _number_index_synced, _number_index_reloaded_at, _number_index_reloading
+    now = time.monotonic()
+    with _number_index_lock:
+        if number_index is None:
+            from number_index import NumberIndex
+            number_index = NumberIndex()
+        start = not _number_index_reloading and (
+            not _number_index_reloaded_at or now - _number_index_reloaded_at >= _number_index_reload_interval)
+        if start:
+            _number_index_reloading, _number_index_reloaded_at = True, now
+    if start:
+        socketio.start_background_task(_reload_number_index)
+    if not number_index.loaded:
+        return None
+    if force or now - _number_index_synced >= _number_index_interval:
+        number_index.sync(lambda last_id: db.session.query(PhoneNumber.id, PhoneNumber.number)
+                          .filter(PhoneNumber.id > last_id).order_by(PhoneNumber.id)
+                          .yield_per(STREAM_BATCH_SIZE * 10))
+        _number_index_synced = now
+    return number_index
+
+def _number_index_loading():
+    response = jsonify({'error': 'Índice de números em carga, tente novamente em instantes'})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+def _number_arg(name):
+    from number_index import normalize as normalize_number
+    value = request.args.get(name) if request.method == 'GET' else (request.get_json(silent=True) or {}).get(name)
+    return normalize_number(value) if value else None
+
+@bp.route('/api/phone_numbers/search')
+@login_required
+def search_phone_numbers():
+    """Busca por prefixo (?prefix=551130) ou faixa (?start=&end=, mesmo número de dígitos)"""
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    prefix, start, end = _number_arg('prefix'), _number_arg('start'), _number_arg('end')
+    cursor = _number_arg('cursor')
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), NUMBER_SEARCH_MAX)
+    except ValueError:
+        return jsonify({'error': 'Parâmetro limit inválido'}), 400
+    if limit < 1 or not (prefix or (start and end)):
+        return jsonify({'error': 'Informe prefix ou start e end'}), 400
+    
+    from number_index import decode as decode_numbers, encode as encode_number
+    index = get_number_index()
+    if index is None:
+        return _number_index_loading()
+    after = encode_number(cursor) if cursor else None
+    try:
+        if prefix:
+            keys, ids = index.prefix(prefix, limit=limit + 1, after=after)
+        else:
+            keys, ids = index.range(start, end, limit=limit + 1, after=after)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    has_more = len(keys) > limit
+    keys, ids = keys[:limit], ids[:limit].tolist()
+    rows = {row.id: row for row in PhoneNumber.query.filter(PhoneNumber.id.in_(ids))} if ids else {}
+    response = {
+        'items': [rows[row_id].to_dict() for row_id in ids if row_id in rows],
+        'next_cursor': decode_numbers(keys[-1:])[0] if has_more else None
+    }
+    if prefix and cursor is None:
+        response['total'] = index.count_prefix(prefix)
+    return jsonify(response)
+
+@bp.route('/api/phone_numbers/allocate', methods=['POST'])
+@login_required
+def allocate_phone_numbers():
+    """Aloca em lote os primeiros `count` números livres da faixa [start, end] para um cliente"""
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    start, end = _number_arg('start'), _number_arg('end')
+    try:
+        count = int(data.get('count', 1))
+    except (TypeError, ValueError):
+        count = 0
+    if not start or not end or not data.get('client_name') or not 0 < count <= NUMBER_ALLOCATE_MAX:
+        return jsonify({'error': f'Campos start, end, client_name e count (1 a {NUMBER_ALLOCATE_MAX}) são obrigatórios'}), 400
+    
+    # Outro worker pode alocar o mesmo número entre a busca e o INSERT: a restrição unique
+    # rejeita o lote, o índice recebe os números já gravados e a busca é refeita
+    for attempt in range(3):
+        index = get_number_index(force=True)
+        if index is None:
+            return _number_index_loading()
+        try:
+            free = index.free(start, end, count, bool(data.get('contiguous')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if len(free) < count:
+            return jsonify({'error': 'Números livres insuficientes na faixa', 'available': len(free)}), 409
+        rows = [{'client_name': data['client_name'], 'number': f'+{digits}',
+                 'portability_status': data.get('portability_status', 'jbm_line'),
+                 'provider': data.get('provider', 'tsinfo')} for digits in free]
+        try:
+            db.session.execute(db.insert(PhoneNumber), rows)
+            db.session.commit()
+        except sqlalchemy.exc.IntegrityError:
+            db.session.rollback()
+            # Ids commitados fora de ordem escapam do sync: busca direta dos números em conflito
+            index.add_missing(db.session.query(PhoneNumber.id, PhoneNumber.number)
+                              .filter(PhoneNumber.number.in_([row['number'] for row in rows])))
+            continue
+        get_number_index(force=True)
+        return jsonify({'allocated': [row['number'] for row in rows], 'count': len(rows)}), 201
+    return jsonify({'error': 'Conflito de alocação, tente novamente'}), 409
+
+# Alocação de blocos IP
+ip_allocator = IPAllocator()
+_ip_allocator_loaded_at = 0.0
+_ip_allocator_synced_id = 0
+_ip_allocator_reload_interval = float(os.environ.get('IP_ALLOCATOR_RELOAD_INTERVAL', '300'))
+
+def get_ip_allocator(sync=False, reload=False):
+    """Índice de prefixos carregado sob demanda a partir de IPBlock.
+
+    Com `sync` (antes de alocar) incorpora os blocos gravados por outros workers desde
+    a última leitura. A cada IP_ALLOCATOR_RELOAD_INTERVAL segundos o índice é recarregado
+    por inteiro, refletindo também remoções e ids confirmados fora de ordem; o índice
+    unique de allocated_network barra a alocação duplicada que ainda escapar; depois de
+    um conflito, `reload` força a recarga completa.
+    """
+    global _ip_allocator_loaded_at, _ip_allocator_synced_id
+    now = time.monotonic()
+    columns = (IPBlock.id, IPBlock.network, IPBlock.allocated_network)
+    if reload or not _ip_allocator_loaded_at or now - _ip_allocator_loaded_at >= _ip_allocator_reload_interval:
+        synced_id = db.session.query(db.func.max(IPBlock.id)).scalar() or 0
+        skipped = ip_allocator.load(db.session.query(*columns).yield_per(STREAM_BATCH_SIZE))
+        _ip_allocator_loaded_at, _ip_allocator_synced_id = now, synced_id
+    elif sync:
+        rows = db.session.query(*columns).filter(IPBlock.id > _ip_allocator_synced_id).order_by(IPBlock.id).all()
+        skipped = []
+        for block_id, network, allocated_network in rows:
+            try:
+                ip_allocator.add(block_id, network, allocated_network)
+            except ValueError:
+                skipped.append(block_id)
+        if rows:
+            _ip_allocator_synced_id = rows[-1].id
+    else:
+        skipped = None
+    if skipped:
+        current_app.logger.warning('Blocos IP ignorados no índice (CIDR inválido ou sobreposto): %s', skipped)
+    return ip_allocator
+
+@bp.route('/api/ip_blocks', methods=['POST'])
+@login_required
+def create_ip_block():
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    data = request.get_json() or {}
+    if not data.get('name') or not data.get('network'):
+        return jsonify({'error': 'Campos name e network são obrigatórios'}), 400
+    
+    allocator = get_ip_allocator(sync=True)
+    allocated_network = data.get('allocated_network')
+    block = None
+    try:
+        if allocated_network:
+            conflicts = allocator.overlaps(allocated_network)
+            if conflicts:
+                return jsonify({'error': 'Alocação sobreposta a outra', 'conflicts': conflicts}), 400
+        block = IPBlock(
+            name=data['name'],
+            network=data['network'],
+            gateway=data.get('gateway'),
+            client_name=data.get('client_name'),
+            allocated_network=allocated_network
+        )
+        db.session.add(block)
+        db.session.flush()
+        # Valida contenção no bloco e sobreposição antes de confirmar
+        allocator.add(block.id, block.network, block.allocated_network)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except sqlalchemy.exc.IntegrityError:
+        db.session.rollback()
+        allocator.remove(block.id)
+        return jsonify({'error': f'{allocated_network} já alocado'}), 400
+    
+    return jsonify(block.to_dict()), 201
+
+@bp.route('/api/ip_blocks/<int:block_id>', methods=['DELETE'])
+@login_required
+def delete_ip_block(block_id):
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    block = IPBlock.query.get_or_404(block_id)
+    db.session.delete(block)
+    db.session.commit()
+    get_ip_allocator().remove(block_id)
+    return jsonify({'success': True})
+
+@bp.route('/api/ip_blocks/<int:block_id>/next_free')
+@login_required
+def next_free_subnet(block_id):
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    prefixlen = request.args.get('prefixlen', type=int)
+    if prefixlen is None:
+        return jsonify({'error': 'prefixlen inválido'}), 400
+    
+    try:
+        network = get_ip_allocator().next_free(block_id, prefixlen)
+    except KeyError:
+        return jsonify({'error': 'Bloco não encontrado'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'block_id': block_id, 'network': network})
+
+@bp.route('/api/ip_blocks/<int:block_id>/allocate', methods=['POST'])
+@login_required
+def allocate_subnet(block_id):
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    parent = IPBlock.query.get_or_404(block_id)
+    data = request.get_json() or {}
+    # Outro worker (ou greenlet) pode alocar a mesma sub-rede entre a busca e o commit:
+    # o índice unique rejeita a linha, o índice em memória é recarregado e a busca refeita
+    for attempt in range(3):
+        allocator = get_ip_allocator(sync=True, reload=attempt > 0)
+        try:
+            network = allocator.next_free(block_id, int(data['prefixlen']))
+        except (KeyError, ValueError, TypeError):
+            return jsonify({'error': 'prefixlen inválido'}), 400
+        if network is None:
+            return jsonify({'error': 'Nenhuma sub-rede livre no bloco'}), 409
+        
+        block = IPBlock(
+            name=data.get('name', parent.name),
+            network=parent.network,
+            gateway=parent.gateway,
+            client_name=data.get('client_name'),
+            allocated_network=network
+        )
+        db.session.add(block)
+        try:
+            db.session.flush()
+            allocator.add(block.id, block.network, block.allocated_network)
+            db.session.commit()
+        except PrefixConflict as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 409
+        except sqlalchemy.exc.IntegrityError:
+            db.session.rollback()
+            if block.id is not None:
+                allocator.remove(block.id)
+            continue
+        return jsonify(block.to_dict()), 201
+    return jsonify({'error': 'Conflito de alocação, tente novamente'}), 409
+
+@bp.route('/api/ip_blocks/lookup')
+@login_required
+def lookup_ip():
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    try:
+        owner = get_ip_allocator().owner_of(request.args.get('ip', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'ip': request.args.get('ip'), 'owner': owner})
+
+@bp.route('/api/ip_blocks/overlaps')
+@login_required
+def check_overlaps():
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    try:
+        conflicts = get_ip_allocator().overlaps(request.args.get('cidr', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'cidr': request.args.get('cidr'), 'overlaps': bool(conflicts), 'conflicts': conflicts})
+
+# Telemetria: ring buffers em memória (1m/5m/1h) e push das mudanças por Socket.IO
+TELEMETRY_TOKEN = os.environ.get('TELEMETRY_TOKEN')
+telemetry_store = None
+telemetry_publisher = None
+_telemetry_lock = threading.Lock()
+
+def get_telemetry():
+    """(store, publisher) criados no primeiro uso: o módulo de telemetria importa numpy"""
+    global telemetry_store, telemetry_publisher
+    if telemetry_publisher is None:
+        from telemetry import TelemetryPublisher, TelemetryStore
+        with _telemetry_lock:
+            if telemetry_publisher is None:
+                telemetry_store = TelemetryStore()
+                telemetry_publisher = TelemetryPublisher(
+                    socketio, telemetry_store, interval=float(os.environ.get('TELEMETRY_PUSH_INTERVAL', '1.0'))
+                )
+    return telemetry_store, telemetry_publisher
+
+def _telemetry_agent_authorized():
+    """Agentes usam 'Authorization: Bearer <TELEMETRY_TOKEN>'; administradores logados também podem enviar"""
+    header = request.headers.get('Authorization', '')
+    if TELEMETRY_TOKEN and hmac.compare_digest(header, f'Bearer {TELEMETRY_TOKEN}'):
+        return True
+    return current_user.is_authenticated and current_user.role in ['admin', 'super_admin']
+
+@bp.route('/api/telemetry', methods=['POST'])
+def ingest_telemetry():
+    if not _telemetry_agent_authorized():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    from telemetry import parse_samples
+    store, publisher = get_telemetry()
+    try:
+        sources, metrics, values, timestamps = parse_samples(request.get_json(force=True))
+        accepted = store.ingest(sources, metrics, values, timestamps)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Lote inválido: {e}'}), 400
+    
+    publisher.start()
+    return jsonify({'accepted': accepted, 'series': len(store)})
+
+@bp.route('/api/telemetry/latest')
+@login_required
+def telemetry_latest():
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    return jsonify(get_telemetry()[0].latest(request.args.get('source')))
+
+@bp.route('/api/telemetry/series')
+@login_required
+def telemetry_series():
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    return jsonify({'series': get_telemetry()[0].series()})
+
+@bp.route('/api/telemetry/query')
+@login_required
+def telemetry_query():
+    if current_user.status != 'approved':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    try:
+        result = get_telemetry()[0].query(
+            request.args.get('source', ''), request.args.get('metric', ''),
+            resolution=request.args.get('resolution', '1m'),
+            start=request.args.get('start', type=float), end=request.args.get('end', type=float)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if result is None:
+        return jsonify({'error': 'Série não encontrada'}), 404
+    return jsonify(result)
+
+@socketio.on('subscribe_telemetry')
+def handle_subscribe_telemetry(data=None):
+    if current_user.is_authenticated and current_user.status == 'approved':
+        store, publisher = get_telemetry()
+        join_room(publisher.room)
+        publisher.start()
+        emit('telemetry', store.latest((data or {}).get('source')))
+
+@socketio.on('unsubscribe_telemetry')
+def handle_unsubscribe_telemetry():
+    leave_room(get_telemetry()[1].room)
+
+@socketio.on('subscribe_job')
+def handle_subscribe_job(data):
+    if current_user.is_authenticated and current_user.role == 'super_admin':
+        job = db.session.get(UpdateJob, str((data or {}).get('job_id', '')))
+        if job is None:
+            emit('error', {'msg': 'Job não encontrado'})
+            return
+        join_room(update_runner.room(job.id))
+        emit('job_status', job.to_dict())
+
+# Métricas (formato texto do Prometheus) e pilhas das requisições lentas
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+def _metrics_authorized():
+    """Administrador logado ou Prometheus com 'Authorization: Bearer <METRICS_TOKEN>'"""
+    if current_user.is_authenticated and current_user.role in ['admin', 'super_admin']:
+        return True
+    if not METRICS_TOKEN:
+        # Sem token configurado só administradores: rotas, consultas SQL e pilhas não são públicas
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}')
+
+@bp.route('/metrics')
+def metrics():
+    if instrumentation is None:
+        return jsonify({'error': 'Métricas desativadas (GUARDIAN_METRICS=1)'}), 404
+    if not _metrics_authorized():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/metrics/profile', methods=['GET', 'POST'])
+def metrics_profile():
+    if instrumentation is None:
+        return jsonify({'error': 'Métricas desativadas (GUARDIAN_METRICS=1)'}), 404
+    if not _metrics_authorized():
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    if request.method == 'POST':
+        token_ok = METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''),
+                                                         f'Bearer {METRICS_TOKEN}')
+        if not token_ok and not (current_user.is_authenticated and current_user.role == 'super_admin'):
+            return jsonify({'error': 'Acesso negado'}), 403
+        # {"slow_ms": 500} liga o profiler para requisições acima de 500ms; 0 desliga
+        data = request.get_json(silent=True) or {}
+        try:
+            instrumentation.set_profiler(float(data.get('slow_ms', 0)) / 1000)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'slow_ms inválido'}), 400
+    
+    profiler = instrumentation.profiler
+    if request.method == 'POST' or request.args.get('format') == 'json':
+        return jsonify({
+            'enabled': profiler is not None,
+            'slow_ms': profiler.slow_threshold * 1000 if profiler else 0,
+            'samples': profiler.samples if profiler else 0,
+            'slow_requests': profiler.slow_requests() if profiler else []
+        })
+    return Response(profiler.collapsed() if profiler else '', mimetype='text/plain')
 
 # WebSocket para chat
+CHAT_BATCH_INTERVAL = float(os.environ.get('CHAT_BATCH_INTERVAL', '0.05'))  # 0 = envio imediato
+CHAT_REPLAY_LIMIT = int(os.environ.get('CHAT_REPLAY_LIMIT', '100'))
+CHAT_REPLAY_WINDOW = int(os.environ.get('CHAT_REPLAY_WINDOW', '86400'))  # segundos
+CHAT_MAX_MESSAGE_LENGTH = 4000
+
+def persist_chat_messages(batch):
+    """Grava um lote {sala: [mensagens]} com um único executemany"""
+    rows = [
+        {
+            'room': room,
+            'user_email': item['user'],
+            'message': item['message'],
+            'created_at': datetime.fromisoformat(item['timestamp'])
+        }
+        for room, items in batch.items() for item in items
+    ]
+    with _background_app.app_context():
+        db.session.execute(db.insert(ChatMessage), rows)
+        db.session.commit()
+
+chat_batcher = MessageBatcher(socketio, persist=persist_chat_messages, interval=CHAT_BATCH_INTERVAL)
+
+def chat_room(name=None):
+    """Sala da organização do usuário (User.tenant), ou uma sala de equipe dentro dela
+
+    Sem organização definida o usuário fica numa sala só dele: o domínio do email
+    não isola (gmail.com, hotmail.com...).
+    """
+    tenant = f'org:{current_user.tenant}' if current_user.tenant else f'user:{current_user.id}'
+    return f'{tenant}/{name}' if name else tenant
+
+def replay_chat_history(room, since=None):
+    """Reenvia ao cliente as mensagens perdidas, limitado por janela de tempo e quantidade"""
+    cutoff = datetime.utcnow() - timedelta(seconds=CHAT_REPLAY_WINDOW)
+    if since:
+        try:
+            cutoff = max(cutoff, datetime.fromisoformat(since))
+        except (TypeError, ValueError):
+            pass
+    messages = ChatMessage.query.filter(
+        ChatMessage.room == room, ChatMessage.created_at > cutoff
+    ).order_by(ChatMessage.created_at.desc()).limit(CHAT_REPLAY_LIMIT).all()
+    if messages:
+        emit('history', {'room': room, 'messages': [m.to_dict() for m in reversed(messages)]})
+
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
     if current_user.is_authenticated and current_user.status == 'approved':
-        emit('status', {'msg': f'{current_user.email} conectou!'})
+        room = chat_room()
+        join_room(room)
+        emit('status', {'msg': f'{current_user.email} conectou!', 'room': room})
+        replay_chat_history(room, (auth or {}).get('since') or request.args.get('since'))
     else:
         return False
 
+@socketio.on('join')
+def handle_join(data):
+    if current_user.is_authenticated and current_user.status == 'approved':
+        data = data if isinstance(data, dict) else {}
+        name = data.get('room')
+        room = chat_room(name.strip() or None if isinstance(name, str) else None)
+        join_room(room)
+        emit('status', {'msg': f'Entrou em {room}', 'room': room})
+        replay_chat_history(room, data.get('since'))
+
 @socketio.on('message')
 def handle_message(data):
     if current_user.is_authenticated and current_user.status == 'approved':
-        emit('message', {
+        if not isinstance(data, dict) or not isinstance(data.get('message'), str) \
+                or not isinstance(data.get('room') or '', str):
+            emit('error', {'msg': 'Mensagem inválida: room e message devem ser texto'})
+            return
+        room = data.get('room') or chat_room()
+        # Só a sala do tenant ou suas salas de equipe (rooms() também tem sid, telemetry e job:<id>)
+        tenant = chat_room()
+        if not (room == tenant or room.startswith(tenant + '/')) or room not in rooms():
+            emit('error', {'msg': 'Sala não autorizada', 'room': room})
+            return
+        payload = {
+            'room': room,
             'user': current_user.email,
-            'message': data['message'],
+            'message': data['message'][:CHAT_MAX_MESSAGE_LENGTH],
             'timestamp': datetime.utcnow().isoformat()
-        }, broadcast=True)
+        }
+        if CHAT_BATCH_INTERVAL > 0:
+            chat_batcher.add(room, payload)
+        else:
+            persist_chat_messages({room: [payload]})
+            emit('message', payload, to=room)
+
+# gunicorn -c gunicorn.conf.py app:app
+app = create_app()
 
 if __name__ == '__main__':
     with app.app_context():
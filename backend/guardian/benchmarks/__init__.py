@@ -0,0 +1 @@
+"""Benchmarks do Guardian VoIP (executar com `python -m benchmarks.<nome>`)"""
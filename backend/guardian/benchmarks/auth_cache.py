@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Benchmark de requisições autenticadas (/api/devices) com e sem cache de usuários.
+
+Mede requisições/s e consultas SQL por requisição no test client do Flask.
+
+Uso: python -m benchmarks.auth_cache --requests 2000 [--database-url postgresql://...]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--database-url', help='Padrão: SQLite temporário')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{tmpdir.name}/bench.db'
+
+    from sqlalchemy import event
+    from werkzeug.security import generate_password_hash
+    from app import app, db, User, Device, user_cache
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='bench@guardian.local', role='admin', status='approved',
+                    password_hash=generate_password_hash('bench'))
+        db.session.add(user)
+        db.session.add_all(Device(name=f'cpe-{i}', ip_address=f'10.0.0.{i % 250}') for i in range(args.devices))
+        db.session.commit()
+
+        statements = {'count': 0}
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *a: statements.__setitem__('count', statements['count'] + 1))
+
+    # Fora do app_context: cada requisição tem sua própria sessão, como em produção
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.post('/login', data={'email': 'bench@guardian.local', 'password': 'bench'})
+    print(f"login: HTTP {response.status_code} em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    ttl = user_cache.ttl
+    for label, cache_ttl in (('sem cache', 0), ('com cache', ttl)):
+        user_cache.ttl = cache_ttl
+        user_cache.invalidate()
+        client.get('/api/devices?limit=50')
+        statements['count'] = 0
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            response = client.get('/api/devices?limit=50')
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} {args.requests / elapsed:8.0f} req/s  "
+              f"{statements['count'] / args.requests:.2f} consultas SQL/req")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == '__main__':
+    main()
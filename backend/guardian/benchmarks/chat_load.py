@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Teste de carga do chat: milhares de clientes Socket.IO distribuídos entre workers.
+
+Por padrão sobe um LocalBroker e `--workers` processos do Guardian (SQLite
+temporário) ligados por SOCKETIO_MESSAGE_QUEUE=local://, conecta `--clients`
+clientes em rodízio entre eles e mede entrega e latência das mensagens
+enviadas por `--senders` clientes. Requer python-socketio[asyncio_client]
+(aiohttp).
+
+Uso:
+    python -m benchmarks.chat_load --clients 2000 --workers 2 --senders 20 --messages 50
+    python -m benchmarks.chat_load --url http://127.0.0.1:5000 --email x@y --password z
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import socketio
+
+from chat_queue import start_local_broker
+
+
+async def login(url, email, password):
+    """Cookie de sessão Flask-Login compartilhado pelos clientes simulados"""
+    jar = aiohttp.CookieJar(unsafe=True)
+    async with aiohttp.ClientSession(cookie_jar=jar) as http:
+        async with http.post(f'{url}/login', data={'email': email, 'password': password},
+                             allow_redirects=False) as response:
+            if response.status != 302:
+                raise SystemExit(f'Login falhou em {url}: HTTP {response.status}')
+        return '; '.join(f'{c.key}={c.value}' for c in jar)
+
+
+class SimulatedClient:
+    def __init__(self, url, cookie, stats):
+        self.url = url
+        self.cookie = cookie
+        self.stats = stats
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on('messages', self.on_messages)
+        self.sio.on('message', self.on_message)
+
+    async def on_messages(self, items):
+        now = time.time()
+        for item in items:
+            sent = float(item['message'].split('|', 1)[0])
+            self.stats['latencies'].append(now - sent)
+        self.stats['delivered'] += len(items)
+        self.stats['events'] += 1
+
+    async def on_message(self, item):
+        await self.on_messages([item])
+
+    async def connect(self):
+        await self.sio.connect(self.url, headers={'Cookie': self.cookie}, transports=['websocket'])
+
+
+def spawn_workers(count, base_port, queue_url, database_url, email, password):
+    env = {**os.environ, 'SOCKETIO_MESSAGE_QUEUE': queue_url, 'DATABASE_URL': database_url}
+    subprocess.run([sys.executable, '-m', 'benchmarks.chat_server', '--create-user', f'{email}:{password}'],
+                   env=env, check=True)
+    processes = [
+        subprocess.Popen([sys.executable, '-m', 'benchmarks.chat_server', '--port', str(base_port + i)], env=env)
+        for i in range(count)
+    ]
+    return processes, [f'http://127.0.0.1:{base_port + i}' for i in range(count)]
+
+
+async def wait_ready(urls, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        for url in urls:
+            while True:
+                try:
+                    async with http.get(url, allow_redirects=False):
+                        break
+                except aiohttp.ClientError:
+                    if time.monotonic() > deadline:
+                        raise SystemExit(f'{url} não respondeu')
+                    await asyncio.sleep(0.2)
+
+
+async def run(args, urls):
+    cookies = {url: await login(url, args.email, args.password) for url in urls}
+    stats = {'delivered': 0, 'events': 0, 'latencies': []}
+    clients = [SimulatedClient(urls[i % len(urls)], cookies[urls[i % len(urls)]], stats)
+               for i in range(args.clients)]
+
+    start = time.perf_counter()
+    for offset in range(0, len(clients), args.connect_batch):
+        await asyncio.gather(*(c.connect() for c in clients[offset:offset + args.connect_batch]))
+    connect_time = time.perf_counter() - start
+    print(f"{len(clients)} clientes conectados em {connect_time:.1f}s ({len(urls)} workers)")
+
+    async def sender(client):
+        for seq in range(args.messages):
+            await client.sio.emit('message', {'message': f'{time.time()}|{seq}'})
+            await asyncio.sleep(args.interval)
+
+    expected = args.senders * args.messages * len(clients)
+    start = time.perf_counter()
+    await asyncio.gather(*(sender(c) for c in clients[:args.senders]))
+    deadline = time.monotonic() + args.drain
+    while stats['delivered'] < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(stats['latencies']) or [0.0]
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"entregues {stats['delivered']}/{expected} em {elapsed:.1f}s "
+          f"({stats['delivered'] / elapsed:.0f} entregas/s, {stats['events']} eventos)")
+    print(f"latência p50={statistics.median(latencies) * 1000:.1f}ms p95={pick(0.95):.1f}ms "
+          f"p99={pick(0.99):.1f}ms max={latencies[-1] * 1000:.1f}ms")
+
+    await asyncio.gather(*(c.sio.disconnect() for c in clients), return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', action='append', help='Servidor já em execução (pode repetir)')
+    parser.add_argument('--email', default='carga@guardian.local')
+    parser.add_argument('--password', default='carga-chat')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--base-port', type=int, default=5101)
+    parser.add_argument('--broker-port', type=int, default=6390)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--connect-batch', type=int, default=200)
+    parser.add_argument('--senders', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.05, help='Intervalo entre mensagens de cada remetente')
+    parser.add_argument('--drain', type=float, default=30.0, help='Espera máxima pelas entregas (s)')
+    args = parser.parse_args()
+
+    processes = []
+    tmpdir = tempfile.TemporaryDirectory()
+    broker = None
+    try:
+        if args.url:
+            urls = args.url
+        else:
+            broker = start_local_broker(port=args.broker_port)
+            processes, urls = spawn_workers(args.workers, args.base_port, f'local://127.0.0.1:{args.broker_port}',
+                                            f'sqlite:///{tmpdir.name}/chat.db', args.email, args.password)
+            asyncio.run(wait_ready(urls))
+        asyncio.run(run(args, urls))
+        if broker is not None:
+            print(f"publicações no broker: {broker.published}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
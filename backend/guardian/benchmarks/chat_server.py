@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Servidor do Guardian para o teste de carga do chat (eventlet com monkey patch).
+
+Uso: SOCKETIO_MESSAGE_QUEUE=local://127.0.0.1:6380 python -m benchmarks.chat_server --port 5001
+     python -m benchmarks.chat_server --create-user carga@exemplo.com:senha
+"""
+import eventlet
+
+eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--create-user', metavar='EMAIL:SENHA', help='Cria usuário aprovado e sai')
+    args = parser.parse_args()
+
+    from app import app, db, socketio, User
+
+    with app.app_context():
+        db.create_all()
+        if args.create_user:
+            email, password = args.create_user.split(':', 1)
+            user = User.query.filter_by(email=email).first() or User(email=email)
+            user.set_password(password)
+            user.status = 'approved'
+            db.session.add(user)
+            db.session.commit()
+            return
+
+    socketio.run(app, host=args.host, port=args.port, log_output=False)
+
+
+if __name__ == '__main__':
+    main()
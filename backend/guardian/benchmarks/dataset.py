@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Dataset sintético do Guardian para benchmarks: usuários, números, dispositivos e blocos IP.
+
+Os registros são gerados de forma determinística e gravados em lotes com
+executemany, sem montar tabelas inteiras em memória.
+
+Uso: python -m benchmarks.dataset --database sqlite:////tmp/guardian_bench.db --phones 1000000 --devices 100000
+"""
+import argparse
+import os
+import time
+
+BENCH_PASSWORD = 'carga'
+ADMIN_EMAIL = 'carga@guardian.local'
+PORTABILITY_STATUSES = ('jbm_line', 'ported_in', 'ported_out', 'pending')
+PROVIDERS = ('tsinfo', 'vivo', 'claro', 'tim', 'oi')
+DEVICE_TYPES = ('ata', 'router', 'switch', 'pbx', 'softswitch')
+
+DEFAULT_SIZES = {'users': 100, 'phones': 1000000, 'devices': 100000, 'ip_blocks': 10000}
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _users(count, password_hash):
+    yield {'email': ADMIN_EMAIL, 'password_hash': password_hash, 'role': 'admin', 'status': 'approved'}
+    for i in range(1, count):
+        yield {'email': f'usuario{i}@cliente{i % 20}.local', 'password_hash': password_hash,
+               'role': 'user', 'status': 'approved' if i % 10 else 'pending'}
+
+
+def _phones(count):
+    for i in range(count):
+        yield {'client_name': f'cliente-{i % 500}', 'number': f'55{11 + i % 89}9{i:08d}',
+               'portability_status': PORTABILITY_STATUSES[i % 7 % 4], 'provider': PROVIDERS[i % 5]}
+
+
+def _devices(count):
+    for i in range(count):
+        yield {'name': f'dev-{i}', 'ip_address': f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}',
+               'mac_address': f'02:00:{i >> 24 & 255:02x}:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}',
+               'device_type': DEVICE_TYPES[i % len(DEVICE_TYPES)], 'status': 'active' if i % 17 else 'offline'}
+
+
+def _ip_blocks(count):
+    for i in range(count):
+        yield {'name': f'bloco-{i}', 'network': f'{100 + (i >> 16)}.{i >> 8 & 255}.{i & 255}.0/24',
+               'gateway': f'{100 + (i >> 16)}.{i >> 8 & 255}.{i & 255}.1', 'client_name': f'cliente-{i % 500}'}
+
+
+def seed(database_url, users=100, phones=1000000, devices=100000, ip_blocks=10000, batch_size=20000,
+         verbose=False):
+    """Cria as tabelas e grava o dataset; retorna {tabela: (registros, segundos)}"""
+    os.environ['DATABASE_URL'] = database_url
+    from werkzeug.security import generate_password_hash
+    from models import create_cli_app, db, Device, IPBlock, PhoneNumber, User
+
+    # Um único hash para todos os usuários: gerar 100 hashes PBKDF2 dominaria o tempo de carga
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    plan = [(User, _users(max(users, 1), password_hash)), (PhoneNumber, _phones(phones)),
+            (Device, _devices(devices)), (IPBlock, _ip_blocks(ip_blocks))]
+    timings = {}
+    with create_cli_app().app_context():
+        db.create_all()
+        for model, rows in plan:
+            start = time.perf_counter()
+            total = 0
+            for batch in _batches(rows, batch_size):
+                db.session.execute(db.insert(model), batch)
+                db.session.commit()
+                total += len(batch)
+            timings[model.__tablename__] = (total, time.perf_counter() - start)
+            if verbose:
+                print(f"{model.__tablename__}: {total} registros em {timings[model.__tablename__][1]:.1f}s")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='URL SQLAlchemy do banco a popular (deve estar vazio)')
+    for name, default in DEFAULT_SIZES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    args = parser.parse_args()
+    seed(args.database, args.users, args.phones, args.devices, args.ip_blocks, args.batch_size, verbose=True)
+
+
+if __name__ == '__main__':
+    main()
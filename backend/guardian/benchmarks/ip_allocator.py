@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark do IPAllocator com N prefixos /29 alocados em first-fit.
+
+Uso: python -m benchmarks.ip_allocator --prefixes 1000000 --lookups 200000
+"""
+import argparse
+import ipaddress
+import random
+import resource
+import time
+
+from ip_allocator import IPAllocator
+
+
+def build(allocator, prefixes, seed):
+    """Cria blocos /16 em 10.0.0.0/8 e aloca prefixos /29 em first-fit, como a rota /allocate
+
+    Os /29 preenchem os blocos em ordem (o bloco 10.0.0.0/16 primeiro); com `seed`
+    1% das alocações é liberado depois, deixando buracos espalhados na parte cheia.
+    """
+    rng = random.Random(seed)
+    base = int(ipaddress.IPv4Address('10.0.0.0'))
+    pools = 256
+    for pool in range(pools):
+        allocator.add(-(pool + 1), str(ipaddress.IPv4Network((base + (pool << 16), 16))))
+
+    # Cada /16 possui 8192 /29
+    for block_id in range(1, prefixes + 1):
+        slot = block_id - 1
+        pool = slot // 8192
+        network = ipaddress.IPv4Network((base + (slot << 3), 29))
+        allocator.add(block_id, str(ipaddress.IPv4Network((base + (pool << 16), 16))), str(network))
+    for block_id in rng.sample(range(1, prefixes + 1), prefixes // 100):
+        allocator.remove(block_id)
+    return base
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {count:>10} ops  {elapsed:8.3f}s  {count / elapsed:12.0f} ops/s  '
+          f'{elapsed / count * 1e6:8.2f} us/op')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prefixes', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    allocator = IPAllocator()
+
+    holder = {}
+    timed('insert', args.prefixes + 256, lambda: holder.update(base=build(allocator, args.prefixes, args.seed)))
+    base = holder['base']
+
+    ips = [str(ipaddress.IPv4Address(base + rng.getrandbits(24))) for _ in range(args.lookups)]
+    cidrs = [str(ipaddress.IPv4Network(((base + rng.getrandbits(24)) >> 6 << 6, 26)))
+             for _ in range(args.lookups)]
+
+    timed('owner_of', len(ips), lambda: [allocator.owner_of(ip) for ip in ips])
+    timed('overlaps (/26)', len(cidrs), lambda: [allocator.overlaps(c) for c in cidrs])
+    timed('next_free (/29)', 1000, lambda: [allocator.next_free(-(i % 256 + 1), 29) for i in range(1000)])
+    timed('next_free (/24)', 1000, lambda: [allocator.next_free(-(i % 256 + 1), 24) for i in range(1000)])
+
+    # Um único /8 com alocações em first-fit: next_free não pode percorrer a faixa cheia
+    packed = IPAllocator()
+    packed.add(0, '10.0.0.0/8')
+    count = min(args.prefixes, 200000)
+    for block_id in range(1, count + 1):
+        packed.add(block_id, '10.0.0.0/8', packed.next_free(0, 29))
+    timed('next_free /29 (/8 com 200k)', 1000, lambda: [packed.next_free(0, 29) for _ in range(1000)])
+    timed('alocação first-fit (/29)', 1000, lambda: [packed.add(count + i + 1, '10.0.0.0/8', packed.next_free(0, 29))
+                                                     for i in range(1000)])
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'peak RSS: {peak / 1024:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
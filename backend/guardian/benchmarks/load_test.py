@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Teste de carga HTTP das rotas principais do Guardian, com latência p50/p95/p99 por rota.
+
+Por padrão cria um SQLite temporário com dados sintéticos e sobe o gunicorn
+com gunicorn.conf.py (eventlet); com --url usa um servidor já em execução.
+Requer aiohttp.
+
+Uso:
+    python -m benchmarks.load_test --concurrency 50 --duration 10 [--workers 2] [--json resultado.json]
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --email admin@x --password y
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.dataset import ADMIN_EMAIL, BENCH_PASSWORD, DEFAULT_SIZES, seed
+
+ROUTES = [
+    '/api/devices?limit=50',
+    '/api/devices?limit=50&status=offline',
+    '/api/phone_numbers?limit=50',
+    '/api/phone_numbers?limit=50&client_name=cliente-7',
+    '/api/ip_blocks?limit=50',
+    '/api/telemetry/latest',
+]
+LOGIN_ROUTE = 'POST /login'
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies, errors, elapsed):
+    """req/s e percentis (ms) de uma rota"""
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        **{name: round(percentile(ordered, q) * 1000, 2) if ordered else None
+           for name, q in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99))},
+    }
+
+
+def peak_rss_mb(pid):
+    """Pico de RSS (VmHWM) do processo e dos filhos diretos, em MB (somente Linux)"""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        return None
+    for item in pids:
+        try:
+            with open(f'/proc/{item}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url, workers, worker_class):
+    port = _free_port()
+    env = {**os.environ, 'DATABASE_URL': database_url, 'GUARDIAN_BIND': f'127.0.0.1:{port}',
+           'GUARDIAN_WORKERS': str(workers), 'GUARDIAN_WORKER_CLASS': worker_class,
+           'GUARDIAN_LOG_LEVEL': 'warning'}
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], env=env)
+    return process, f'http://127.0.0.1:{port}'
+
+
+async def wait_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise SystemExit('Servidor encerrou durante a inicialização')
+            try:
+                async with http.get(f'{url}/', allow_redirects=False):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+    raise SystemExit(f'Servidor não respondeu em {timeout}s')
+
+
+async def measure_logins(url, email, password, count, concurrency):
+    """Rota de autenticação: cada login verifica o hash da senha (PBKDF2)"""
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        nonlocal errors
+        async with semaphore, aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)) as http:
+            start = time.perf_counter()
+            try:
+                async with http.post(f'{url}/login', data={'email': email, 'password': password},
+                                     allow_redirects=False) as response:
+                    ok = response.status == 302
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(count)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_load(url, email, password, routes, concurrency, duration):
+    results = {route: {'latencies': [], 'errors': 0} for route in routes}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.CookieJar(unsafe=True)) as http:
+        async with http.post(f'{url}/login', data={'email': email, 'password': password},
+                             allow_redirects=False) as response:
+            if response.status != 302:
+                raise SystemExit(f'Login falhou: HTTP {response.status}')
+
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset):
+            position = offset
+            while time.perf_counter() < deadline:
+                route = routes[position % len(routes)]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    async with http.get(f'{url}{route}', allow_redirects=False) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except aiohttp.ClientError:
+                    ok = False
+                if ok:
+                    results[route]['latencies'].append(time.perf_counter() - start)
+                else:
+                    results[route]['errors'] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {route: summarize(data['latencies'], data['errors'], elapsed) for route, data in results.items()}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Servidor existente (padrão: sobe o gunicorn com SQLite temporário)')
+    parser.add_argument('--database', help='Banco já populado por benchmarks.dataset (pula a geração)')
+    parser.add_argument('--email', default=ADMIN_EMAIL)
+    parser.add_argument('--password', default=BENCH_PASSWORD)
+    parser.add_argument('--route', action='append', dest='routes', help='Rota a testar (repetível)')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--logins', type=int, default=20, help='Logins medidos na rota de autenticação')
+    for name, default in DEFAULT_SIZES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default,
+                            help='Tamanho no dataset temporário')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--worker-class', default='eventlet')
+    parser.add_argument('--json', metavar='ARQUIVO', help='Grava o resultado em JSON')
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    dataset = None
+    if url is None:
+        database_url = args.database
+        if database_url is None:
+            database = os.path.join(tempfile.mkdtemp(prefix='guardian_load_'), 'guardian.db')
+            database_url = f'sqlite:///{database}'
+            timings = seed(database_url, args.users, args.phones, args.devices, args.ip_blocks)
+            dataset = {table: {'rows': rows, 'seconds': round(seconds, 2)} for table, (rows, seconds) in timings.items()}
+            print('dataset: ' + ', '.join(f"{table}={item['rows']} ({item['seconds']}s)" for table, item in dataset.items()))
+        process, url = start_server(database_url, args.workers, args.worker_class)
+    try:
+        asyncio.run(wait_ready(url, process))
+        report, elapsed = asyncio.run(run_load(url, args.email, args.password, args.routes or ROUTES,
+                                               args.concurrency, args.duration))
+        if args.logins:
+            report[LOGIN_ROUTE] = asyncio.run(measure_logins(url, args.email, args.password, args.logins,
+                                                             min(args.concurrency, args.logins)))
+        rss = peak_rss_mb(process.pid) if process is not None else None
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{'rota':<52} {'req':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, row in report.items():
+        print(f"{route:<52} {row['requests']:>7} {row['errors']:>6} {row['rps']:>8} "
+              f"{row['p50_ms'] or '-':>8} {row['p95_ms'] or '-':>8} {row['p99_ms'] or '-':>8}")
+    total = sum(row['requests'] for route, row in report.items() if route != LOGIN_ROUTE)
+    print(f"total: {total} requisições em {elapsed:.1f}s ({total / elapsed:.0f} req/s), "
+          f"concorrência {args.concurrency}, {args.workers} worker(s) {args.worker_class}"
+          + (f", pico de RSS do servidor {rss} MB" if rss is not None else ''))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'guardian.load_test', 'url': url, 'concurrency': args.concurrency,
+                       'duration': round(elapsed, 2), 'workers': args.workers, 'worker_class': args.worker_class,
+                       'total_rps': round(total / elapsed, 1), 'peak_rss_mb': rss, 'dataset': dataset,
+                       'routes': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
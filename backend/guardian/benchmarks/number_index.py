@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Benchmark do NumberIndex com N números (padrão 5M) e, com --sql, comparação com o SQLite.
+
+Os números seguem o dataset sintético (benchmarks.dataset): 55 + DDD + 9 + 8 dígitos.
+Com --sql o mesmo dataset é gravado num SQLite temporário (ou --database) e as
+buscas por prefixo são comparadas com a consulta por faixa no índice unique de
+`number`; também mostra o plano da consulta por (client_name, portability_status).
+
+Uso: python -m benchmarks.number_index --numbers 5000000 --queries 10000 [--sql]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from benchmarks.dataset import PORTABILITY_STATUSES, _phones, seed
+from number_index import NumberIndex, encode
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<34} {count:>10} ops  {elapsed:8.3f}s  {count / elapsed:12.0f} ops/s  '
+          f'{elapsed / count * 1e6:10.2f} us/op')
+    return result
+
+
+def _prefixes(rng, count):
+    """Prefixos de 6 a 9 dígitos (DDD + início do assinante), como na busca da UI"""
+    result = []
+    for _ in range(count):
+        number = f'55{rng.randint(11, 99)}9{rng.randint(0, 99999999):08d}'
+        result.append(number[:rng.randint(6, 9)])
+    return result
+
+
+def compare_sql(database_url, numbers, prefixes, limit):
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        count = conn.execute(text('SELECT COUNT(*) FROM phone_number')).scalar()
+        if count < numbers:
+            raise SystemExit(f'Banco com {count} números; esperado >= {numbers}')
+        query = text('SELECT id, number FROM phone_number WHERE number >= :low AND number < :high '
+                     'ORDER BY number LIMIT :limit')
+        timed(f'SQL faixa no índice unique (LIMIT {limit})', len(prefixes), lambda: [
+            conn.execute(query, {'low': p, 'high': p[:-1] + chr(ord(p[-1]) + 1), 'limit': limit}).fetchall()
+            for p in prefixes])
+        timed('SQL COUNT por prefixo', len(prefixes) // 10, lambda: [
+            conn.execute(text('SELECT COUNT(*) FROM phone_number WHERE number >= :low AND number < :high'),
+                         {'low': p, 'high': p[:-1] + chr(ord(p[-1]) + 1)}).scalar()
+            for p in prefixes[:len(prefixes) // 10]])
+        filtered = text('SELECT id FROM phone_number WHERE client_name = :client AND portability_status = :status '
+                        'ORDER BY id LIMIT 100')
+        if database_url.startswith('sqlite'):
+            plan = conn.execute(text('EXPLAIN QUERY PLAN ' + filtered.text),
+                                {'client': 'cliente-7', 'status': 'ported_in'}).fetchall()
+            print('plano (client_name, portability_status):', '; '.join(row[-1] for row in plan))
+        timed('SQL cliente + portabilidade', 1000, lambda: [
+            conn.execute(filtered, {'client': f'cliente-{i % 500}',
+                                    'status': PORTABILITY_STATUSES[i % 4]}).fetchall()
+            for i in range(1000)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--numbers', type=int, default=5000000)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=100, help='Resultados por busca')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sql', action='store_true', help='Compara com consultas no SQLite')
+    parser.add_argument('--database', help='Banco já populado por benchmarks.dataset (com --sql)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Gerador: a carga processa lotes de LOAD_CHUNK linhas, como a leitura do banco com yield_per
+    rows = ((i, row['number']) for i, row in enumerate(_phones(args.numbers), start=1))
+    index = NumberIndex()
+    timed('carga (extend, inclui geração)', args.numbers, lambda: index.extend(rows))
+    stats = index.stats()
+    print(f"índice: {stats['numbers']} números, {stats['bytes'] / 2 ** 20:.1f} MB")
+
+    prefixes = _prefixes(rng, args.queries)
+    timed(f'prefixo (limit {args.limit})', len(prefixes), lambda: [index.prefix(p, limit=args.limit) for p in prefixes])
+    timed('contagem por prefixo', len(prefixes), lambda: [index.count_prefix(p) for p in prefixes])
+    ranges = []
+    for p in prefixes:
+        start = p.ljust(13, '0')
+        ranges.append((start, str(int(start) + 9999)))
+    timed(f'faixa de 10k (limit {args.limit})', len(ranges), lambda: [index.range(s, e, limit=args.limit)
+                                                                       for s, e in ranges])
+    # Blocos de 10k dentro da parte ocupada do dataset
+    blocks = []
+    for _ in range(1000):
+        start = f'55{rng.randint(11, 99)}9{rng.randint(0, max(args.numbers // 10000 - 1, 0)):04d}0000'
+        blocks.append((start, start[:-4] + '9999'))
+    timed('livres (100 por bloco de 10k)', len(blocks), lambda: [index.free(s, e, 100) for s, e in blocks])
+    timed('livres contíguos (50)', len(blocks), lambda: [index.free(s, e, 50, contiguous=True) for s, e in blocks])
+    new_rows = [(args.numbers + i + 1, f'+55{rng.randint(11, 99)}8{rng.randint(0, 99999999):08d}') for i in range(1000)]
+    timed('inserção incremental (lote 1000)', 1, lambda: index.extend(new_rows))
+    assert index.prefix(new_rows[0][1][1:])[1].tolist() == [new_rows[0][0]]
+    assert encode('5511') < encode('55110') < encode('5512')
+
+    if args.sql:
+        database_url = args.database
+        if database_url is None:
+            database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='guardian_numbers_'), 'guardian.db')}"
+            seeded = seed(database_url, users=1, phones=args.numbers, devices=0, ip_blocks=0)
+            print(f"dataset SQLite: {seeded['phone_number'][0]} números em {seeded['phone_number'][1]:.1f}s")
+        compare_sql(database_url, args.numbers, prefixes, args.limit)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'peak RSS: {peak / 1024:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
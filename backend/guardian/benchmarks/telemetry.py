@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Benchmark de ingestão e consulta de telemetria (amostras/s e latência de consulta).
+
+Uso: python -m benchmarks.telemetry --sources 500 --metrics 8 --batch 2000 --seconds 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from telemetry import TelemetryStore
+
+METRICS = ['load', 'cpu', 'memory', 'calls_active', 'calls_failed', 'jitter', 'latency', 'packet_loss']
+
+
+def make_batches(sources, metrics, batch, count, rng, start):
+    """Lotes colunares com relógio avançando 1s por lote"""
+    names = [(f'server-{s}', m) for s in range(sources) for m in METRICS[:metrics]]
+    for i in range(count):
+        picked = [names[rng.randrange(len(names))] for _ in range(batch)]
+        yield {
+            'source': [p[0] for p in picked],
+            'metric': [p[1] for p in picked],
+            'value': [round(rng.uniform(0, 100), 2) for _ in range(batch)],
+            'timestamp': [start + i + rng.random() for _ in range(batch)],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sources', type=int, default=500)
+    parser.add_argument('--metrics', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--http-batches', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = time.time() - args.batches
+    batches = list(make_batches(args.sources, args.metrics, args.batch, args.batches, rng, start))
+
+    store = TelemetryStore()
+    begin = time.perf_counter()
+    for b in batches:
+        store.ingest(b['source'], b['metric'], b['value'], b['timestamp'])
+    elapsed = time.perf_counter() - begin
+    total = args.batch * args.batches
+    print(f"store.ingest: {total} amostras, {len(store)} séries em {elapsed:.2f}s ({total / elapsed:,.0f} amostras/s)")
+
+    timings = []
+    for _ in range(1000):
+        source, metric = f'server-{rng.randrange(args.sources)}', METRICS[rng.randrange(args.metrics)]
+        t = time.perf_counter()
+        store.query(source, metric, '1m')
+        timings.append(time.perf_counter() - t)
+    timings.sort()
+    print(f"query 1m: p50={timings[500] * 1e6:.0f}µs p99={timings[990] * 1e6:.0f}µs")
+
+    # Caminho HTTP completo (JSON + Flask) com token de agente
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmpdir.name}/bench.db'
+    os.environ['TELEMETRY_TOKEN'] = 'bench-token'
+    from app import app
+
+    client = app.test_client()
+    bodies = [json.dumps(b) for b in batches[:args.http_batches]]
+    headers = {'Authorization': 'Bearer bench-token', 'Content-Type': 'application/json'}
+    begin = time.perf_counter()
+    for body in bodies:
+        response = client.post('/api/telemetry', data=body, headers=headers)
+        assert response.status_code == 200, response.data
+    elapsed = time.perf_counter() - begin
+    total = args.batch * len(bodies)
+    print(f"POST /api/telemetry: {total} amostras em {elapsed:.2f}s ({total / elapsed:,.0f} amostras/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""Importação e exportação em lote de inventário (PhoneNumber e Device).
+
+Os registros são lidos em streaming (CSV ou NDJSON), validados em lotes e
+gravados com inserts Core em executemany; números de telefone usam upsert
+(ON CONFLICT em `number`) no PostgreSQL e no SQLite. Erros são reportados por
+linha sem abortar o lote.
+"""
+import csv
+import io
+import ipaddress
+import json
+import re
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import Device, PhoneNumber, db
+
+DEFAULT_BATCH_SIZE = 5000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+E164_RE = re.compile(r'^\+[1-9]\d{1,14}$')
+MAC_RE = re.compile(r'^[0-9A-Fa-f]{12}$')
+
+PHONE_FIELDS = ['number', 'client_name', 'portability_status', 'provider']
+DEVICE_FIELDS = ['name', 'ip_address', 'mac_address', 'device_type', 'status']
+
+
+class RowError(ValueError):
+    """Registro inválido"""
+
+
+def detect_format(filename=None, content_type=None, default='csv'):
+    """Formato (csv/ndjson) a partir do nome do arquivo ou do Content-Type"""
+    hint = (filename or '').lower() + ' ' + (content_type or '').lower()
+    if 'ndjson' in hint or 'jsonl' in hint or 'json' in hint:
+        return 'ndjson'
+    if 'csv' in hint:
+        return 'csv'
+    return default
+
+
+def iter_records(stream, fmt):
+    """Gera (linha, registro) a partir de um stream de texto CSV ou NDJSON"""
+    if fmt == 'ndjson':
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, RowError(f'JSON inválido: {e}')
+                continue
+            if not isinstance(record, dict):
+                yield line_no, RowError('Cada linha deve ser um objeto JSON')
+                continue
+            yield line_no, record
+    elif fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # line_num aponta para a última linha física lida (cabeçalho = 1)
+            yield reader.line_num, record
+    else:
+        raise ValueError(f'Formato não suportado: {fmt}')
+
+
+def normalize_e164(number, default_country_code=None):
+    """Normaliza um número para E.164 (+<país><número>)"""
+    number = re.sub(r'[\s\-().]', '', str(number or ''))
+    if number.startswith('00'):
+        number = '+' + number[2:]
+    elif not number.startswith('+') and default_country_code:
+        number = '+' + str(default_country_code) + number
+    if not E164_RE.match(number):
+        raise RowError(f'Número fora do padrão E.164: {number!r}')
+    return number
+
+
+def normalize_mac(mac):
+    """Normaliza MAC para AA:BB:CC:DD:EE:FF (aceita :, -, . ou sem separador)"""
+    digits = re.sub(r'[:\-.]', '', str(mac).strip())
+    if not MAC_RE.match(digits):
+        raise RowError(f'MAC inválido: {mac!r}')
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2)).upper()
+
+
+def normalize_ip(ip):
+    try:
+        return str(ipaddress.ip_address(str(ip).strip()))
+    except ValueError:
+        raise RowError(f'IP inválido: {ip!r}') from None
+
+
+def _text(record, field, default=None, required=False, max_length=None):
+    value = record.get(field)
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        if required:
+            raise RowError(f'Campo obrigatório ausente: {field}')
+        return default
+    if max_length and len(value) > max_length:
+        raise RowError(f'Campo {field} excede {max_length} caracteres')
+    return value
+
+
+def validate_phone_number(record, default_country_code=None):
+    return {
+        'number': normalize_e164(_text(record, 'number', required=True), default_country_code),
+        'client_name': _text(record, 'client_name', required=True, max_length=100),
+        'portability_status': _text(record, 'portability_status', 'jbm_line', max_length=20),
+        'provider': _text(record, 'provider', 'tsinfo', max_length=50),
+    }
+
+
+def validate_device(record):
+    mac = _text(record, 'mac_address')
+    return {
+        'name': _text(record, 'name', required=True, max_length=100),
+        'ip_address': normalize_ip(_text(record, 'ip_address', required=True)),
+        'mac_address': normalize_mac(mac) if mac else None,
+        'device_type': _text(record, 'device_type', max_length=50),
+        'status': _text(record, 'status', 'active', max_length=20),
+    }
+
+
+def _insert_statement(table, dialect_name, conflict_column=None, update_columns=()):
+    """INSERT Core com upsert quando o dialeto suporta ON CONFLICT"""
+    if conflict_column and dialect_name in ('postgresql', 'sqlite'):
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[conflict_column],
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+    return insert(table)
+
+
+class BulkImporter:
+    """Valida e grava registros em lotes, acumulando o relatório de erros"""
+
+    def __init__(self, session, table, validator, conflict_column=None, update_columns=(),
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.session = session
+        self.table = table
+        self.validator = validator
+        self.conflict_column = conflict_column
+        self.batch_size = batch_size
+        self.statement = _insert_statement(
+            table, session.get_bind().dialect.name, conflict_column, update_columns)
+        self.processed = 0
+        self.written = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_no, 'error': message})
+
+    def run(self, records):
+        """Consome um iterável de (linha, registro) e retorna o relatório"""
+        batch = []
+        for line_no, record in records:
+            batch.append((line_no, record))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        return self.report()
+
+    def report(self):
+        return {
+            'processed': self.processed,
+            'written': self.written,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
+
+    def _flush(self, batch):
+        now = datetime.utcnow()
+        rows = {}
+        for line_no, record in batch:
+            self.processed += 1
+            if isinstance(record, Exception):
+                self._error(line_no, str(record))
+                continue
+            try:
+                row = self.validator(record)
+            except RowError as e:
+                self._error(line_no, str(e))
+                continue
+            row['created_at'] = now
+            # Chave repetida no mesmo lote: ON CONFLICT não atualiza a mesma linha duas vezes
+            key = row[self.conflict_column] if self.conflict_column else line_no
+            rows.pop(key, None)
+            rows[key] = (line_no, row)
+
+        if not rows:
+            return
+        try:
+            self.session.execute(self.statement, [row for _, row in rows.values()])
+            self.session.commit()
+            self.written += len(rows)
+        except SQLAlchemyError:
+            self.session.rollback()
+            self._write_one_by_one(rows.values())
+
+    def _write_one_by_one(self, rows):
+        """Isola as linhas com erro de banco usando savepoints"""
+        for line_no, row in rows:
+            try:
+                with self.session.begin_nested():
+                    self.session.execute(self.statement, [row])
+                self.written += 1
+            except SQLAlchemyError as e:
+                self._error(line_no, str(getattr(e, 'orig', e)).strip())
+        self.session.commit()
+
+
+def export_records(rows, fmt, fields):
+    """Gera o conteúdo CSV/NDJSON em pedaços a partir de um iterável de dicionários"""
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(row) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % 1000 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+BULK_TARGETS = {
+    'phone_numbers': {
+        'model': PhoneNumber,
+        'fields': PHONE_FIELDS,
+        'conflict_column': 'number',
+        'update_columns': ['client_name', 'portability_status', 'provider'],
+    },
+    'devices': {
+        'model': Device,
+        'fields': DEVICE_FIELDS,
+        'conflict_column': None,
+        'update_columns': [],
+    },
+}
+
+
+def run_bulk_import(target, stream, fmt, default_country_code=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Importa um stream de texto CSV/NDJSON para o inventário indicado (requer contexto da aplicação)"""
+    spec = BULK_TARGETS[target]
+    if target == 'phone_numbers':
+        validator = lambda record: validate_phone_number(record, default_country_code)
+    else:
+        validator = validate_device
+    importer = BulkImporter(
+        db.session, spec['model'].__table__, validator,
+        conflict_column=spec['conflict_column'],
+        update_columns=spec['update_columns'],
+        batch_size=batch_size
+    )
+    return importer.run(iter_records(stream, fmt))
+
+
+def iter_bulk_export(target, fmt):
+    """Exporta o inventário em CSV/NDJSON com memória constante"""
+    spec = BULK_TARGETS[target]
+    model = spec['model']
+    rows = (row.to_dict() for row in model.query.order_by(model.id).yield_per(EXPORT_BATCH_SIZE))
+    return export_records(rows, fmt, ['id'] + spec['fields'] + ['created_at'])
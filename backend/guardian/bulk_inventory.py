@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Importação/exportação em lote de números e dispositivos.
+
+Exemplos:
+    python bulk_inventory.py import phone_numbers numeros.csv --country-code 55
+    python bulk_inventory.py import devices cpes.ndjson
+    python bulk_inventory.py export phone_numbers numeros.csv
+"""
+import argparse
+import json
+import sys
+import time
+
+from bulk_import import DEFAULT_BATCH_SIZE, detect_format, iter_bulk_export, run_bulk_import
+from dotenv import load_dotenv
+from models import create_cli_app
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importação/exportação em lote do inventário')
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('target', choices=['phone_numbers', 'devices'])
+    parser.add_argument('path', help='Arquivo CSV/NDJSON ("-" para stdin/stdout)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'])
+    parser.add_argument('--country-code', help='DDI aplicado a números sem "+" (ex.: 55)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+
+    # Só o banco: sem Socket.IO, login ou rotas (DATABASE_URL lido aqui, após o .env)
+    with create_cli_app().app_context():
+        if args.action == 'export':
+            out = sys.stdout if args.path == '-' else open(args.path, 'w', encoding='utf-8', newline='')
+            with out:
+                for chunk in iter_bulk_export(args.target, fmt):
+                    out.write(chunk)
+            return
+
+        source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8-sig', newline='')
+        start = time.perf_counter()
+        with source:
+            report = run_bulk_import(args.target, source, fmt, args.country_code, args.batch_size)
+        elapsed = time.perf_counter() - start
+
+        print(json.dumps(report, indent=2, ensure_ascii=False), file=sys.stderr)
+        print(f"{report['processed']} linhas em {elapsed:.1f}s "
+              f"({report['processed'] / elapsed if elapsed else 0:.0f} linhas/s), "
+              f"{report['error_count']} erros", file=sys.stderr)
+        if report['error_count']:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
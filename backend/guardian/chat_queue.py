@@ -0,0 +1,219 @@
+"""Fila de mensagens do chat: broker pub/sub local e envio em lote por sala.
+
+Com SOCKETIO_MESSAGE_QUEUE=redis://... o Flask-SocketIO usa o RedisManager e
+vários workers compartilham as salas. `local://host:porta` aponta para o
+LocalBroker deste módulo, um substituto do Redis para testes e desenvolvimento
+(rode `python chat_queue.py --port 6380`). O protocolo usa frames com prefixo de
+tamanho e payload pickle, como o RedisManager; use apenas em rede confiável.
+"""
+import argparse
+import logging
+import pickle
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!I')
+_SUBSCRIBE = b'S'
+_PUBLISH = b'P'
+
+
+def _send_frame(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('conexão encerrada pelo broker')
+        data += chunk
+    return data
+
+
+def _recv_frame(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _recv_exact(sock, size)
+
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        broker = self.server
+        subscribed = []
+        lock = threading.Lock()
+        try:
+            while True:
+                frame = _recv_frame(self.request)
+                op, channel, payload = frame[:1], *frame[1:].split(b'\0', 1)
+                if op == _SUBSCRIBE:
+                    with broker.lock:
+                        broker.subscribers[channel].append((self.request, lock))
+                    subscribed.append(channel)
+                elif op == _PUBLISH:
+                    broker.publish(channel, payload)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            with broker.lock:
+                for channel in subscribed:
+                    broker.subscribers[channel] = [
+                        entry for entry in broker.subscribers[channel] if entry[0] is not self.request
+                    ]
+
+
+class LocalBroker(socketserver.ThreadingTCPServer):
+    """Broker pub/sub mínimo: repassa cada publicação a todos os assinantes do canal"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=6380):
+        super().__init__((host, port), _BrokerHandler)
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(list)
+        self.published = 0
+
+    def publish(self, channel, payload):
+        with self.lock:
+            targets = list(self.subscribers[channel])
+            self.published += 1
+        frame = _HEADER.pack(len(payload)) + payload
+        for sock, lock in targets:
+            try:
+                with lock:
+                    sock.sendall(frame)
+            except OSError:
+                pass
+
+
+def start_local_broker(host='127.0.0.1', port=6380):
+    """Inicia o broker em uma thread daemon (testes e benchmarks)"""
+    broker = LocalBroker(host, port)
+    threading.Thread(target=broker.serve_forever, daemon=True).start()
+    return broker
+
+
+class LocalBrokerManager(socketio.PubSubManager):
+    """Gerenciador de clientes do python-socketio sobre o LocalBroker"""
+
+    name = 'local'
+
+    def __init__(self, url='local://127.0.0.1:6380', channel='flask-socketio', write_only=False, logger=None):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or '127.0.0.1', parsed.port or 6380)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _frame(self, op, payload=b''):
+        return op + self.channel.encode() + b'\0' + payload
+
+    def _publish(self, data):
+        payload = self._frame(_PUBLISH, pickle.dumps(data))
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = socket.create_connection(self.address)
+                    _send_frame(self._publisher, payload)
+                    return
+                except OSError:
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    def _listen(self):
+        retry = 1
+        while True:
+            try:
+                with socket.create_connection(self.address) as sock:
+                    _send_frame(sock, self._frame(_SUBSCRIBE))
+                    retry = 1
+                    while True:
+                        yield _recv_frame(sock)
+            except (ConnectionError, OSError):
+                logger.warning('Conexão com o broker perdida, reconectando em %ss', retry)
+                time.sleep(retry)
+                retry = min(retry * 2, 30)
+
+
+def create_client_manager(url, channel='flask-socketio'):
+    """Kwargs do SocketIO para a fila configurada (vazio sem fila)"""
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': LocalBrokerManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+
+class MessageBatcher:
+    """Agrupa mensagens por sala e as persiste/emite a cada `interval` segundos.
+
+    Um único emit por sala e lote reduz o tráfego na fila e os envios por
+    cliente; `max_batch` força o envio antecipado de lotes grandes.
+    """
+
+    def __init__(self, socketio_server, persist=None, event='messages', interval=0.05, max_batch=500):
+        self.socketio = socketio_server
+        self.persist = persist
+        self.event = event
+        self.interval = interval
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = defaultdict(list)
+        self._size = 0
+        self._task = None
+        self.stats = {'messages': 0, 'batches': 0, 'emits': 0, 'persist_errors': 0}
+
+    def add(self, room, payload):
+        with self._lock:
+            self._pending[room].append(payload)
+            self._size += 1
+            self.stats['messages'] += 1
+            full = self._size >= self.max_batch
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+        if full:
+            self.flush()
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._size:
+                return
+            pending, self._pending = self._pending, defaultdict(list)
+            self._size = 0
+        self.stats['batches'] += 1
+        if self.persist is not None:
+            try:
+                self.persist(pending)
+            except Exception:
+                self.stats['persist_errors'] += 1
+                logger.exception('Falha ao persistir mensagens do chat')
+        for room, messages in pending.items():
+            self.socketio.emit(self.event, messages, to=room)
+            self.stats['emits'] += 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Broker pub/sub local para o SocketIO do Guardian')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = LocalBroker(args.host, args.port)
+    logger.info('Broker local em %s:%s', args.host, args.port)
+    server.serve_forever()
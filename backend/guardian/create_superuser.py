@@ -1,11 +1,14 @@
 
 #!/usr/bin/env python3
-from app import app, db, User
+from models import create_cli_app, db, User
 from dotenv import load_dotenv
 from datetime import datetime
 
 load_dotenv()
 
+# Só o banco: sem Socket.IO, login ou rotas
+app = create_cli_app()
+
 with app.app_context():
     # Verificar se super usuário já existe
     super_user = User.query.filter_by(email='rafael.ziviani@live.com').first()
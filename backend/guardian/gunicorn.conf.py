@@ -0,0 +1,37 @@
+"""Configuração do gunicorn para o Guardian em produção.
+
+Uso: gunicorn -c gunicorn.conf.py app:app
+As tabelas não são criadas aqui; rode `python init_db.py` antes do primeiro start.
+"""
+import os
+
+bind = os.environ.get('GUARDIAN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUARDIAN_WORKER_CLASS', 'eventlet')
+# O Socket.IO com long-polling exige sessão fixa no mesmo worker: com mais de um
+# worker, use só transporte websocket ou várias instâncias atrás do nginx com
+# ip_hash. SOCKETIO_MESSAGE_QUEUE compartilha as salas entre os workers.
+workers = int(os.environ.get('GUARDIAN_WORKERS', '1'))
+worker_connections = int(os.environ.get('GUARDIAN_WORKER_CONNECTIONS', '1000'))
+timeout = int(os.environ.get('GUARDIAN_TIMEOUT', '60'))
+graceful_timeout = int(os.environ.get('GUARDIAN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUARDIAN_KEEPALIVE', '5'))
+accesslog = os.environ.get('GUARDIAN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUARDIAN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """psycopg2 cooperativo: sem isso cada consulta ao PostgreSQL bloqueia o worker inteiro"""
+    if not os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+        return
+    try:
+        if worker_class == 'eventlet':
+            from psycogreen.eventlet import patch_psycopg
+        elif worker_class == 'gevent':
+            from psycogreen.gevent import patch_psycopg
+        else:
+            return
+    except ImportError:
+        server.log.warning('psycogreen não instalado: consultas ao PostgreSQL bloqueiam o worker %s', worker_class)
+        return
+    patch_psycopg()
@@ -1,11 +1,51 @@
 
 #!/usr/bin/env python3
-from app import app, db
+from models import create_cli_app, db
 from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.exc import IntegrityError
 
 load_dotenv()
 
+# Índices substituídos por outros e removidos de bancos já existentes: {tabela: [nomes]}
+OBSOLETE_INDEXES = {
+    # Coberto pelo composto ix_phone_number_client_name_portability_status
+    'phone_number': ['ix_phone_number_client_name'],
+}
+
+# Só o banco: sem Socket.IO, login ou rotas
+app = create_cli_app()
+
 with app.app_context():
     print("Criando tabelas do banco de dados...")
     db.create_all()
+    # create_all não adiciona colunas nem índices novos a tabelas já existentes
+    inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                                            f'{column.type.compile(db.engine.dialect)}'))
+                print(f"Coluna {table.name}.{column.name} adicionada")
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                # IF NOT EXISTS em vez de checkfirst: o SQLite não reflete índices de expressão
+                # (uq_update_job_active) e o checkfirst tentaria recriá-lo
+                with db.engine.begin() as connection:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            except IntegrityError:
+                # Índice unique sobre dados já duplicados: precisa de correção manual
+                print(f"Aviso: índice {index.name} não criado (valores duplicados em {table.name})")
+    for table_name, names in OBSOLETE_INDEXES.items():
+        existing = {index['name'] for index in inspector.get_indexes(table_name)}
+        for name in names:
+            if name in existing:
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'DROP INDEX {name}'))
+                print(f"Índice obsoleto {name} removido")
     print("Tabelas criadas com sucesso!")
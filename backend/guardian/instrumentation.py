@@ -0,0 +1,101 @@
+"""Instrumentação opcional do Guardian: histogramas por rota, consultas SQL por
+requisição, /metrics no formato texto do Prometheus e profiler por amostragem.
+
+Ativada com GUARDIAN_METRICS=1. Com GUARDIAN_PROFILE_SLOW_MS > 0 uma thread do
+SO amostra a pilha das requisições em andamento a cada
+GUARDIAN_PROFILE_INTERVAL_MS; as pilhas das requisições mais lentas que o
+limite ficam disponíveis no formato "collapsed" (flamegraph.pl, speedscope).
+Histogramas, contadores e o profiler vêm de backend/shared/metrics_core.py.
+"""
+import os
+import sys
+import time
+
+from flask import g, has_request_context, request
+
+# backend/shared (no repositório) ou /shared (imagem Docker): módulos comuns aos dois serviços
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+
+from metrics_core import COUNT_BUCKETS, BaseInstrumentation, Counter, Gauge, Histogram, _threading  # noqa: E402
+
+
+def current_frame_getter():
+    """Função que devolve o frame atual da requisição: greenlet (eventlet) ou thread"""
+    thread_id = _threading.get_ident()
+    try:
+        import greenlet
+        current = greenlet.getcurrent()
+    except ImportError:
+        current = None
+    if current is None or current.parent is None:
+        return lambda frames: frames.get(thread_id)
+    # Greenlet suspensa: gr_frame; em execução: o frame atual da thread do SO
+    return lambda frames: current.gr_frame or frames.get(thread_id)
+
+
+class Instrumentation(BaseInstrumentation):
+    def __init__(self, prefix='guardian', slow_threshold=0.0, interval=0.005):
+        super().__init__(prefix, slow_threshold, interval)
+        self.requests = self.add(Histogram(f'{prefix}_http_request_duration_seconds', 'Duração das requisições HTTP',
+                                           ('method', 'route', 'status')))
+        self.sql_queries = self.add(Histogram(f'{prefix}_http_request_sql_queries', 'Consultas SQL por requisição',
+                                              ('route',), COUNT_BUCKETS))
+        self.sql_time = self.add(Histogram(f'{prefix}_http_request_sql_seconds',
+                                           'Tempo em consultas SQL por requisição', ('route',)))
+        self.sql_total = self.add(Counter(f'{prefix}_sql_queries_total', 'Consultas SQL executadas', ('context',)))
+        self.in_flight = self.add(Gauge(f'{prefix}_http_requests_in_flight', 'Requisições HTTP em andamento'))
+
+    @classmethod
+    def from_env(cls, prefix='guardian'):
+        return super().from_env(prefix)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def instrument_engine(self, target):
+        """Conta consultas e tempo em SQL (engine ou a classe Engine)"""
+        from sqlalchemy import event
+
+        event.listen(target, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(target, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        g._metrics = {'start': time.perf_counter(), 'sql_queries': 0, 'sql_time': 0.0, 'status': 500}
+        self.in_flight.inc(1)
+        profiler = self.profiler
+        if profiler is not None:
+            g._metrics['profile'] = (profiler, profiler.begin(current_frame_getter()))
+
+    def _after_request(self, response):
+        if '_metrics' in g:
+            g._metrics['status'] = response.status_code
+        return response
+
+    def _teardown_request(self, exc=None):
+        state = g.pop('_metrics', None)
+        if state is None:
+            return
+        duration = time.perf_counter() - state['start']
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        self.in_flight.inc(-1)
+        self.requests.observe(duration, request.method, route, str(state['status']))
+        self.sql_queries.observe(state['sql_queries'], route)
+        self.sql_time.observe(state['sql_time'], route)
+        if 'profile' in state:
+            profiler, token = state['profile']
+            profiler.end(token, f'{request.method} {route}', duration)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metrics_start')
+        elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+        if has_request_context() and '_metrics' in g:
+            g._metrics['sql_queries'] += 1
+            g._metrics['sql_time'] += elapsed
+            self.sql_total.inc(1, 'request')
+        else:
+            self.sql_total.inc(1, 'background')
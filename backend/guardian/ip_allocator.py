@@ -0,0 +1,398 @@
+"""Alocador de blocos IP baseado em árvore de prefixos (Patricia trie).
+
+Os prefixos são indexados como inteiros (IPv4 e IPv6 em árvores separadas),
+de modo que consultas de dono de um IP, sobreposição de CIDR e próxima sub-rede
+livre custam O(tamanho do prefixo) em vez de varrer todas as linhas de IPBlock.
+Cada nó guarda o tamanho do maior bloco livre alinhado da sua subárvore
+(`best`), atualizado no caminho a cada inserção/remoção: a busca por sub-rede
+livre desce direto ao primeiro ramo com espaço, sem percorrer faixas cheias.
+"""
+import ipaddress
+import socket
+import threading
+
+
+class PrefixConflict(ValueError):
+    """Prefixo já alocado ou sobreposto a outra alocação"""
+
+
+class _Node:
+    __slots__ = ('key', 'length', 'children', 'value', 'best')
+
+    def __init__(self, key, length, value=None):
+        self.key = key
+        self.length = length
+        self.children = [None, None]
+        self.value = value
+        # Menor comprimento de prefixo livre dentro do nó; > width quando não há espaço livre
+        self.best = length if value is None else 1 << 30
+
+
+class PrefixTrie:
+    """Patricia trie binária de prefixos inteiros com `width` bits"""
+
+    def __init__(self, width):
+        self.width = width
+        self.root = _Node(0, 0)
+        self.size = 0
+
+    def _mask(self, key, length):
+        if length == 0:
+            return 0
+        shift = self.width - length
+        return (key >> shift) << shift
+
+    def _bit(self, key, position):
+        return (key >> (self.width - 1 - position)) & 1
+
+    def insert(self, key, length, value):
+        """Insere o prefixo; se já existir, substitui e retorna o valor antigo"""
+        old = self._insert(key, length, value)
+        self._refresh_path(key, length)
+        return old
+
+    def _insert(self, key, length, value):
+        width = self.width
+        node = self.root
+        if length == 0:
+            old, node.value = node.value, value
+            if old is None:
+                self.size += 1
+            return old
+
+        while True:
+            bit = (key >> (width - 1 - node.length)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(key, length, value)
+                self.size += 1
+                return None
+
+            child_length = child.length
+            limit = child_length if child_length < length else length
+            common = limit - (((child.key ^ key) >> (width - limit)).bit_length())
+            if common == child_length:
+                if common == length:
+                    old, child.value = child.value, value
+                    if old is None:
+                        self.size += 1
+                    return old
+                node = child
+                continue
+
+            self.size += 1
+            if common == length:
+                # Novo prefixo é ancestral do filho atual
+                new = _Node(key, length, value)
+                new.children[self._bit(child.key, length)] = child
+                node.children[bit] = new
+                return None
+
+            # Divide o ramo no primeiro bit divergente
+            split = _Node(self._mask(key, common), common)
+            split.children[self._bit(child.key, common)] = child
+            split.children[self._bit(key, common)] = _Node(key, length, value)
+            node.children[bit] = split
+            return None
+
+    def remove(self, key, length):
+        """Remove o prefixo e compacta os nós intermediários; retorna o valor removido"""
+        path = []
+        node = self.root
+        while node.length < length:
+            bit = self._bit(key, node.length)
+            child = node.children[bit]
+            if child is None or child.length > length or (child.key ^ key) >> (self.width - child.length):
+                return None
+            path.append((node, bit))
+            node = child
+
+        if node.length != length or node.key != key or node.value is None:
+            return None
+
+        old, node.value = node.value, None
+        self.size -= 1
+
+        # Remove nós sem valor com menos de dois filhos, subindo pelo caminho
+        while path and node.value is None:
+            parent, bit = path.pop()
+            children = [c for c in node.children if c is not None]
+            if len(children) == 2:
+                break
+            parent.children[bit] = children[0] if children else None
+            node = parent
+        self._refresh_path(key, length)
+        return old
+
+    def _path(self, key, length):
+        """Nós cujo prefixo contém (key, length), da raiz para baixo"""
+        width = self.width
+        node = self.root
+        path = [node]
+        while node.length < length:
+            child = node.children[(key >> (width - 1 - node.length)) & 1]
+            if child is None or child.length > length or (child.key ^ key) >> (width - child.length):
+                break
+            path.append(child)
+            node = child
+        return path
+
+    def _half_best(self, node, bit):
+        child = node.children[bit]
+        if child is None:
+            return node.length + 1
+        if child.length == node.length + 1:
+            return child.best
+        # Filho mais profundo: a outra metade do nível logo abaixo está livre
+        return node.length + 2
+
+    def _refresh_path(self, key, length):
+        for node in reversed(self._path(key, length)):
+            if node.value is not None:
+                node.best = 1 << 30
+            elif node.children[0] is None and node.children[1] is None:
+                node.best = node.length
+            else:
+                node.best = min(self._half_best(node, 0), self._half_best(node, 1))
+
+    def free_length(self, key, length):
+        """Menor comprimento de prefixo livre alinhado dentro de (key, length)"""
+        node = self._find(key, length)
+        if node is None:
+            return length
+        if node.length > length:
+            # Só a subárvore de `node` ocupa a faixa: a metade que não o contém está livre
+            return length + 1
+        return node.best
+
+    def first_free(self, key, length, prefixlen):
+        """Primeiro prefixo /prefixlen livre (sem nada dentro nem cobrindo) em (key, length), ou None"""
+        if self.free_length(key, length) > prefixlen:
+            return None
+        while length < prefixlen:
+            length += 1
+            if self.free_length(key, length) > prefixlen:
+                key |= 1 << (self.width - length)
+        return key
+
+    def get(self, key, length):
+        node = self._find(key, length)
+        return node.value if node is not None and node.length == length else None
+
+    def _find(self, key, length):
+        """Primeiro nó cujo prefixo está contido em (key, length), ou None"""
+        width = self.width
+        node = self.root
+        while node.length < length:
+            child = node.children[(key >> (width - 1 - node.length)) & 1]
+            if child is None:
+                return None
+            shift = width - min(child.length, length)
+            if (child.key ^ key) >> shift:
+                return None
+            node = child
+        return node
+
+    def covering(self, key, length):
+        """Prefixos com valor que contêm (key, length), do mais curto ao mais longo"""
+        width = self.width
+        node = self.root
+        found = []
+        while True:
+            if node.value is not None:
+                found.append(node)
+            if node.length >= length:
+                break
+            child = node.children[(key >> (width - 1 - node.length)) & 1]
+            if child is None or child.length > length or (child.key ^ key) >> (width - child.length):
+                break
+            node = child
+        return found
+
+    def longest_match(self, key):
+        matches = self.covering(key, self.width)
+        return matches[-1] if matches else None
+
+    def has_inside(self, key, length):
+        """Indica se existe algum prefixo com valor contido em (key, length)"""
+        node = self._find(key, length)
+        if node is None:
+            return False
+        # Nós sem valor diferentes da raiz sempre possuem dois filhos
+        return node is not self.root or node.value is not None or any(node.children)
+
+    def iter_inside(self, key, length, limit=None):
+        """Percorre os prefixos com valor contidos em (key, length)"""
+        start = self._find(key, length)
+        if start is None:
+            return
+        stack = [start]
+        count = 0
+        while stack:
+            node = stack.pop()
+            if node.value is not None:
+                yield node
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            for child in reversed(node.children):
+                if child is not None:
+                    stack.append(child)
+
+
+def parse_address(address):
+    """Converte um IP em (versão, inteiro) sem o custo de construir objetos ipaddress"""
+    address = address.strip()
+    version, family = (6, socket.AF_INET6) if ':' in address else (4, socket.AF_INET)
+    try:
+        packed = socket.inet_pton(family, address)
+    except OSError:
+        raise ValueError(f'Endereço IP inválido: {address!r}') from None
+    return version, int.from_bytes(packed, 'big')
+
+
+def parse_network(cidr):
+    """Converte um CIDR em (versão, inteiro da rede, tamanho do prefixo)"""
+    address, _, prefix = cidr.strip().partition('/')
+    version, key = parse_address(address)
+    width = 32 if version == 4 else 128
+    if not prefix:
+        return version, key, width
+    if not prefix.isdigit() or int(prefix) > width:
+        raise ValueError(f'Prefixo inválido: {cidr!r}')
+    length = int(prefix)
+    shift = width - length
+    return version, (key >> shift) << shift, length
+
+
+def format_network(version, key, length):
+    cls = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+    return str(cls((key, length)))
+
+
+class IPAllocator:
+    """Índice em memória de blocos (`network`) e alocações (`allocated_network`) de IPBlock"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._pools = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+            self._allocations = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+            self._blocks = {}
+
+    def load(self, blocks):
+        """Carrega um iterável de (id, network, allocated_network); retorna ids ignorados"""
+        skipped = []
+        with self._lock:
+            self.clear()
+            for block_id, network, allocated_network in blocks:
+                try:
+                    self.add(block_id, network, allocated_network)
+                except ValueError:
+                    skipped.append(block_id)
+        return skipped
+
+    def add(self, block_id, network, allocated_network=None):
+        pool = parse_network(network)
+        allocation = parse_network(allocated_network) if allocated_network else None
+        if allocation is not None:
+            if allocation[0] != pool[0]:
+                raise ValueError('Alocação e bloco com versões de IP diferentes')
+            width = 32 if pool[0] == 4 else 128
+            if allocation[2] < pool[2] or allocation[1] >> (width - pool[2]) != pool[1] >> (width - pool[2]):
+                raise ValueError(f'{allocated_network} não está contido no bloco {network}')
+
+        with self._lock:
+            if allocation is not None:
+                version, key, length = allocation
+                trie = self._allocations[version]
+                conflicts = [node for node in trie.covering(key, length) + list(trie.iter_inside(key, length, 2))
+                             if node.value != block_id]
+                if conflicts:
+                    raise PrefixConflict(f'{allocated_network} sobrepõe a alocação '
+                                         f'{format_network(version, conflicts[0].key, conflicts[0].length)} '
+                                         f'do bloco {conflicts[0].value}')
+            if block_id in self._blocks:
+                self.remove(block_id)
+            if allocation is not None:
+                trie.insert(key, length, block_id)
+
+            version, key, length = pool
+            owners = self._pools[version].get(key, length)
+            if owners is None:
+                owners = {}
+                self._pools[version].insert(key, length, owners)
+            owners[block_id] = allocation is not None
+            self._blocks[block_id] = (pool, allocation)
+
+    def remove(self, block_id):
+        with self._lock:
+            entry = self._blocks.pop(block_id, None)
+            if entry is None:
+                return False
+            pool, allocation = entry
+            if allocation is not None:
+                self._allocations[allocation[0]].remove(allocation[1], allocation[2])
+
+            version, key, length = pool
+            owners = self._pools[version].get(key, length)
+            if owners is not None:
+                owners.pop(block_id, None)
+                if not owners:
+                    self._pools[version].remove(key, length)
+            return True
+
+    def owner_of(self, ip):
+        """Alocação mais específica (ou bloco) que contém o IP"""
+        version, key = parse_address(ip)
+        with self._lock:
+            node = self._allocations[version].longest_match(key)
+            if node is not None:
+                return {
+                    'block_id': node.value,
+                    'kind': 'allocation',
+                    'network': format_network(version, node.key, node.length)
+                }
+            node = self._pools[version].longest_match(key)
+            if node is not None:
+                # Prefere a linha que representa o bloco em si (sem alocação)
+                owners = node.value
+                block_id = next((i for i, allocated in owners.items() if not allocated), None)
+                return {
+                    'block_id': block_id if block_id is not None else next(iter(owners)),
+                    'kind': 'block',
+                    'network': format_network(version, node.key, node.length)
+                }
+        return None
+
+    def overlaps(self, cidr, limit=100):
+        """Alocações que contêm ou estão contidas no CIDR informado"""
+        version, key, length = parse_network(cidr)
+        trie = self._allocations[version]
+        with self._lock:
+            nodes = trie.covering(key, length)
+            nodes += [n for n in trie.iter_inside(key, length, limit) if n.length > length]
+        return [{
+            'block_id': node.value,
+            'network': format_network(version, node.key, node.length)
+        } for node in nodes[:limit]]
+
+    def next_free(self, block_id, prefixlen):
+        """Primeira sub-rede /prefixlen livre dentro do bloco, ou None"""
+        with self._lock:
+            entry = self._blocks.get(block_id)
+            if entry is None:
+                raise KeyError(block_id)
+            version, base, base_length = entry[0]
+            trie = self._allocations[version]
+            if not base_length <= prefixlen <= trie.width:
+                raise ValueError('Tamanho de prefixo fora do bloco')
+
+            # Alocação que cobre o bloco inteiro
+            if trie.covering(base, base_length):
+                return None
+            key = trie.first_free(base, base_length, prefixlen)
+        return None if key is None else format_network(version, key, prefixlen)
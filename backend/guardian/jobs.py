@@ -0,0 +1,145 @@
+"""Execução de comandos longos (atualização do sistema) em segundo plano.
+
+O processo roda em tarefas de fundo do Socket.IO: cada linha de stdout/stderr é
+emitida para a sala do job assim que lida, e o log é persistido em blocos a cada
+`flush_interval` segundos. O worker HTTP só cria o job e devolve o id.
+"""
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+
+class JobAlreadyRunning(Exception):
+    """Já existe um job em execução neste processo"""
+
+    def __init__(self, job_id):
+        super().__init__(f'Job {job_id} em execução')
+        self.job_id = job_id
+
+
+class CommandRunner:
+    """Executa um comando por vez e transmite sua saída linha a linha.
+
+    `persist_output(job_id, texto)` recebe os blocos de log e
+    `persist_status(job_id, status, return_code)` as mudanças de estado.
+    """
+
+    def __init__(self, socketio_server, persist_output=None, persist_status=None, timeout=300,
+                 flush_interval=0.5, event='job_output', status_event='job_status'):
+        self.socketio = socketio_server
+        self.persist_output = persist_output
+        self.persist_status = persist_status
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.event = event
+        self.status_event = status_event
+        self.current = None
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+
+    @staticmethod
+    def room(job_id):
+        return f'job:{job_id}'
+
+    def start(self, job_id, command):
+        with self._lock:
+            if self.current is not None:
+                raise JobAlreadyRunning(self.current)
+            self.current = job_id
+        self.socketio.start_background_task(self._run, job_id, list(command))
+
+    def _subprocess(self):
+        """Módulo subprocess cooperativo no modo assíncrono do servidor"""
+        mode = getattr(self.socketio, 'async_mode', None)
+        if mode == 'eventlet':
+            from eventlet.green import subprocess as green_subprocess
+            return green_subprocess
+        if mode == 'gevent':
+            import gevent.subprocess
+            return gevent.subprocess
+        return subprocess
+
+    def _run(self, job_id, command):
+        status, return_code = FAILED, None
+        popen = self._subprocess()
+        try:
+            try:
+                # Sessão própria: no tempo limite o grupo inteiro (script e filhos) é encerrado
+                process = popen.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                      stdin=subprocess.DEVNULL, text=True, bufsize=1, errors='replace',
+                                      start_new_session=True)
+            except OSError as e:
+                self._line(job_id, 'stderr', f'Falha ao iniciar {command[0]}: {e}')
+                return
+            self._set_status(job_id, RUNNING)
+
+            pending = [process.stdout, process.stderr]
+            for pipe, stream in ((process.stdout, 'stdout'), (process.stderr, 'stderr')):
+                self.socketio.start_background_task(self._pump, job_id, pipe, stream, pending)
+
+            deadline = time.monotonic() + self.timeout
+            while process.poll() is None:
+                self.socketio.sleep(self.flush_interval)
+                self._flush(job_id)
+                if time.monotonic() > deadline:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
+                    self._line(job_id, 'stderr', f'Tempo limite de {self.timeout}s excedido')
+                    status = TIMEOUT
+                    break
+            # Aguarda os leitores esvaziarem os pipes
+            while pending:
+                self.socketio.sleep(0.05)
+            return_code = process.returncode
+            if status != TIMEOUT:
+                status = SUCCEEDED if return_code == 0 else FAILED
+        except Exception:
+            logger.exception('Falha ao executar o job %s', job_id)
+        finally:
+            self._flush(job_id)
+            self._set_status(job_id, status, return_code)
+            with self._lock:
+                self.current = None
+
+    def _pump(self, job_id, pipe, stream, pending):
+        try:
+            for line in pipe:
+                self._line(job_id, stream, line.rstrip('\n'))
+        finally:
+            pipe.close()
+            pending.remove(pipe)
+
+    def _line(self, job_id, stream, line):
+        with self._buffer_lock:
+            self._buffer.append(f'[{stream}] {line}' if stream == 'stderr' else line)
+        self.socketio.emit(self.event, {'job_id': job_id, 'stream': stream, 'line': line},
+                           to=self.room(job_id))
+
+    def _flush(self, job_id):
+        with self._buffer_lock:
+            lines, self._buffer = self._buffer, []
+        if lines and self.persist_output is not None:
+            try:
+                self.persist_output(job_id, '\n'.join(lines) + '\n')
+            except Exception:
+                logger.exception('Falha ao persistir o log do job %s', job_id)
+
+    def _set_status(self, job_id, status, return_code=None):
+        if self.persist_status is not None:
+            try:
+                self.persist_status(job_id, status, return_code)
+            except Exception:
+                logger.exception('Falha ao persistir o estado do job %s', job_id)
+        self.socketio.emit(self.status_event, {'job_id': job_id, 'status': status, 'return_code': return_code},
+                           to=self.room(job_id))
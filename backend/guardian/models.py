@@ -0,0 +1,189 @@
+"""Banco de dados e modelos do Guardian, sem rotas nem extensões web.
+
+Importado pela aplicação (app.create_app) e pelos scripts de linha de comando
+(init_db.py, create_superuser.py), que assim não carregam Socket.IO, eventlet
+nem numpy só para acessar o banco.
+"""
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+
+import sqlalchemy
+from flask import Flask
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import generate_password_hash, check_password_hash
+
+db = SQLAlchemy()
+
+def _env_flag(name, default):
+    return os.environ.get(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def engine_options(uri):
+    """Opções do engine: pool configurável no PostgreSQL; timeout de lock no SQLite"""
+    options = {'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', 'true')}
+    if uri.startswith('sqlite'):
+        options['connect_args'] = {'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '30'))}
+        return options
+    options.update(
+        pool_size=int(os.environ.get('DB_POOL_SIZE', '10')),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', '20')),
+        pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+        pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+    )
+    return options
+
+@sqlalchemy.event.listens_for(sqlalchemy.engine.Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL no SQLite: leituras não bloqueiam a escrita de outro worker"""
+    if isinstance(dbapi_connection, sqlite3.Connection) and _env_flag('SQLITE_WAL', 'true'):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+def configure(app):
+    """Configuração do banco a partir do ambiente (DATABASE_URL) e registro do db na aplicação"""
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', os.environ.get('DATABASE_URL', 'sqlite:///guardian.db'))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+    return app
+
+def create_cli_app():
+    """Aplicação mínima para scripts: só o banco, sem rotas, login ou Socket.IO"""
+    return configure(Flask(__name__))
+
+# Modelos
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128))
+    role = db.Column(db.String(50), default='user')
+    status = db.Column(db.String(20), default='pending')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    approved_at = db.Column(db.DateTime)
+    approved_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # Organização definida pelo administrador (isola chat e histórico); sem ela, sala só do usuário
+    tenant = db.Column(db.String(100), index=True)
+
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def check_password(self, password):
+        return check_password_hash(self.password_hash, password)
+
+class SystemConfig(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    value = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Device(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    ip_address = db.Column(db.String(39), nullable=False)
+    mac_address = db.Column(db.String(17))
+    device_type = db.Column(db.String(50), index=True)
+    status = db.Column(db.String(20), default='active', index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'ip_address': self.ip_address,
+            'mac_address': self.mac_address,
+            'device_type': self.device_type,
+            'status': self.status,
+            'created_at': self.created_at.isoformat()
+        }
+
+class IPBlock(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    network = db.Column(db.String(43), nullable=False)  # CIDR (IPv4/IPv6)
+    gateway = db.Column(db.String(39))
+    client_name = db.Column(db.String(100), index=True)
+    # Unique: dois workers não gravam a mesma sub-rede (NULL = bloco sem alocação)
+    allocated_network = db.Column(db.String(43), unique=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'network': self.network,
+            'gateway': self.gateway,
+            'client_name': self.client_name,
+            'allocated_network': self.allocated_network,
+            'created_at': self.created_at.isoformat()
+        }
+
+class PhoneNumber(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    client_name = db.Column(db.String(100), nullable=False)
+    number = db.Column(db.String(20), nullable=False, unique=True)
+    portability_status = db.Column(db.String(20), default='jbm_line', index=True)
+    provider = db.Column(db.String(50), default='tsinfo', index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # "Números portados do cliente X": o índice composto também atende filtros só por client_name
+    __table_args__ = (db.Index('ix_phone_number_client_name_portability_status', 'client_name', 'portability_status'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'client_name': self.client_name,
+            'number': self.number,
+            'portability_status': self.portability_status,
+            'provider': self.provider,
+            'created_at': self.created_at.isoformat()
+        }
+
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    room = db.Column(db.String(200), nullable=False)
+    user_email = db.Column(db.String(120), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_chat_message_room_created_at', 'room', 'created_at'),)
+
+    def to_dict(self):
+        return {
+            'room': self.room,
+            'user': self.user_email,
+            'message': self.message,
+            'timestamp': self.created_at.isoformat()
+        }
+
+UPDATE_ACTIVE_STATUSES = ('queued', 'running')  # 'running' = jobs.RUNNING
+
+class UpdateJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    command = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), default='queued', index=True)
+    return_code = db.Column(db.Integer)
+    output = db.Column(db.Text, default='')
+    started_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    # No máximo um job ativo entre todos os workers: o INSERT concorrente falha com IntegrityError
+    __table_args__ = (db.Index('uq_update_job_active', status.in_(UPDATE_ACTIVE_STATUSES), unique=True,
+                               sqlite_where=status.in_(UPDATE_ACTIVE_STATUSES),
+                               postgresql_where=status.in_(UPDATE_ACTIVE_STATUSES)),)
+
+    def to_dict(self, offset=0):
+        return {
+            'id': self.id,
+            'command': self.command,
+            'status': self.status,
+            'return_code': self.return_code,
+            'output': (self.output or '')[offset:],
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
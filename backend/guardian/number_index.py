@@ -0,0 +1,230 @@
+"""Índice em memória de números E.164 para busca por prefixo, faixa e alocação de DIDs livres.
+
+Cada número normalizado (somente dígitos, até 15) vira uma chave int64
+`int(dígitos completados com zeros à direita até 15) * 16 + comprimento`: a
+ordem das chaves é a ordem lexicográfica dos números, de modo que um prefixo
+ou uma faixa de números de mesmo comprimento é um intervalo contíguo do array
+ordenado, encontrado com busca binária (searchsorted). O índice guarda o id
+de PhoneNumber de cada chave e acompanha a tabela por id crescente (`extend`).
+"""
+import threading
+
+import numpy as np
+
+MAX_DIGITS = 15
+_POW10 = 10 ** np.arange(MAX_DIGITS - 1, -1, -1, dtype=np.int64)
+_SCALE = 10 ** (MAX_DIGITS - np.arange(MAX_DIGITS + 1, dtype=np.int64))  # 10^(15 - comprimento)
+LOAD_CHUNK = 1_000_000
+
+
+def normalize(number):
+    """Dígitos E.164 de um número ('+55 11 3000-0000' -> '551130000000'); None se inválido"""
+    digits = ''.join(ch for ch in str(number) if ch.isdigit())
+    if str(number).lstrip().startswith('00'):
+        digits = digits[2:]
+    return digits if 0 < len(digits) <= MAX_DIGITS else None
+
+
+def encode(digits):
+    return int(digits.ljust(MAX_DIGITS, '0')) * 16 + len(digits)
+
+
+def decode(keys):
+    """Chaves -> números '+<dígitos>'"""
+    keys = np.asarray(keys, dtype=np.int64)
+    lengths = keys & 15
+    values = (keys >> 4) // _SCALE[lengths]
+    return [f'+{value:0{length}d}' for value, length in zip(values.tolist(), lengths.tolist())]
+
+
+def encode_many(numbers):
+    """Codificação vetorizada; retorna (chaves, máscara dos números válidos)"""
+    raw = np.array([str(n).lstrip('+') for n in numbers], dtype=f'S{MAX_DIGITS + 1}')
+    chars = raw.view(np.uint8).reshape(len(raw), MAX_DIGITS + 1)
+    present = chars != 0
+    lengths = present.sum(axis=1)
+    # Válido: somente dígitos, contíguos desde o início, entre 1 e 15
+    digit = (chars >= 48) & (chars <= 57)
+    valid = (digit == present).all(axis=1) & (lengths > 0) & (lengths <= MAX_DIGITS)
+    values = np.where(digit[:, :MAX_DIGITS], chars[:, :MAX_DIGITS] - 48, 0).astype(np.int64) @ _POW10
+    keys = values * 16 + lengths
+    # Formatos fora do padrão (espaços, traços, 00 internacional) passam pela normalização completa
+    for position in np.nonzero(~valid)[0].tolist():
+        digits = normalize(numbers[position])
+        if digits is not None:
+            keys[position] = encode(digits)
+            valid[position] = True
+    return keys, valid
+
+
+def prefix_bounds(prefix):
+    """Intervalo [low, high) de chaves dos números que começam com `prefix`"""
+    # + comprimento do prefixo: números mais curtos que ele ('55113' para '551130') ficam de fora
+    low = int(prefix.ljust(MAX_DIGITS, '0')) * 16 + len(prefix)
+    high = (int(prefix) + 1) * 10 ** (MAX_DIGITS - len(prefix)) * 16
+    return low, high
+
+
+class NumberIndex:
+    """Array ordenado de chaves (int64) e ids de PhoneNumber, com trava para uso entre threads"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.keys = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.last_id = 0
+        self.skipped = 0
+        self.loaded = False  # primeira carga completa (reload) concluída
+
+    def __len__(self):
+        return len(self.keys)
+
+    def extend(self, rows):
+        """Acrescenta linhas (id, número) em ordem crescente de id; números inválidos são ignorados"""
+        ids, numbers = [], []
+        added = 0
+        for row_id, number in rows:
+            ids.append(row_id)
+            numbers.append(number)
+            if len(ids) >= LOAD_CHUNK:
+                added += self._merge(ids, numbers)
+                ids, numbers = [], []
+        if ids:
+            added += self._merge(ids, numbers)
+        return added
+
+    def sync(self, load_since):
+        """Incorpora as linhas devolvidas por `load_since(last_id)` (ids maiores que o último visto)"""
+        with self._lock:
+            return self.extend(load_since(self.last_id))
+
+    def reload(self, rows):
+        """Recarrega o índice inteiro a partir de `rows` e troca os arrays de uma vez
+
+        Recupera linhas que `sync` não vê: ids commitados fora de ordem (sequências do
+        PostgreSQL) e números removidos.
+        """
+        fresh = NumberIndex()
+        fresh.extend(rows)
+        with self._lock:
+            self.keys, self.ids = fresh.keys, fresh.ids
+            self.last_id, self.skipped = fresh.last_id, fresh.skipped
+            self.loaded = True
+        return len(fresh)
+
+    def add_missing(self, rows):
+        """Acrescenta linhas (id, número) com id até `last_id` que ainda não estão no índice
+
+        Usado após um conflito na alocação: números commitados fora de ordem de id
+        entram sem esperar a próxima recarga. Ids maiores ficam para o `sync`.
+        """
+        with self._lock:
+            rows = [(row_id, number) for row_id, number in rows if row_id <= self.last_id]
+            if not rows:
+                return 0
+            keys, valid = encode_many([number for _, number in rows])
+            positions = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+            present = (self.keys[positions] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+            missing = (valid & ~present).tolist()
+            rows = [row for row, keep in zip(rows, missing) if keep]
+            if not rows:
+                return 0
+            return self._merge([row_id for row_id, _ in rows], [number for _, number in rows])
+
+    def _merge(self, ids, numbers):
+        keys, valid = encode_many(numbers)
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            self.last_id = max(self.last_id, int(ids.max()))
+            self.skipped += int((~valid).sum())
+            keys, ids = keys[valid], ids[valid]
+            order = np.argsort(keys, kind='stable')
+            keys, ids = keys[order], ids[order]
+            if not len(self.keys):
+                self.keys, self.ids = keys, ids
+            else:
+                positions = np.searchsorted(self.keys, keys, side='right')
+                self.keys = np.insert(self.keys, positions, keys)
+                self.ids = np.insert(self.ids, positions, ids)
+        return len(keys)
+
+    def _slice(self, low, high, length=None, limit=None, after=None):
+        """Ids e chaves em [low, high) (após a chave `after`), opcionalmente de um comprimento"""
+        with self._lock:
+            keys, ids = self.keys, self.ids
+        start = np.searchsorted(keys, max(low, after + 1) if after is not None else low)
+        stop = np.searchsorted(keys, high)
+        if length is None:
+            stop = min(stop, start + limit) if limit else stop
+            return keys[start:stop], ids[start:stop]
+        # Faixa de mesmo comprimento: números mais longos que caem no intervalo são descartados
+        selected_keys, selected_ids = [], []
+        remaining = limit
+        step = max(limit or 0, 1024)
+        while start < stop and (remaining is None or remaining > 0):
+            chunk_keys, chunk_ids = keys[start:min(start + step, stop)], ids[start:min(start + step, stop)]
+            mask = (chunk_keys & 15) == length
+            chunk_keys, chunk_ids = chunk_keys[mask], chunk_ids[mask]
+            if remaining is not None:
+                chunk_keys, chunk_ids = chunk_keys[:remaining], chunk_ids[:remaining]
+                remaining -= len(chunk_keys)
+            selected_keys.append(chunk_keys)
+            selected_ids.append(chunk_ids)
+            start += step
+            step *= 2
+        if not selected_keys:
+            return keys[:0], ids[:0]
+        return np.concatenate(selected_keys), np.concatenate(selected_ids)
+
+    def prefix(self, prefix, limit=None, after=None):
+        """(chaves, ids) dos números que começam com `prefix` (dígitos), em ordem"""
+        low, high = prefix_bounds(prefix)
+        return self._slice(low, high, limit=limit, after=after)
+
+    def range(self, start, end, limit=None, after=None):
+        """(chaves, ids) dos números de mesmo comprimento entre `start` e `end` (inclusive)"""
+        if len(start) != len(end):
+            raise ValueError('Início e fim da faixa devem ter o mesmo número de dígitos')
+        if start > end:
+            raise ValueError('Início da faixa maior que o fim')
+        return self._slice(encode(start), encode(end) + 1, length=len(start), limit=limit, after=after)
+
+    def count_prefix(self, prefix):
+        with self._lock:
+            keys = self.keys
+        low, high = prefix_bounds(prefix)
+        return int(np.searchsorted(keys, high) - np.searchsorted(keys, low))
+
+    def free(self, start, end, count, contiguous=False):
+        """Primeiros `count` números livres na faixa [start, end] (mesmo comprimento), como dígitos.
+
+        Com `contiguous` exige uma sequência contínua de `count` números livres.
+        Retorna menos que `count` se a faixa não tiver números livres suficientes.
+        """
+        length = len(start)
+        taken_keys, _ = self.range(start, end)
+        scale = 10 ** (MAX_DIGITS - length)
+        low, high = int(start), int(end)
+        taken = np.unique((taken_keys >> 4) // scale)
+        # Lacunas entre números ocupados: [bounds[i] + 1, bounds[i + 1] - 1]
+        bounds = np.concatenate(([low - 1], taken, [high + 1]))
+        gaps = np.diff(bounds) - 1
+        if contiguous:
+            fits = np.nonzero(gaps >= count)[0]
+            if not len(fits):
+                return []
+            first = int(bounds[fits[0]]) + 1
+            return [f'{value:0{length}d}' for value in range(first, first + count)]
+        result = []
+        for gap_start, size in zip((bounds[:-1] + 1).tolist(), gaps.tolist()):
+            if size <= 0:
+                continue
+            take = min(size, count - len(result))
+            result.extend(f'{value:0{length}d}' for value in range(gap_start, gap_start + take))
+            if len(result) >= count:
+                break
+        return result
+
+    def stats(self):
+        return {'numbers': len(self.keys), 'last_id': self.last_id, 'skipped': self.skipped,
+                'bytes': int(self.keys.nbytes + self.ids.nbytes)}
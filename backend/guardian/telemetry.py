@@ -0,0 +1,294 @@
+"""Telemetria em memória: séries temporais em ring buffers NumPy.
+
+Cada série (fonte, métrica) guarda agregados por balde de tempo em três
+resoluções (1m, 5m, 1h). Os baldes de todas as séries ficam em matrizes
+(séries x slots) por resolução; a ingestão de um lote é vetorizada (ordenação
+por slot e `reduceat`), sem laço Python por amostra além do mapeamento da
+série. O slot de um balde é `balde % slots`: baldes antigos são sobrescritos.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# nome: (segundos por balde, quantidade de baldes)
+DEFAULT_RESOLUTIONS = {
+    '1m': (60, 360),     # 6 horas
+    '5m': (300, 576),    # 2 dias
+    '1h': (3600, 720),   # 30 dias
+}
+
+
+class _Rollup:
+    """Agregados de uma resolução para todas as séries"""
+
+    FIELDS = ('count', 'sum', 'min', 'max', 'last', 'last_time')
+
+    def __init__(self, seconds: int, slots: int, capacity: int):
+        self.seconds = seconds
+        self.slots = slots
+        self.bucket = np.full((capacity, slots), -1, dtype=np.int64)
+        self.count = np.zeros((capacity, slots), dtype=np.int32)
+        self.sum = np.zeros((capacity, slots), dtype=np.float64)
+        self.min = np.full((capacity, slots), np.inf, dtype=np.float32)
+        self.max = np.full((capacity, slots), -np.inf, dtype=np.float32)
+        self.last = np.zeros((capacity, slots), dtype=np.float32)
+        # Instante da amostra em `last`: lote posterior com amostra mais antiga não a substitui
+        self.last_time = np.full((capacity, slots), -np.inf, dtype=np.float64)
+
+    def grow(self, capacity: int) -> None:
+        for name, fill in (('bucket', -1), ('count', 0), ('sum', 0.0), ('min', np.inf),
+                           ('max', -np.inf), ('last', 0.0), ('last_time', -np.inf)):
+            old = getattr(self, name)
+            new = np.full((capacity, self.slots), fill, dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def ingest(self, rows: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> None:
+        buckets = (timestamps // self.seconds).astype(np.int64)
+        keys = rows * self.slots + buckets % self.slots
+
+        # Ordena por slot e tempo; em cada slot só vale o balde mais recente do lote
+        order = np.lexsort((timestamps, keys))
+        keys, buckets, values, timestamps = keys[order], buckets[order], values[order], timestamps[order]
+        ends = np.append(np.flatnonzero(keys[1:] != keys[:-1]), len(keys) - 1)
+        sizes = np.diff(np.concatenate(([-1], ends)))
+        current = buckets == np.repeat(buckets[ends], sizes)
+        keys, buckets, values, timestamps = keys[current], buckets[current], values[current], timestamps[current]
+
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        ends = np.append(starts[1:], len(keys)) - 1
+        slot_keys, slot_buckets = keys[starts], buckets[starts]
+
+        flat_bucket = self.bucket.reshape(-1)
+        stored = flat_bucket[slot_keys]
+        # Amostras de um balde já sobrescrito no ring são descartadas
+        fresh = slot_buckets >= stored
+        reset = slot_buckets > stored
+        flat = {name: getattr(self, name).reshape(-1) for name in self.FIELDS}
+        reset_keys = slot_keys[reset]
+        flat_bucket[reset_keys] = slot_buckets[reset]
+        flat['count'][reset_keys] = 0
+        flat['sum'][reset_keys] = 0.0
+        flat['min'][reset_keys] = np.inf
+        flat['max'][reset_keys] = -np.inf
+        flat['last_time'][reset_keys] = -np.inf
+
+        counts = (ends - starts + 1).astype(np.int32)
+        sums = np.add.reduceat(values, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        target = slot_keys[fresh]
+        flat['count'][target] += counts[fresh]
+        flat['sum'][target] += sums[fresh]
+        flat['min'][target] = np.minimum(flat['min'][target], mins[fresh])
+        flat['max'][target] = np.maximum(flat['max'][target], maxs[fresh])
+        newest = timestamps[ends[fresh]]
+        newer = newest >= flat['last_time'][target]
+        flat['last'][target[newer]] = values[ends[fresh]][newer]
+        flat['last_time'][target[newer]] = newest[newer]
+
+    def query(self, row: int, start: float, end: float) -> Dict[str, list]:
+        buckets = self.bucket[row]
+        mask = (buckets >= int(start // self.seconds)) & (buckets <= int(end // self.seconds))
+        mask &= self.count[row] > 0
+        slots = np.flatnonzero(mask)
+        slots = slots[np.argsort(buckets[slots])]
+        count = self.count[row, slots]
+        return {
+            'timestamp': (buckets[slots] * self.seconds).tolist(),
+            'count': count.tolist(),
+            'avg': np.round(self.sum[row, slots] / count, 4).tolist(),
+            'min': self.min[row, slots].astype(np.float64).round(4).tolist(),
+            'max': self.max[row, slots].astype(np.float64).round(4).tolist(),
+            'last': self.last[row, slots].astype(np.float64).round(4).tolist(),
+        }
+
+
+class TelemetryStore:
+    """Séries (fonte, métrica) com rollups em ring buffers e último valor de cada série"""
+
+    def __init__(self, resolutions: Optional[Dict[str, Tuple[int, int]]] = None, capacity: int = 256,
+                 max_series: int = 100000):
+        self.resolutions = resolutions or DEFAULT_RESOLUTIONS
+        self.max_series = max_series
+        self._capacity = capacity
+        self._index: Dict[Tuple[str, str], int] = {}
+        self._series: List[Tuple[str, str]] = []
+        self._rollups = {name: _Rollup(seconds, slots, capacity)
+                         for name, (seconds, slots) in self.resolutions.items()}
+        self.latest_value = np.full(capacity, np.nan)
+        self.latest_time = np.zeros(capacity)
+        self._dirty = np.zeros(capacity, dtype=bool)
+        self._lock = threading.Lock()
+        self.stats = {'samples': 0, 'batches': 0, 'rejected': 0}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def _rows(self, sources: Sequence[str], metrics: Sequence[str]) -> np.ndarray:
+        index = self._index
+        keys = list(zip(sources, metrics))
+        # Capacidade conferida para o lote inteiro antes de registrar: lote rejeitado não deixa séries
+        new = list(dict.fromkeys(key for key in keys if key not in index))
+        if len(self._series) + len(new) > self.max_series:
+            raise ValueError(f'Limite de {self.max_series} séries atingido')
+        for key in new:
+            index[key] = len(self._series)
+            self._series.append(key)
+        rows = np.fromiter((index[key] for key in keys), dtype=np.int64, count=len(keys))
+        if len(self._series) > self._capacity:
+            self._grow(max(len(self._series), 2 * self._capacity))
+        return rows
+
+    def _grow(self, capacity: int) -> None:
+        for rollup in self._rollups.values():
+            rollup.grow(capacity)
+        for name, fill in (('latest_value', np.nan), ('latest_time', 0.0), ('_dirty', False)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self._capacity = capacity
+
+    def ingest(self, sources: Sequence[str], metrics: Sequence[str], values: Iterable[float],
+               timestamps: Optional[Iterable[float]] = None) -> int:
+        """Ingere um lote colunar; retorna o número de amostras aceitas"""
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if len(sources) != n or len(metrics) != n:
+            raise ValueError('source, metric e value devem ter o mesmo tamanho')
+        if timestamps is None:
+            timestamps = np.full(n, time.time())
+        else:
+            timestamps = np.asarray(timestamps, dtype=np.float64)
+            if timestamps.shape != (n,):
+                raise ValueError('timestamp deve ter o mesmo tamanho de value')
+        if not n:
+            return 0
+        valid = np.isfinite(values) & np.isfinite(timestamps)
+
+        with self._lock:
+            rows = self._rows(sources, metrics)
+            self.stats['rejected'] += int(n - valid.sum())
+            rows, timestamps, values = rows[valid], timestamps[valid], values[valid]
+            if not len(rows):
+                return 0
+            for rollup in self._rollups.values():
+                rollup.ingest(rows, timestamps, values)
+
+            # Último valor por série (a amostra mais recente vence)
+            order = np.argsort(timestamps, kind='stable')
+            ordered_rows = rows[order]
+            newer = timestamps[order] >= self.latest_time[ordered_rows]
+            self.latest_value[ordered_rows[newer]] = values[order][newer]
+            self.latest_time[ordered_rows[newer]] = timestamps[order][newer]
+            self._dirty[ordered_rows[newer]] = True
+
+            self.stats['samples'] += len(rows)
+            self.stats['batches'] += 1
+        return len(rows)
+
+    def query(self, source: str, metric: str, resolution: str = '1m',
+              start: Optional[float] = None, end: Optional[float] = None) -> Optional[Dict]:
+        if resolution not in self._rollups:
+            raise ValueError(f'Resolução inválida: {resolution} (use {", ".join(self._rollups)})')
+        rollup = self._rollups[resolution]
+        end = end if end is not None else time.time()
+        start = start if start is not None else end - rollup.seconds * rollup.slots
+        with self._lock:
+            row = self._index.get((source, metric))
+            if row is None:
+                return None
+            return {'source': source, 'metric': metric, 'resolution': resolution,
+                    **rollup.query(row, start, end)}
+
+    def latest(self, source: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """{fonte: {métrica: {value, timestamp}}}"""
+        with self._lock:
+            rows = [row for row, key in enumerate(self._series) if source is None or key[0] == source]
+            return self._snapshot(rows)
+
+    def take_changes(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Últimos valores das séries alteradas desde a chamada anterior (deltas para push)"""
+        with self._lock:
+            rows = np.flatnonzero(self._dirty[:len(self._series)])
+            self._dirty[rows] = False
+            return self._snapshot(rows)
+
+    def _snapshot(self, rows) -> Dict[str, Dict[str, Dict[str, float]]]:
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for row in rows:
+            if np.isnan(self.latest_value[row]):
+                continue
+            source, metric = self._series[row]
+            result.setdefault(source, {})[metric] = {
+                'value': float(self.latest_value[row]),
+                'timestamp': float(self.latest_time[row]),
+            }
+        return result
+
+    def series(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [{'source': source, 'metric': metric} for source, metric in self._series]
+
+
+class TelemetryPublisher:
+    """Envia por Socket.IO, a cada `interval` segundos, só as séries que mudaram"""
+
+    def __init__(self, socketio_server, store: TelemetryStore, room: str = 'telemetry',
+                 event: str = 'telemetry', interval: float = 1.0):
+        self.socketio = socketio_server
+        self.store = store
+        self.room = room
+        self.event = event
+        self.interval = interval
+        self._task = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            self.publish()
+
+    def publish(self) -> None:
+        changes = self.store.take_changes()
+        if changes:
+            self.socketio.emit(self.event, changes, to=self.room)
+
+
+def parse_samples(payload) -> Tuple[list, list, list, Optional[list]]:
+    """Aceita lotes colunares ({source, metric, value, timestamp} como listas),
+    lista de amostras ({"samples": [...]}) ou uma fonte com várias métricas
+    ({"source", "timestamp", "metrics": {nome: valor}})."""
+    if not isinstance(payload, dict):
+        raise ValueError('Corpo JSON deve ser um objeto')
+    if 'samples' in payload:
+        samples = payload['samples']
+        sources = [s['source'] for s in samples]
+        metrics = [s['metric'] for s in samples]
+        values = [s['value'] for s in samples]
+        timestamps = [s.get('timestamp') for s in samples]
+    elif 'metrics' in payload:
+        names = list(payload['metrics'])
+        sources = [payload['source']] * len(names)
+        metrics = names
+        values = [payload['metrics'][name] for name in names]
+        timestamps = [payload.get('timestamp')] * len(names)
+    else:
+        sources, metrics, values = payload['source'], payload['metric'], payload['value']
+        timestamps = payload.get('timestamp')
+        if isinstance(sources, str):
+            sources = [sources] * len(values)
+    if timestamps is not None and not isinstance(timestamps, list):
+        timestamps = [timestamps] * len(values)
+    if timestamps is not None and None in timestamps:
+        now = time.time()
+        timestamps = [now if t is None else t for t in timestamps]
+    return [str(s) for s in sources], [str(m) for m in metrics], values, timestamps
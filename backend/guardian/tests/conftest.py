@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# O módulo app cria a aplicação ao ser importado: nunca aponta para o banco real
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplicação com banco SQLite próprio e índices/caches em memória zerados"""
+    import app as guardian
+
+    monkeypatch.setattr(guardian, '_ip_allocator_loaded_at', 0.0)
+    monkeypatch.setattr(guardian, '_ip_allocator_synced_id', 0)
+    guardian.ip_allocator.clear()
+    guardian.user_cache.invalidate()
+    application = guardian.create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "guardian.db"}',
+    })
+    # Sem contexto ativo durante o teste: cada requisição cria o seu (g não vaza entre requisições)
+    with application.app_context():
+        guardian.db.create_all()
+    yield application
+    with application.app_context():
+        guardian.db.engine.dispose()
+    guardian.user_cache.invalidate()
+
+
+@pytest.fixture
+def login(app):
+    """Cliente de teste autenticado como um usuário aprovado com o papel informado"""
+    from models import User, db
+
+    def make_client(role='admin', email=None):
+        with app.app_context():
+            user = User(email=email or f'{role}@example.com', role=role, status='approved')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+    return make_client
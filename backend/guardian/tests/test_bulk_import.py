@@ -0,0 +1,101 @@
+import io
+import json
+
+import pytest
+
+import bulk_import
+from bulk_import import RowError, iter_records, normalize_e164, normalize_mac, run_bulk_import
+
+
+def test_normalizers():
+    assert normalize_e164('+55 (11) 3000-0000') == '+551130000000'
+    assert normalize_e164('0055 11 30000000') == '+551130000000'
+    assert normalize_e164('11 3000 0000', default_country_code=55) == '+551130000000'
+    assert normalize_mac('aa-bb-cc-dd-ee-ff') == 'AA:BB:CC:DD:EE:FF'
+    assert normalize_mac('aabb.ccdd.eeff') == 'AA:BB:CC:DD:EE:FF'
+    for invalid in ('1130000000', '+0551130000000', '+5511300000000000'):
+        with pytest.raises(RowError):
+            normalize_e164(invalid)
+    with pytest.raises(RowError):
+        normalize_mac('aa:bb:cc')
+
+
+def test_iter_records_reports_bad_lines_with_numbers():
+    stream = io.StringIO('{"number": "+1"}\n\nnot json\n[1, 2]\n{"number": "+2"}\n')
+    records = list(iter_records(stream, 'ndjson'))
+    assert [line for line, _ in records] == [1, 3, 4, 5]
+    assert isinstance(records[1][1], RowError) and isinstance(records[2][1], RowError)
+    csv_records = list(iter_records(io.StringIO('number,client_name\n+1,a\n+2,b\n'), 'csv'))
+    assert [(line, record['number']) for line, record in csv_records] == [(2, '+1'), (3, '+2')]
+
+
+def test_import_keeps_going_after_row_errors_and_upserts(app):
+    from models import PhoneNumber
+
+    lines = [
+        {'number': '+551130000001', 'client_name': 'a'},
+        {'number': 'invalido', 'client_name': 'a'},
+        {'number': '+551130000002'},
+        {'number': '+551130000003', 'client_name': 'a'},
+        # Repetido no mesmo lote: a última linha vence
+        {'number': '+551130000001', 'client_name': 'b', 'provider': 'outro'},
+    ]
+    stream = io.StringIO(''.join(json.dumps(line) + '\n' for line in lines))
+    with app.app_context():
+        report = run_bulk_import('phone_numbers', stream, 'ndjson', batch_size=2)
+        assert report['processed'] == 5
+        assert report['written'] == 3
+        assert [error['line'] for error in report['errors']] == [2, 3]
+
+        again = run_bulk_import('phone_numbers', io.StringIO('number,client_name\n+551130000003,c\n'), 'csv')
+        assert again['written'] == 1 and again['error_count'] == 0
+        rows = {row.number: (row.client_name, row.provider) for row in PhoneNumber.query}
+    assert rows == {
+        '+551130000001': ('b', 'outro'),
+        '+551130000003': ('c', 'tsinfo'),
+    }
+
+
+def test_device_import_isolates_database_errors(app, monkeypatch):
+    from models import Device
+
+    # Validação permissiva de propósito: o nome vazio vira NULL e só essa linha falha no banco
+    monkeypatch.setattr(bulk_import, 'validate_device', lambda record: dict(
+        record, name=record['name'] or None, status='active', device_type=None, mac_address=None))
+    stream = io.StringIO('name,ip_address\nok,10.0.0.1\n,10.0.0.2\nok2,10.0.0.3\n')
+    with app.app_context():
+        report = run_bulk_import('devices', stream, 'csv')
+        assert report['written'] == 2
+        assert [error['line'] for error in report['errors']] == [3]
+        assert sorted(device.name for device in Device.query) == ['ok', 'ok2']
+
+
+def test_bulk_endpoints_roundtrip(login):
+    client = login()
+    body = 'number,client_name\n+551130000001,a\n+551130000002,b\nx,c\n'
+    response = client.post('/api/phone_numbers/bulk', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.get_json()['written'] == 2
+    assert response.get_json()['errors'][0]['line'] == 4
+
+    response = client.post('/api/devices/bulk?format=ndjson', data={
+        'file': (io.BytesIO(b'{"name": "cpe", "ip_address": "10.0.0.1", "mac_address": "aabbccddeeff"}\n'),
+                 'devices.ndjson')
+    })
+    assert response.get_json()['written'] == 1
+
+    export = client.get('/api/phone_numbers/bulk?format=ndjson')
+    assert export.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['number'] for line in export.get_data(as_text=True).splitlines()] == [
+        '+551130000001', '+551130000002']
+    export = client.get('/api/devices/bulk')
+    assert export.get_data(as_text=True).splitlines()[0].startswith('id,name,ip_address,mac_address')
+    assert 'AA:BB:CC:DD:EE:FF' in export.get_data(as_text=True)
+    assert client.get('/api/devices/bulk?format=xml').status_code == 400
+
+
+def test_bulk_import_requires_admin(login):
+    client = login(role='user')
+    response = client.post('/api/phone_numbers/bulk', data='number,client_name\n+551130000001,a\n',
+                           content_type='text/csv')
+    assert response.status_code == 403
@@ -0,0 +1,180 @@
+import ipaddress
+import random
+
+import pytest
+
+from ip_allocator import IPAllocator, PrefixConflict, PrefixTrie, parse_address, parse_network
+
+
+def net(cidr):
+    return parse_network(cidr)[1:]
+
+
+def test_parse_network_masks_host_bits_and_validates():
+    assert parse_network('10.1.2.3/8') == (4, int(ipaddress.ip_address('10.0.0.0')), 8)
+    assert parse_network('2001:db8::1/32')[::2] == (6, 32)
+    assert parse_network('10.0.0.1') == (4, int(ipaddress.ip_address('10.0.0.1')), 32)
+    for invalid in ('10.0.0.0/33', '10.0.0/8', 'abc/8', '10.0.0.0/x'):
+        with pytest.raises(ValueError):
+            parse_network(invalid)
+    with pytest.raises(ValueError):
+        parse_address('::g')
+
+
+def test_trie_overlapping_prefixes_covering_and_inside():
+    trie = PrefixTrie(32)
+    for value, cidr in enumerate(['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24', '10.2.0.0/16']):
+        trie.insert(*net(cidr), value)
+    assert trie.size == 4
+    assert [node.value for node in trie.covering(*net('10.1.2.128/25'))] == [0, 1, 2]
+    assert trie.longest_match(parse_address('10.1.2.9')[1]).value == 2
+    assert trie.longest_match(parse_address('10.3.0.1')[1]).value == 0
+    assert trie.longest_match(parse_address('11.0.0.1')[1]) is None
+    assert sorted(node.value for node in trie.iter_inside(*net('10.0.0.0/8'))) == [0, 1, 2, 3]
+    assert [node.value for node in trie.iter_inside(*net('10.1.0.0/16'))] == [1, 2]
+    assert trie.has_inside(*net('10.2.0.0/15'))
+    assert not trie.has_inside(*net('10.4.0.0/16'))
+
+
+def test_trie_replace_and_remove_compacts():
+    trie = PrefixTrie(32)
+    assert trie.insert(*net('10.1.0.0/16'), 'a') is None
+    assert trie.insert(*net('10.1.0.0/16'), 'b') == 'a'
+    trie.insert(*net('10.1.2.0/24'), 'c')
+    trie.insert(*net('10.1.3.0/24'), 'd')
+    assert trie.size == 3
+    assert trie.remove(*net('10.1.0.0/16')) == 'b'
+    assert trie.remove(*net('10.1.0.0/16')) is None
+    assert trie.get(*net('10.1.2.0/24')) == 'c'
+    assert trie.remove(*net('10.1.2.0/24')) == 'c'
+    assert trie.remove(*net('10.1.3.0/24')) == 'd'
+    assert trie.size == 0
+    assert trie.root.children == [None, None]
+    assert trie.free_length(*net('10.0.0.0/8')) == 8
+
+
+def test_first_free_skips_allocated_and_covering_prefixes():
+    trie = PrefixTrie(32)
+    base = net('10.0.0.0/24')
+    trie.insert(*net('10.0.0.0/26'), 1)
+    trie.insert(*net('10.0.0.64/28'), 2)
+    assert trie.first_free(*base, 26) == net('10.0.0.128/26')[0]
+    assert trie.first_free(*base, 28) == net('10.0.0.80/28')[0]
+    trie.insert(*net('10.0.0.128/25'), 3)
+    assert trie.first_free(*base, 26) is None
+    assert trie.first_free(*base, 27) == net('10.0.0.96/27')[0]
+
+
+def test_first_free_matches_brute_force():
+    rng = random.Random(7)
+    trie = PrefixTrie(32)
+    base_key, base_length = net('10.0.0.0/20')
+    taken = set()
+    for _ in range(300):
+        length = rng.randint(22, 28)
+        key = base_key | (rng.getrandbits(32 - base_length) >> (32 - length) << (32 - length))
+        key &= ~((1 << (32 - length)) - 1)
+        network = ipaddress.ip_network((key, length))
+        if any(network.overlaps(other) for other in taken):
+            continue
+        taken.add(network)
+        trie.insert(key, length, str(network))
+        if rng.random() < 0.2:
+            victim = rng.choice(sorted(taken))
+            taken.discard(victim)
+            trie.remove(int(victim.network_address), victim.prefixlen)
+
+    for prefixlen in (22, 24, 26, 28):
+        expected = next((int(candidate.network_address)
+                         for candidate in ipaddress.ip_network((base_key, base_length)).subnets(new_prefix=prefixlen)
+                         if not any(candidate.overlaps(other) for other in taken)), None)
+        assert trie.first_free(base_key, base_length, prefixlen) == expected
+
+
+def test_allocator_owner_overlaps_and_conflicts():
+    allocator = IPAllocator()
+    allocator.add(1, '10.0.0.0/16')
+    allocator.add(2, '10.0.0.0/16', '10.0.1.0/24')
+    allocator.add(3, '2001:db8::/32', '2001:db8:1::/48')
+    assert allocator.owner_of('10.0.1.7') == {'block_id': 2, 'kind': 'allocation', 'network': '10.0.1.0/24'}
+    assert allocator.owner_of('10.0.9.7') == {'block_id': 1, 'kind': 'block', 'network': '10.0.0.0/16'}
+    assert allocator.owner_of('2001:db8:1::5')['block_id'] == 3
+    assert allocator.owner_of('192.168.0.1') is None
+
+    assert [c['block_id'] for c in allocator.overlaps('10.0.0.0/20')] == [2]
+    assert [c['block_id'] for c in allocator.overlaps('10.0.1.128/25')] == [2]
+    assert allocator.overlaps('10.0.2.0/24') == []
+
+    with pytest.raises(PrefixConflict):
+        allocator.add(4, '10.0.0.0/16', '10.0.1.64/26')
+    with pytest.raises(PrefixConflict):
+        allocator.add(4, '10.0.0.0/16', '10.0.0.0/23')
+    with pytest.raises(ValueError):
+        allocator.add(4, '10.0.0.0/16', '10.1.0.0/24')
+    with pytest.raises(ValueError):
+        allocator.add(4, '10.0.0.0/16', '2001:db8::/64')
+
+
+def test_allocator_next_free_and_remove():
+    allocator = IPAllocator()
+    allocator.add(1, '192.168.0.0/24')
+    allocator.add(2, '192.168.0.0/24', '192.168.0.0/25')
+    assert allocator.next_free(1, 25) == '192.168.0.128/25'
+    allocator.add(3, '192.168.0.0/24', '192.168.0.128/25')
+    assert allocator.next_free(1, 30) is None
+    assert allocator.remove(2)
+    assert not allocator.remove(2)
+    assert allocator.next_free(1, 26) == '192.168.0.0/26'
+    with pytest.raises(ValueError):
+        allocator.next_free(1, 16)
+    with pytest.raises(KeyError):
+        allocator.next_free(99, 26)
+
+
+def test_allocator_load_skips_invalid_rows():
+    allocator = IPAllocator()
+    skipped = allocator.load([
+        (1, '10.0.0.0/8', None),
+        (2, '10.0.0.0/8', '10.1.0.0/16'),
+        (3, '10.0.0.0/8', '10.1.2.0/24'),
+        (4, 'invalido', None),
+    ])
+    assert skipped == [3, 4]
+    assert allocator.owner_of('10.1.2.1')['block_id'] == 2
+
+
+def test_ip_block_endpoints(login):
+    client = login()
+    response = client.post('/api/ip_blocks', json={'name': 'Core', 'network': '10.10.0.0/22'})
+    assert response.status_code == 201
+    block_id = response.get_json()['id']
+
+    allocated = [client.post(f'/api/ip_blocks/{block_id}/allocate', json={'prefixlen': 24, 'client_name': c})
+                 for c in ('a', 'b')]
+    assert [r.status_code for r in allocated] == [201, 201]
+    assert [r.get_json()['allocated_network'] for r in allocated] == ['10.10.0.0/24', '10.10.1.0/24']
+
+    response = client.get(f'/api/ip_blocks/{block_id}/next_free?prefixlen=23')
+    assert response.get_json()['network'] == '10.10.2.0/23'
+    response = client.get('/api/ip_blocks/lookup?ip=10.10.1.20')
+    assert response.get_json()['owner']['block_id'] == allocated[1].get_json()['id']
+    response = client.get('/api/ip_blocks/overlaps?cidr=10.10.0.0/23')
+    assert response.get_json()['overlaps'] and len(response.get_json()['conflicts']) == 2
+
+    response = client.post('/api/ip_blocks', json={
+        'name': 'Manual', 'network': '10.10.0.0/22', 'allocated_network': '10.10.1.128/25'})
+    assert response.status_code == 400
+    assert response.get_json()['conflicts'][0]['network'] == '10.10.1.0/24'
+
+    assert client.delete(f'/api/ip_blocks/{allocated[0].get_json()["id"]}').status_code == 200
+    response = client.get(f'/api/ip_blocks/{block_id}/next_free?prefixlen=24')
+    assert response.get_json()['network'] == '10.10.0.0/24'
+    assert client.post(f'/api/ip_blocks/{block_id}/allocate', json={'prefixlen': 'x'}).status_code == 400
+
+
+def test_allocate_requires_admin(login):
+    admin = login()
+    block_id = admin.post('/api/ip_blocks', json={'name': 'Core', 'network': '10.0.0.0/24'}).get_json()['id']
+    user = login(role='user')
+    assert user.post(f'/api/ip_blocks/{block_id}/allocate', json={'prefixlen': 26}).status_code == 403
+    assert user.get(f'/api/ip_blocks/{block_id}/next_free?prefixlen=26').get_json()['network'] == '10.0.0.0/26'
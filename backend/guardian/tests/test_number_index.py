@@ -0,0 +1,71 @@
+import pytest
+
+from number_index import NumberIndex, decode, normalize
+
+
+def make_index(numbers):
+    index = NumberIndex()
+    index.reload(enumerate(numbers, 1))
+    return index
+
+
+def numbers(index, keys_ids):
+    return decode(keys_ids[0])
+
+
+def test_normalize():
+    assert normalize('+55 (11) 3000-0000') == '551130000000'
+    assert normalize('0055 11 3000 0000') == '551130000000'
+    assert normalize('abc') is None
+    assert normalize('1' * 16) is None
+
+
+def test_prefix_includes_longer_numbers_and_counts():
+    index = make_index(['+551130000001', '+5511300000012', '+55113', '+551140000000', '+441130000000'])
+    assert numbers(index, index.prefix('551130')) == ['+551130000001', '+5511300000012']
+    assert numbers(index, index.prefix('55113')) == ['+55113', '+551130000001', '+5511300000012']
+    assert index.count_prefix('5511') == 4
+    assert index.count_prefix('99') == 0
+
+
+def test_prefix_pagination_with_cursor():
+    index = make_index([f'+5511300000{i:02d}' for i in range(10)])
+    keys, _ = index.prefix('55113', limit=4)
+    keys_after, _ = index.prefix('55113', limit=4, after=int(keys[-1]))
+    assert decode(keys_after) == [f'+5511300000{i:02d}' for i in range(4, 8)]
+
+
+def test_range_only_matches_same_length():
+    index = make_index(['+551130000001', '+5511300000015', '+551130000005', '+55113000001'])
+    assert numbers(index, index.range('551130000000', '551130000009')) == ['+551130000001', '+551130000005']
+    with pytest.raises(ValueError):
+        index.range('5511', '55119')
+    with pytest.raises(ValueError):
+        index.range('5519', '5511')
+
+
+def test_free_skips_taken_numbers_and_ignores_other_lengths():
+    # '+5511300000012' compartilha o prefixo de '+551130000001', mas tem outro comprimento
+    index = make_index(['+551130000001', '+551130000002', '+5511300000012', '+551130000005'])
+    assert index.free('551130000000', '551130000009', 4) == \
+        ['551130000000', '551130000003', '551130000004', '551130000006']
+    assert index.free('551130000000', '551130000009', 3, contiguous=True) == \
+        ['551130000006', '551130000007', '551130000008']
+    assert index.free('551130000000', '551130000002', 5) == ['551130000000']
+    assert index.free('551130000001', '551130000002', 1, contiguous=True) == []
+
+
+def test_sync_and_add_missing():
+    index = make_index(['+551130000001'])
+    index.sync(lambda last_id: [(row_id, n) for row_id, n in [(3, '+551130000003')] if row_id > last_id])
+    assert index.last_id == 3
+    # id 2 commitado depois do 3: o sync não vê, add_missing sim (e não duplica)
+    assert index.add_missing([(2, '+551130000002'), (3, '+551130000003'), (9, '+551130000009')]) == 1
+    assert numbers(index, index.prefix('5511')) == ['+551130000001', '+551130000002', '+551130000003']
+
+
+def test_reload_replaces_contents():
+    index = make_index(['+551130000001', '+551130000002'])
+    assert index.loaded
+    index.reload([(2, '+551130000002')])
+    assert len(index) == 1 and index.last_id == 2
@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+
+
+def seed_numbers(app, count, client_name='acme', created_at=None):
+    from models import PhoneNumber, db
+
+    with app.app_context():
+        db.session.add_all(PhoneNumber(
+            number=f'+55113000{i:04d}', client_name=client_name if i % 3 else 'outro',
+            created_at=created_at or datetime(2024, 1, 1)
+        ) for i in range(count))
+        db.session.commit()
+
+
+def collect(client, url):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor is not None else ''))
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append([item['id'] for item in body['items']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_cover_rows_with_identical_values_once(app, login):
+    # Mesma data e mesmo cliente em todas as linhas: o cursor por id não repete nem pula
+    seed_numbers(app, 25)
+    client = login()
+    pages = collect(client, '/api/phone_numbers?limit=4')
+    ids = [row_id for page in pages for row_id in page]
+    assert ids == list(range(1, 26))
+    assert [len(page) for page in pages] == [4] * 6 + [1]
+
+
+def test_exact_multiple_has_no_empty_trailing_page(app, login):
+    seed_numbers(app, 8)
+    client = login()
+    assert [len(page) for page in collect(client, '/api/phone_numbers?limit=4')] == [4, 4]
+
+
+def test_filters_and_cursor_combine(app, login):
+    seed_numbers(app, 30)
+    client = login()
+    pages = collect(client, '/api/phone_numbers?client_name=acme&limit=7')
+    ids = [row_id for page in pages for row_id in page]
+    assert ids == [i + 1 for i in range(30) if i % 3]
+    response = client.get(f'/api/phone_numbers?client_name=acme&limit=5&cursor={ids[-2]}')
+    assert [item['id'] for item in response.get_json()['items']] == ids[-1:]
+
+
+def test_invalid_paging_parameters(app, login):
+    client = login()
+    for query in ('limit=0', 'limit=abc', 'cursor=x', 'limit=-3'):
+        assert client.get(f'/api/devices?{query}').status_code == 400
+    assert client.get('/api/devices?limit=100000').get_json() == {'items': [], 'next_cursor': None}
+
+
+def test_ndjson_stream_returns_every_filtered_row(app, login, monkeypatch):
+    import app as guardian
+
+    monkeypatch.setattr(guardian, 'STREAM_BATCH_SIZE', 4)
+    seed_numbers(app, 20)
+    client = login()
+    response = client.get('/api/phone_numbers?format=ndjson&client_name=outro')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == [i + 1 for i in range(20) if i % 3 == 0]
+    assert {row['client_name'] for row in rows} == {'outro'}
+
+
+def test_listing_requires_approved_user(app):
+    from models import User, db
+
+    with app.app_context():
+        db.session.add(User(email='pending@example.com', status='pending'))
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    assert client.get('/api/ip_blocks').status_code == 403
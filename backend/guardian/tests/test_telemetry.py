@@ -0,0 +1,161 @@
+import random
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from telemetry import TelemetryPublisher, TelemetryStore, parse_samples
+
+T0 = 1_699_999_200  # múltiplo de 3600: baldes alinhados em todas as resoluções
+
+
+def test_batch_over_capacity_is_rejected_without_side_effects():
+    store = TelemetryStore(max_series=3)
+    store.ingest(['a', 'b'], ['cpu', 'cpu'], [1, 2], [T0, T0])
+    with pytest.raises(ValueError):
+        store.ingest(['c', 'd', 'a'], ['cpu', 'cpu', 'cpu'], [3, 4, 5], [T0 + 1] * 3)
+    assert store.series() == [{'source': 'a', 'metric': 'cpu'}, {'source': 'b', 'metric': 'cpu'}]
+    assert store.stats == {'samples': 2, 'batches': 1, 'rejected': 0}
+    assert store.latest('a') == {'a': {'cpu': {'value': 1.0, 'timestamp': T0}}}
+    # Série nova repetida no lote conta uma vez só
+    assert store.ingest(['c'] * 4, ['cpu'] * 4, [1, 2, 3, 4], [T0] * 4) == 4
+    assert len(store) == 3
+
+
+def test_growth_keeps_existing_series():
+    store = TelemetryStore(capacity=2)
+    for i in range(9):
+        store.ingest([f'srv{i}'], ['load'], [float(i)], [T0 + i])
+    assert len(store) == 9
+    assert store._capacity >= 9
+    assert [store.query(f'srv{i}', 'load', start=T0, end=T0 + 60)['last'] for i in range(9)] == \
+        [[float(i)] for i in range(9)]
+
+
+def test_rollups_match_reference_for_unordered_batches():
+    rng = random.Random(3)
+    store = TelemetryStore()
+    samples = [(rng.choice('ab'), rng.choice(['cpu', 'mem']), round(rng.uniform(0, 100), 2),
+                T0 + rng.uniform(0, 7200)) for _ in range(3000)]
+    for start in range(0, len(samples), 250):
+        batch = samples[start:start + 250]
+        store.ingest(*zip(*batch))
+
+    for name, (seconds, _) in store.resolutions.items():
+        expected = defaultdict(list)
+        for source, metric, value, timestamp in samples:
+            expected[source, metric, int(timestamp // seconds)].append((timestamp, value))
+        for source in 'ab':
+            for metric in ('cpu', 'mem'):
+                result = store.query(source, metric, resolution=name, start=T0, end=T0 + 7200)
+                buckets = sorted(b for s, m, b in expected if (s, m) == (source, metric))
+                assert result['timestamp'] == [b * seconds for b in buckets]
+                for i, bucket in enumerate(buckets):
+                    points = expected[source, metric, bucket]
+                    values = [v for _, v in points]
+                    assert result['count'][i] == len(values)
+                    assert result['avg'][i] == pytest.approx(sum(values) / len(values), abs=1e-3)
+                    assert result['min'][i] == pytest.approx(min(values), abs=1e-3)
+                    assert result['max'][i] == pytest.approx(max(values), abs=1e-3)
+                    assert result['last'][i] == pytest.approx(max(points)[1], abs=1e-3)
+
+
+def test_ring_overwrites_old_buckets_and_drops_late_samples():
+    store = TelemetryStore(resolutions={'1m': (60, 4)})
+    store.ingest(['a'] * 6, ['cpu'] * 6, [1, 2, 3, 4, 5, 6], [T0 + 60 * i for i in range(6)])
+    result = store.query('a', 'cpu', start=T0, end=T0 + 600)
+    # Só os 4 baldes mais recentes cabem no ring
+    assert result['timestamp'] == [T0 + 60 * i for i in range(2, 6)]
+    assert result['last'] == [3.0, 4.0, 5.0, 6.0]
+    # Amostra atrasada de um balde já sobrescrito é descartada; a do balde atual é somada
+    store.ingest(['a', 'a'], ['cpu', 'cpu'], [100, 7], [T0 + 30, T0 + 5 * 60 + 10])
+    result = store.query('a', 'cpu', start=T0, end=T0 + 600)
+    assert result['timestamp'][0] == T0 + 120
+    assert result['count'][-1] == 2 and result['max'][-1] == 7.0
+
+
+def test_latest_and_change_tracking():
+    store = TelemetryStore()
+    accepted = store.ingest(['a', 'a', 'b', 'b'], ['cpu'] * 4, [5, 9, float('nan'), 1],
+                            [T0 + 10, T0 + 5, T0, T0 + 1])
+    assert accepted == 3 and store.stats['rejected'] == 1
+    assert store.latest()['a']['cpu'] == {'value': 5.0, 'timestamp': T0 + 10}
+    assert set(store.take_changes()) == {'a', 'b'}
+    assert store.take_changes() == {}
+    store.ingest(['a'], ['cpu'], [1], [T0])  # mais antiga que a atual: não muda o último valor
+    assert store.take_changes() == {}
+    store.ingest(['b'], ['cpu'], [2], [T0 + 20])
+    assert store.take_changes() == {'b': {'cpu': {'value': 2.0, 'timestamp': T0 + 20}}}
+
+
+def test_ingest_validation():
+    store = TelemetryStore()
+    with pytest.raises(ValueError):
+        store.ingest(['a'], ['cpu', 'mem'], [1, 2])
+    with pytest.raises(ValueError):
+        store.ingest(['a'], ['cpu'], [1], [T0, T0])
+    with pytest.raises(ValueError):
+        store.query('a', 'cpu', resolution='10s')
+    assert store.ingest([], [], []) == 0
+    assert store.query('x', 'cpu') is None
+
+
+def test_parse_samples_formats():
+    assert parse_samples({'source': 'a', 'metric': ['cpu', 'mem'], 'value': [1, 2], 'timestamp': T0}) == \
+        (['a', 'a'], ['cpu', 'mem'], [1, 2], [T0, T0])
+    assert parse_samples({'samples': [{'source': 'a', 'metric': 'cpu', 'value': 1, 'timestamp': T0}]}) == \
+        (['a'], ['cpu'], [1], [T0])
+    sources, metrics, values, timestamps = parse_samples({'source': 'a', 'metrics': {'cpu': 1, 'mem': 2}})
+    assert (sources, metrics, values) == (['a', 'a'], ['cpu', 'mem'], [1, 2])
+    assert timestamps[0] == timestamps[1] and timestamps[0] is not None
+    with pytest.raises(ValueError):
+        parse_samples([1, 2])
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+
+def test_publisher_emits_only_changes():
+    socketio = FakeSocketIO()
+    store = TelemetryStore()
+    publisher = TelemetryPublisher(socketio, store)
+    publisher.publish()
+    store.ingest(['a'], ['cpu'], [1], [T0])
+    publisher.publish()
+    publisher.publish()
+    assert socketio.emitted == [('telemetry', {'a': {'cpu': {'value': 1.0, 'timestamp': T0}}}, 'telemetry')]
+
+
+def test_telemetry_endpoints(app, login, monkeypatch):
+    import app as guardian
+
+    store = TelemetryStore(max_series=2)
+    publisher = TelemetryPublisher(FakeSocketIO(), store)
+    monkeypatch.setattr(publisher, 'start', lambda: None)
+    monkeypatch.setattr(guardian, 'telemetry_store', store)
+    monkeypatch.setattr(guardian, 'telemetry_publisher', publisher)
+    monkeypatch.setattr(guardian, 'TELEMETRY_TOKEN', 'segredo')
+
+    agent = app.test_client()
+    payload = {'source': 'srv1', 'metrics': {'cpu': 10, 'mem': 20}, 'timestamp': T0}
+    assert agent.post('/api/telemetry', json=payload).status_code == 403
+    response = agent.post('/api/telemetry', json=payload, headers={'Authorization': 'Bearer segredo'})
+    assert response.get_json() == {'accepted': 2, 'series': 2}
+    response = agent.post('/api/telemetry', json={'source': 'srv2', 'metrics': {'cpu': 1}},
+                          headers={'Authorization': 'Bearer segredo'})
+    assert response.status_code == 400 and len(store) == 2
+
+    client = login(role='user')
+    assert client.post('/api/telemetry', json=payload).status_code == 403
+    assert client.get('/api/telemetry/latest?source=srv1').get_json()['srv1']['cpu']['value'] == 10.0
+    assert len(client.get('/api/telemetry/series').get_json()['series']) == 2
+    response = client.get(f'/api/telemetry/query?source=srv1&metric=mem&resolution=5m&start={T0}&end={T0 + 60}')
+    assert response.get_json()['count'] == [1] and response.get_json()['timestamp'] == [T0]
+    assert client.get('/api/telemetry/query?source=srv1&metric=mem&resolution=1d').status_code == 400
+    assert client.get('/api/telemetry/query?source=srv9&metric=mem').status_code == 404
+    assert login(role='admin').post('/api/telemetry', json=payload).status_code == 200
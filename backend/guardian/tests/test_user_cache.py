@@ -0,0 +1,73 @@
+import threading
+
+from sqlalchemy import inspect
+
+
+def make_user(app, **values):
+    from models import User, db
+
+    with app.app_context():
+        user = User(email='cache@example.com', status='approved', **values)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_each_call_gets_its_own_transient_copy(app):
+    from app import UserCache
+    from models import User, db
+
+    user_id = make_user(app, role='admin', tenant='acme')
+    cache = UserCache(ttl=60)
+    with app.app_context():
+        first = cache.get(user_id, lambda key: db.session.get(User, key))
+        second = cache.get(user_id, lambda key: None)
+        third = cache.get(user_id, lambda key: None)
+    assert first is not second and second is not third
+    for user in (first, second, third):
+        assert inspect(user).transient
+        assert (user.id, user.role, user.tenant, user.status) == (user_id, 'admin', 'acme', 'approved')
+    # Alterar a cópia de uma requisição não afeta as próximas
+    second.role = 'user'
+    assert third.role == 'admin'
+    assert cache.stats == {'hits': 2, 'misses': 1, 'invalidations': 0}
+
+
+def test_update_invalidates_cached_entry(app):
+    from app import user_cache
+    from models import User, db
+
+    user_id = make_user(app, role='user')
+    with app.app_context():
+        assert user_cache.get(user_id, lambda key: db.session.get(User, key)).role == 'user'
+        db.session.get(User, user_id).role = 'admin'
+        db.session.commit()
+        assert user_cache.get(user_id, lambda key: db.session.get(User, key)).role == 'admin'
+
+
+def test_counters_are_exact_under_concurrency():
+    from app import UserCache
+
+    class Row:
+        pass
+
+    cache = UserCache(ttl=0)  # sem cache: toda chamada é um miss
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for key in range(2000):
+            cache.get(key, lambda key: Row())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats['misses'] == 8 * 2000
+
+
+def test_login_uses_cached_copy(login):
+    client = login(role='user')
+    for _ in range(3):
+        assert client.get('/api/devices').status_code == 200
@@ -0,0 +1 @@
+"""Benchmarks e servidores simulados do Nexus AI (executar com `python -m benchmarks.<nome>`)"""
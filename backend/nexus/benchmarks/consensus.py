@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Benchmark do motor de consenso com respostas pré-definidas.
+
+Uso: python -m benchmarks.consensus --responses 8 --size 4096 --iterations 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from consensus import build_consensus
+
+PARAGRAPHS = [
+    "O INVITE recebeu 408 Request Timeout após seis retransmissões; verifique o NAT do PABX "
+    "e o keepalive do registro SIP, pois o gateway não responde ao OPTIONS.",
+    "A chamada falhou com 503 Service Unavailable vindo do proxy da operadora, indicando "
+    "sobrecarga do tronco ou limite de canais simultâneos atingido.",
+    "O SDP oferece apenas G.729 enquanto o destino aceita PCMA/PCMU, gerando 488 Not "
+    "Acceptable Here; habilite transcodificação ou ajuste a lista de codecs.",
+    "O tempo de pós-discagem (PDD) está acima de 6 segundos por causa da consulta DNS SRV "
+    "lenta; configure cache de DNS e servidores secundários.",
+]
+
+
+def canned_responses(count, size, seed):
+    """Maioria concordante (mesmo diagnóstico com variações) e algumas divergentes"""
+    rng = random.Random(seed)
+    responses = []
+    for i in range(count):
+        topic = 0 if i < count * 0.6 else rng.randrange(1, len(PARAGRAPHS))
+        words = []
+        while sum(len(w) + 1 for w in words) < size:
+            sentence = PARAGRAPHS[topic].split()
+            if rng.random() < 0.3:
+                rng.shuffle(sentence)
+            words.extend(sentence)
+        responses.append(f"[IA {i}] " + ' '.join(words))
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--responses', type=int, default=8)
+    parser.add_argument('--size', type=int, default=4096, help='Tamanho aproximado de cada resposta (bytes)')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    responses = canned_responses(args.responses, args.size, args.seed)
+    result = build_consensus(responses)
+    print(f"{args.responses} respostas de ~{args.size} bytes: score={result.score} "
+          f"grupos={result.clusters} medoide={result.answer_index}")
+
+    for _ in range(50):
+        build_consensus(responses)
+    timings = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        build_consensus(responses)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"p50={statistics.median(timings):.3f}ms  p95={timings[int(len(timings) * 0.95)]:.3f}ms  "
+          f"p99={timings[int(len(timings) * 0.99)]:.3f}ms  max={timings[-1]:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
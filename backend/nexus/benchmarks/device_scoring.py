@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Benchmark do modelo local de risco de dispositivos com uma frota sintética.
+
+Uso: python -m benchmarks.device_scoring --devices 100000 --metrics 8 --batches 10
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from device_scoring import DEFAULT_DIRECTIONS, MAX_DEVICES, DeviceRiskModel
+
+METRICS = list(DEFAULT_DIRECTIONS)
+
+
+def fleet_batch(rng, devices, metrics, base, faulty):
+    """Leituras com ruído em torno da base; os dispositivos `faulty` desviam muito"""
+    values = base + rng.normal(0, 0.05, base.shape) * base
+    values[faulty] *= 1.8
+    # ~1% de leituras ausentes
+    values[rng.random(values.shape) < 0.01] = np.nan
+    return {name: values[:, m] for m, name in enumerate(metrics)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=100000)
+    parser.add_argument('--metrics', type=int, default=8)
+    parser.add_argument('--batches', type=int, default=10)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    metrics = METRICS[:args.metrics]
+    device_ids = [f'dev-{i:07d}' for i in range(args.devices)]
+    base = rng.uniform(10, 100, (args.devices, len(metrics)))
+    faulty = rng.choice(args.devices, size=args.top // 2, replace=False)
+
+    model = DeviceRiskModel(max_devices=max(args.devices, MAX_DEVICES))
+    for batch in range(args.batches):
+        readings = fleet_batch(rng, args.devices, metrics, base, faulty if batch == args.batches - 1 else [])
+        start = time.perf_counter()
+        result = model.score(device_ids, readings, top_n=args.top)
+        elapsed = time.perf_counter() - start
+        print(f"lote {batch + 1}: {args.devices} dispositivos x {len(metrics)} métricas em {elapsed * 1000:.1f}ms")
+
+    found = {int(i) for i in result.top} & {int(i) for i in faulty}
+    print(f"falhas injetadas encontradas no top {args.top}: {len(found)}/{len(faulty)}")
+
+    # Custo de decodificação do corpo JSON equivalente no servidor (sem contar o modelo)
+    body = json.dumps({'device_ids': device_ids,
+                       'metrics': {k: [None if np.isnan(v) else v for v in col.tolist()]
+                                   for k, col in readings.items()}})
+    start = time.perf_counter()
+    json.loads(body)
+    print(f"JSON de {len(body) / 2 ** 20:.1f} MB: json.loads em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+if __name__ == '__main__':
+    main()
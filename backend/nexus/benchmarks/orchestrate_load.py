@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Teste de carga do fan-out de /orchestrate contra provedores simulados de latência configurável.
+
+Sobe o stub_provider neste processo e o Nexus (uvicorn) em outro, com todos os
+conectores apontando para o stub e cache desligado, e dispara prompts únicos com
+concorrência fixa. Reporta req/s, p50/p95/p99 e pico de RSS do servidor.
+
+Uso: python -m benchmarks.orchestrate_load --latency 0.2 --jitter 0.05 --concurrency 50 --duration 10 [--json r.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from benchmarks import stub_provider
+
+CONNECTOR_KEYS = {
+    'gemini': 'GOOGLE_GEMINI_API_KEY',
+    'gpt': 'OPENAI_API_KEY',
+    'claude': 'ANTHROPIC_API_KEY',
+    'qwen': 'ALIBABA_QWEN_API_KEY',
+    'grok': 'XAI_GROK_API_KEY',
+    'code_llama': 'CODE_LLAMA_API_KEY',
+    'alphacode': 'ALPHACODE_API_KEY',
+    'copilot': 'COPILOT_API_KEY',
+}
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def peak_rss_mb(pid):
+    """Pico de RSS (VmHWM) do processo em MB (somente Linux)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            return round(next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024, 1)
+    except (OSError, StopIteration):
+        return None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(stub_url, connectors, extra_env=None):
+    port = _free_port()
+    # Um único host simula todos os provedores: sem limite por host o pool não vira gargalo artificial
+    env = {**os.environ, 'NEXUS_CACHE_BACKEND': 'none', 'NEXUS_HTTP_POOL_SIZE': '1000',
+           'NEXUS_HTTP_POOL_PER_HOST': '0', **(extra_env or {})}
+    for key in connectors:
+        env[CONNECTOR_KEYS[key]] = 'bench'
+        env[f'NEXUS_{key.upper()}_URL'] = stub_url
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+                                '--port', str(port), '--log-level', 'warning', '--no-access-log'], env=env)
+    return process, f'http://127.0.0.1:{port}'
+
+
+async def wait_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit('Servidor encerrou durante a inicialização')
+            try:
+                async with http.get(f'{url}/health'):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+    raise SystemExit(f'Servidor não respondeu em {timeout}s')
+
+
+async def run_load(url, concurrency, duration, mode, prompt_size):
+    latencies, errors, consulted = [], 0, []
+    filler = 'x' * max(prompt_size - 40, 0)
+    counter = 0
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as http:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors, counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                # Prompts únicos: nenhuma resposta vem de cache ou de coalescência
+                body = {'prompt': f'benchmark {counter} {filler}', 'mode': mode}
+                start = time.perf_counter()
+                try:
+                    async with http.post(f'{url}/orchestrate', json=body) as response:
+                        data = await response.json()
+                        ok = response.status == 200
+                except aiohttp.ClientError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                    consulted.append(len(data['ais_consulted']))
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1),
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 2) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+        'avg_ais_consulted': round(sum(consulted) / len(consulted), 2) if consulted else 0,
+    }, elapsed
+
+
+async def run(args):
+    stub_port = _free_port()
+    runner = await stub_provider.start(port=stub_port, latency=args.latency, jitter=args.jitter,
+                                       error_rate=args.error_rate, seed=42)
+    stub_url = f'http://127.0.0.1:{stub_port}/v1/query'
+    connectors = list(CONNECTOR_KEYS)[:args.connectors] if args.mode == 'development' else \
+        list(CONNECTOR_KEYS)[:min(args.connectors, 5)]
+    extra_env = {'NEXUS_HTTP_CONCURRENCY': str(args.provider_concurrency)} if args.provider_concurrency else None
+    process, url = start_server(stub_url, connectors, extra_env)
+    try:
+        await wait_ready(url, process)
+        report, elapsed = await run_load(url, args.concurrency, args.duration, args.mode, args.prompt_size)
+        report['peak_rss_mb'] = peak_rss_mb(process.pid)
+        report['stub'] = dict(runner.app['stats'])
+    finally:
+        process.terminate()
+        process.wait()
+        await runner.cleanup()
+    return report, elapsed, connectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help='Latência média do provedor simulado (s)')
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 503 do provedor')
+    parser.add_argument('--connectors', type=int, default=5, help='Conectores habilitados (até 5; 8 no modo development)')
+    parser.add_argument('--provider-concurrency', type=int,
+                        help='NEXUS_HTTP_CONCURRENCY do servidor (padrão do ambiente: 4 por provedor)')
+    parser.add_argument('--mode', default='general')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--prompt-size', type=int, default=200, help='Tamanho dos prompts em caracteres')
+    parser.add_argument('--json', metavar='ARQUIVO', help='Grava o resultado em JSON')
+    args = parser.parse_args()
+
+    report, elapsed, connectors = asyncio.run(run(args))
+    print(f"/orchestrate: {report['requests']} requisições em {elapsed:.1f}s ({report['rps']} req/s), "
+          f"{report['errors']} erros, concorrência {args.concurrency}, {len(connectors)} conectores "
+          f"a {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms")
+    print(f"latência p50={report['p50_ms']} ms p95={report['p95_ms']} ms p99={report['p99_ms']} ms; "
+          f"IAs por resposta={report['avg_ais_consulted']}; pico de RSS do servidor {report['peak_rss_mb']} MB; "
+          f"stub={report['stub']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'nexus.orchestrate_load', 'concurrency': args.concurrency,
+                       'duration': round(elapsed, 2), 'latency': args.latency, 'jitter': args.jitter,
+                       'error_rate': args.error_rate, 'provider_concurrency': args.provider_concurrency,
+                       'mode': args.mode, 'connectors': connectors,
+                       'total_rps': report['rps'], 'peak_rss_mb': report['peak_rss_mb'],
+                       'routes': {'POST /orchestrate': report}}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Benchmark do analisador de logs SIP com um dump sintético no formato do ngrep.
+
+Uso: python -m benchmarks.sip_analyzer --calls 200000 [--output /tmp/sip.log] [--keep]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from sip_analyzer import analyze_file
+
+OUTCOMES = [(200, 'OK')] * 8 + [(486, 'Busy Here'), (503, 'Service Unavailable'), (408, 'Request Timeout')]
+
+
+def _message(start_line, call_id, cseq, branch, caller, callee):
+    return (
+        f"{start_line}\r\n"
+        f"Via: SIP/2.0/UDP 10.0.0.1:5060;branch={branch}\r\n"
+        f"From: <sip:{caller}@10.0.0.1>;tag=a{call_id[:6]}\r\n"
+        f"To: <sip:{callee}@10.0.0.2>\r\n"
+        f"Call-ID: {call_id}\r\n"
+        f"CSeq: {cseq}\r\n"
+        f"User-Agent: bench-pbx\r\n"
+        f"Content-Length: 0\r\n\r\n"
+    )
+
+
+def write_log(path, calls, seed):
+    """Chamadas sequenciais com INVITE, 100/183, resposta final e BYE; ~10% com retransmissões"""
+    rng = random.Random(seed)
+    base = time.mktime((2024, 1, 31, 10, 0, 0, 0, 0, -1))
+    with open(path, 'w') as out:
+        for n in range(calls):
+            call_id = f'{n:08x}{rng.getrandbits(32):08x}@bench'
+            caller, callee = f'5511{rng.randrange(10 ** 8):08d}', f'5521{rng.randrange(10 ** 8):08d}'
+            ts = base + n * 0.01
+            branch = f'z9hG4bK{n:x}'
+            status, reason = rng.choice(OUTCOMES)
+            flow = [(0, f'INVITE sip:{callee}@10.0.0.2 SIP/2.0', '1 INVITE', branch)]
+            if rng.random() < 0.1:
+                flow += [(0.5, flow[0][1], '1 INVITE', branch), (1.5, flow[0][1], '1 INVITE', branch)]
+            pdd = rng.expovariate(1 / 1.5)
+            flow += [(0.02, 'SIP/2.0 100 Trying', '1 INVITE', branch),
+                     (pdd, 'SIP/2.0 183 Session Progress', '1 INVITE', branch),
+                     (pdd + 5, f'SIP/2.0 {status} {reason}', '1 INVITE', branch)]
+            if status == 200:
+                flow += [(pdd + 60, f'BYE sip:{callee}@10.0.0.2 SIP/2.0', '2 BYE', branch + 'b'),
+                         (pdd + 60.01, 'SIP/2.0 200 OK', '2 BYE', branch + 'b')]
+            for offset, start_line, cseq, via in flow:
+                stamp = time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(ts + offset))
+                out.write(f"#\nU {stamp}.{int((ts + offset) % 1 * 1e6):06d} 10.0.0.1:5060 -> 10.0.0.2:5060\n")
+                out.write(_message(start_line, call_id, cseq, via, caller, callee))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--output', help='Arquivo de log (padrão: temporário)')
+    parser.add_argument('--keep', action='store_true', help='Mantém o arquivo gerado')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    path = args.output or os.path.join(tempfile.gettempdir(), f'sip_bench_{args.calls}.log')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        write_log(path, args.calls, args.seed)
+        print(f"Log gerado em {time.perf_counter() - start:.1f}s: {path}")
+    size = os.path.getsize(path)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        result = analyze_file(f)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    stats = result['stats']
+    print(f"{size / 2 ** 20:.1f} MB, {stats['messages']} mensagens, {stats['dialogs']} diálogos em {elapsed:.2f}s "
+          f"({size / 2 ** 20 / elapsed:.1f} MB/s, {stats['messages'] / elapsed:.0f} msg/s)")
+    print(f"falhas={stats['failed_invites']} retransmissões={stats['retransmissions']} "
+          f"anômalos={stats['anomalous_dialogs']} PDD={stats['pdd']}")
+    print(f"RSS máximo: {rss_after / 1024:.1f} MB (antes da análise: {rss_before / 1024:.1f} MB)")
+
+    if not args.keep and not args.output:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
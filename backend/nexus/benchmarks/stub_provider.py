@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Servidor HTTP local que simula um provedor de IA (latência, 429 e erros 5xx).
+
+Uso: python -m benchmarks.stub_provider --port 9100 --latency 0.3 --jitter 0.1 --rate-429 0.1
+
+Aponte um conector para ele com NEXUS_<KEY>_URL=http://127.0.0.1:9100/v1/query
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+
+def create_app(latency=0.3, jitter=0.0, rate_429=0.0, error_rate=0.0, retry_after=None, seed=None,
+               token_delay=0.01):
+    rng = random.Random(seed)
+    stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'cancelled': 0}
+
+    async def query(request):
+        stats['requests'] += 1
+        payload = await request.json()
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+        roll = rng.random()
+        if roll < rate_429:
+            stats['throttled'] += 1
+            headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+            return web.json_response({'error': 'rate limited'}, status=429, headers=headers)
+        if roll < rate_429 + error_rate:
+            stats['errors'] += 1
+            return web.json_response({'error': 'upstream failure'}, status=503)
+
+        prompt = payload.get('prompt', '')
+        text = f'Resposta simulada ({len(prompt)} caracteres): {prompt[:80]}'
+        if not payload.get('stream'):
+            return web.json_response({'text': text})
+
+        # Streaming NDJSON: um trecho por palavra
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        try:
+            for i, word in enumerate(text.split(' ')):
+                await response.write((json.dumps({'text': word if i == 0 else ' ' + word}) + '\n').encode())
+                await asyncio.sleep(token_delay)
+            await response.write_eof()
+        except ConnectionResetError:
+            # Cliente (orquestrador) cancelou a consulta
+            stats['cancelled'] += 1
+        return response
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app['stats'] = stats
+    app.router.add_post('/v1/query', query)
+    app.router.add_get('/stats', get_stats)
+    return app
+
+
+async def start(port=9100, host='127.0.0.1', **options):
+    """Inicia o servidor em segundo plano; retorna o runner para `await runner.cleanup()`"""
+    runner = web.AppRunner(create_app(**options))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=0.3, help='Latência média em segundos')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Fração de respostas 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 503')
+    parser.add_argument('--retry-after', type=float)
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Intervalo entre trechos no modo stream')
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.latency, args.jitter, args.rate_429, args.error_rate, args.retry_after,
+                           token_delay=args.token_delay),
+                host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
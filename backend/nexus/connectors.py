@@ -0,0 +1,293 @@
+"""Conectores HTTP das IAs com pool de conexões compartilhado.
+
+Todas as consultas usam uma única `aiohttp.ClientSession` (criada no lifespan
+do FastAPI), com limite de concorrência e de taxa por provedor, prazos de
+conexão/leitura e novas tentativas com backoff exponencial e jitter.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Janela de contexto (tokens) por conector; NEXUS_<KEY>_CONTEXT_TOKENS sobrescreve
+DEFAULT_CONTEXT_TOKENS = {
+    'gemini': 1000000, 'gpt': 128000, 'claude': 200000, 'qwen': 32000, 'grok': 128000,
+    'code_llama': 16000, 'alphacode': 8000, 'copilot': 8000,
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def create_session(pool_size: Optional[int] = None, per_host: Optional[int] = None) -> aiohttp.ClientSession:
+    """Sessão compartilhada com pool TCP/TLS reaproveitado entre provedores"""
+    connector = aiohttp.TCPConnector(
+        limit=pool_size or int(_env_float('NEXUS_HTTP_POOL_SIZE', 100)),
+        limit_per_host=per_host or int(_env_float('NEXUS_HTTP_POOL_PER_HOST', 20)),
+        ttl_dns_cache=300,
+        keepalive_timeout=_env_float('NEXUS_HTTP_KEEPALIVE', 30),
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(connector=connector, raise_for_status=False)
+
+
+class RateLimiter:
+    """Token bucket assíncrono: `rate` requisições/s com rajada de `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ProviderError(Exception):
+    """Falha definitiva ao consultar um provedor"""
+
+
+class RetryableError(ProviderError):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AIConnector:
+    """Conector de um provedor de IA.
+
+    Com `endpoint` configurado envia POST JSON {"prompt", "context"} e lê o campo
+    "text"/"result"/"response" da resposta; sem endpoint mantém a resposta simulada.
+    """
+
+    def __init__(self, name: str, api_key: str = None, endpoint: str = None,
+                 max_concurrency: int = 4, rate_limit: float = None,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 3, backoff_base: float = 0.25, backoff_cap: float = 8.0,
+                 context_tokens: Optional[int] = None, output_tokens: int = 2048,
+                 max_prompt_tokens: Optional[int] = None):
+        self.name = name
+        self.api_key = api_key
+        self.enabled = bool(api_key)
+        self.endpoint = endpoint
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.timeout = aiohttp.ClientTimeout(
+            total=None, connect=connect_timeout, sock_connect=connect_timeout, sock_read=read_timeout
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'throttled': 0}
+        # Orçamento do prompt: contexto menos a reserva para a resposta, limitado por max_prompt_tokens
+        budgets = [b for b in (context_tokens and context_tokens - output_tokens, max_prompt_tokens) if b]
+        self.prompt_budget = max(min(budgets), 1) if budgets else None
+        # observer(nome, segundos, outcome): ok, retry, error, cancelled ou wait (fila de concorrência/taxa)
+        self.observer = None
+
+    @classmethod
+    def from_env(cls, key: str, name: str, api_key_env: str) -> 'AIConnector':
+        """Configuração via NEXUS_<KEY>_URL, _CONCURRENCY, _RPS, _CONNECT_TIMEOUT, _READ_TIMEOUT, _RETRIES, _CONTEXT_TOKENS"""
+        prefix = f'NEXUS_{key.upper()}_'
+        return cls(
+            name,
+            os.getenv(api_key_env),
+            endpoint=os.getenv(prefix + 'URL'),
+            max_concurrency=int(_env_float(prefix + 'CONCURRENCY', _env_float('NEXUS_HTTP_CONCURRENCY', 4))),
+            rate_limit=_env_float(prefix + 'RPS', _env_float('NEXUS_HTTP_RPS', 0)) or None,
+            connect_timeout=_env_float(prefix + 'CONNECT_TIMEOUT', _env_float('NEXUS_HTTP_CONNECT_TIMEOUT', 5)),
+            read_timeout=_env_float(prefix + 'READ_TIMEOUT', _env_float('NEXUS_HTTP_READ_TIMEOUT', 60)),
+            max_retries=int(_env_float(prefix + 'RETRIES', _env_float('NEXUS_HTTP_MAX_RETRIES', 3))),
+            context_tokens=int(_env_float(prefix + 'CONTEXT_TOKENS', DEFAULT_CONTEXT_TOKENS.get(key, 0))) or None,
+            output_tokens=int(_env_float('NEXUS_OUTPUT_TOKENS', 2048)),
+            max_prompt_tokens=int(_env_float('NEXUS_MAX_PROMPT_TOKENS', 32000)) or None,
+        )
+
+    def bind(self, session: aiohttp.ClientSession) -> None:
+        self.session = session
+
+    def headers(self) -> Dict[str, str]:
+        return {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+
+    def build_payload(self, prompt: str, context: Dict = None) -> Dict[str, Any]:
+        return {'prompt': prompt, 'context': context or {}}
+
+    def parse_response(self, data: Dict[str, Any]) -> str:
+        text = self._text_field(data)
+        if text is None:
+            raise ProviderError(f'Resposta sem texto: {list(data) if isinstance(data, dict) else type(data).__name__}')
+        return text
+
+    @staticmethod
+    def _text_field(data: Any) -> Optional[str]:
+        """Campo "text"/"result"/"response" de um objeto JSON; None se não houver"""
+        if isinstance(data, dict):
+            for field in ('text', 'result', 'response'):
+                if field in data:
+                    return str(data[field])
+        return None
+
+    async def query(self, prompt: str, context: Dict = None) -> str:
+        if not self.enabled:
+            return f"[{self.name}] API não configurada"
+
+        if not self.endpoint:
+            # Provedor sem endpoint configurado: resposta simulada
+            await asyncio.sleep(0.5)
+            return f"[{self.name}] Resposta simulada para: {prompt[:50]}..."
+
+        if self.session is None:
+            raise ProviderError(f'{self.name}: sessão HTTP não inicializada')
+
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            async with self.semaphore:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                started = time.perf_counter()
+                self._observe(started - queued, 'wait')
+                self.stats['requests'] += 1
+                try:
+                    result = await self._post(prompt, context)
+                    self._observe(time.perf_counter() - started, 'ok')
+                    return result
+                except (RetryableError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt >= self.max_retries:
+                        self._observe(time.perf_counter() - started, 'error')
+                        self.stats['failures'] += 1
+                        raise ProviderError(f'{self.name}: {type(e).__name__} {e}'.strip()) from e
+                    self._observe(time.perf_counter() - started, 'retry')
+                    self.stats['retries'] += 1
+                    delay = self._backoff(attempt, getattr(e, 'retry_after', None))
+                except ProviderError:
+                    self._observe(time.perf_counter() - started, 'error')
+                    self.stats['failures'] += 1
+                    raise
+                except asyncio.CancelledError:
+                    # Fan-out cancelou a consulta (quórum atingido ou orçamento esgotado)
+                    self._observe(time.perf_counter() - started, 'cancelled')
+                    raise
+            # Backoff fora do semáforo: a vaga do provedor fica livre para outras consultas
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _observe(self, seconds: float, outcome: str) -> None:
+        if self.observer is not None:
+            self.observer(self.name, seconds, outcome)
+
+    async def stream(self, prompt: str, context: Dict = None) -> AsyncIterator[str]:
+        """Gera trechos parciais da resposta conforme chegam do provedor.
+
+        Envia {"stream": true} e aceita linhas NDJSON ou eventos SSE ("data: {...}")
+        com o campo de texto; resposta JSON comum é emitida como um único trecho.
+        """
+        if not self.enabled:
+            yield f"[{self.name}] API não configurada"
+            return
+
+        if not self.endpoint:
+            # Provedor sem endpoint configurado: resposta simulada palavra a palavra
+            words = f"[{self.name}] Resposta simulada para: {prompt[:50]}...".split(' ')
+            for i, word in enumerate(words):
+                await asyncio.sleep(0.5 / len(words))
+                yield word if i == 0 else ' ' + word
+            return
+
+        if self.session is None:
+            raise ProviderError(f'{self.name}: sessão HTTP não inicializada')
+
+        queued = time.perf_counter()
+        async with self.semaphore:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            started = time.perf_counter()
+            self._observe(started - queued, 'wait')
+            self.stats['requests'] += 1
+            outcome = 'error'
+            try:
+                async for chunk in self._stream_chunks(prompt, context):
+                    yield chunk
+                outcome = 'ok'
+            except (asyncio.CancelledError, GeneratorExit):
+                outcome = 'cancelled'
+                raise
+            finally:
+                self._observe(time.perf_counter() - started, outcome)
+
+    async def _stream_chunks(self, prompt: str, context: Dict = None) -> AsyncIterator[str]:
+        """Trechos da resposta em streaming (NDJSON, SSE ou JSON único)"""
+        payload = {**self.build_payload(prompt, context), 'stream': True}
+        async with self.session.post(self.endpoint, json=payload, headers=self.headers(),
+                                     timeout=self.timeout) as response:
+            if response.status >= 400:
+                self.stats['failures'] += 1
+                if response.status == 429:
+                    self.stats['throttled'] += 1
+                raise ProviderError(f'{self.name}: HTTP {response.status}')
+
+            if 'json' in response.content_type and 'ndjson' not in response.content_type:
+                yield self.parse_response(await response.json(content_type=None))
+                return
+
+            produced = False
+            async for raw in response.content:
+                line = raw.decode('utf-8', 'replace').strip()
+                if line.startswith('data:'):
+                    line = line[5:].strip()
+                if not line or line == '[DONE]':
+                    continue
+                try:
+                    # Eventos sem texto (metadados, {"done": true}) ou que não são objetos são ignorados
+                    chunk = self._text_field(json.loads(line))
+                except ValueError:
+                    chunk = line
+                if chunk is not None:
+                    produced = True
+                    if chunk:
+                        yield chunk
+            if not produced:
+                raise ProviderError(f'{self.name}: stream terminou sem texto')
+
+    async def _post(self, prompt: str, context: Dict = None) -> str:
+        async with self.session.post(self.endpoint, json=self.build_payload(prompt, context),
+                                     headers=self.headers(), timeout=self.timeout) as response:
+            if response.status in RETRY_STATUS:
+                if response.status == 429:
+                    self.stats['throttled'] += 1
+                raise RetryableError(f'HTTP {response.status}', _retry_after(response.headers.get('Retry-After')))
+            if response.status >= 400:
+                raise ProviderError(f'{self.name}: HTTP {response.status}')
+            return self.parse_response(await response.json(content_type=None))
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Backoff exponencial com full jitter, respeitando Retry-After"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,174 @@
+"""Motor de consenso entre as respostas das IAs.
+
+As respostas viram vetores TF-IDF de palavras e bigramas (identificados por
+hash de 64 bits, sem montar strings de bigramas), a similaridade de cosseno
+entre todos os pares é calculada com uma única multiplicação de matrizes NumPy
+e as respostas são agrupadas por componentes conexos acima de um limiar. A resposta escolhida é o medoide do
+maior grupo e o score combina o tamanho do grupo com a coesão interna.
+"""
+import re
+import string
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+_PROVIDER_PREFIX_RE = re.compile(r'^\s*\[[^\]]*\]\s*')
+
+DEFAULT_THRESHOLD = 0.35
+
+
+@dataclass
+class ConsensusResult:
+    answer: str
+    answer_index: int
+    score: float
+    clusters: List[List[int]] = field(default_factory=list)
+    similarity: Optional[np.ndarray] = None
+
+    @property
+    def agreeing(self) -> int:
+        return len(self.clusters[0]) if self.clusters else 0
+
+
+# Bytes que fazem parte de palavras: [0-9a-z_] e qualquer byte UTF-8 não ASCII
+_WORD_BYTES = np.zeros(256, dtype=bool)
+_WORD_BYTES[[ord(c) for c in string.ascii_lowercase + string.digits + '_']] = True
+_WORD_BYTES[128:] = True
+
+_HASH_BASE = 1099511628211  # primo FNV de 64 bits (ímpar, logo inversível mod 2^64)
+_HASH_BASE_INVERSE = pow(_HASH_BASE, -1, 2 ** 64)
+_BIGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_powers = np.ones(1, dtype=np.uint64)
+_inverse_powers = np.ones(1, dtype=np.uint64)
+
+
+def _hash_powers(size: int):
+    """Potências base^i e base^-i mod 2^64, ampliadas sob demanda"""
+    global _powers, _inverse_powers
+    if len(_powers) < size:
+        length = max(size, 2 * len(_powers))
+        with np.errstate(over='ignore'):
+            _powers = np.cumprod(np.full(length, _HASH_BASE, dtype=np.uint64), dtype=np.uint64)
+            _inverse_powers = np.cumprod(np.full(length, _HASH_BASE_INVERSE, dtype=np.uint64), dtype=np.uint64)
+        _powers = np.concatenate((np.ones(1, dtype=np.uint64), _powers[:-1]))
+        _inverse_powers = np.concatenate((np.ones(1, dtype=np.uint64), _inverse_powers[:-1]))
+    return _powers[:size], _inverse_powers[:size]
+
+
+def _tokenize(responses: List[str]):
+    """(documento, hash) de cada palavra e bigrama de todas as respostas, numa única passada.
+
+    Usa hash polinomial com somas de prefixo sobre os bytes UTF-8: o hash de
+    cada palavra é (H[fim] - H[início]) * base^-início, tudo mod 2^64, sem
+    laço Python por palavra. Bigramas que cruzam respostas são descartados.
+    """
+    encoded = [_PROVIDER_PREFIX_RE.sub('', text).lower().encode('utf-8') for text in responses]
+    data = np.frombuffer(b'\n'.join(encoded), dtype=np.uint8)
+    if not data.size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+
+    flags = np.concatenate(([False], _WORD_BYTES[data], [False]))
+    edges = np.flatnonzero(flags[1:] != flags[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    # Posição do separador ao fim de cada resposta
+    boundaries = np.cumsum([len(e) + 1 for e in encoded])
+    documents = np.searchsorted(boundaries, starts, side='right')
+
+    powers, inverse_powers = _hash_powers(len(data))
+    with np.errstate(over='ignore'):
+        prefix = np.empty(len(data) + 1, dtype=np.uint64)
+        prefix[0] = 0
+        np.cumsum((data.astype(np.uint64) + np.uint64(1)) * powers, dtype=np.uint64, out=prefix[1:])
+        hashes = (prefix[ends] - prefix[starts]) * inverse_powers[starts]
+        bigrams = hashes[:-1] * _BIGRAM_MULTIPLIER ^ hashes[1:]
+
+    same_document = documents[:-1] == documents[1:]
+    return (np.concatenate([documents, documents[:-1][same_document]]),
+            np.concatenate([hashes, bigrams[same_document]]))
+
+
+def similarity_matrix(responses: List[str]) -> np.ndarray:
+    """Matriz n x n de similaridade de cosseno TF-IDF"""
+    n = len(responses)
+    rows, hashes = _tokenize(responses)
+    if not hashes.size:
+        return np.eye(n, dtype=np.float64)
+
+    # Vocabulário compacto: índice de cada hash entre os hashes distintos
+    vocabulary, columns = np.unique(hashes, return_inverse=True)
+    size = len(vocabulary)
+    counts = np.bincount(rows * size + columns.ravel(), minlength=n * size)
+    counts = counts.reshape(n, size).astype(np.float64)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1.0 + n) / (1.0 + document_frequency)) + 1.0
+    weights = np.log1p(counts) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    weights /= norms
+
+    similarity = weights @ weights.T
+    np.fill_diagonal(similarity, 1.0)
+    return similarity
+
+
+def cluster(similarity: np.ndarray, threshold: float = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """Componentes conexos do grafo sim >= threshold, do maior para o menor"""
+    n = similarity.shape[0]
+    adjacency = similarity >= threshold
+    labels = np.full(n, -1, dtype=np.int64)
+    clusters = []
+    for seed in range(n):
+        if labels[seed] >= 0:
+            continue
+        members, frontier = [], [seed]
+        labels[seed] = len(clusters)
+        while frontier:
+            node = frontier.pop()
+            members.append(node)
+            for neighbor in np.flatnonzero(adjacency[node] & (labels < 0)):
+                labels[neighbor] = len(clusters)
+                frontier.append(int(neighbor))
+        clusters.append(sorted(members))
+    # Empate no tamanho: grupo mais coeso primeiro
+    clusters.sort(key=lambda c: (-len(c), -float(similarity[np.ix_(c, c)].mean())))
+    return clusters
+
+
+def build_consensus(responses: List[str], total: Optional[int] = None,
+                    threshold: float = DEFAULT_THRESHOLD) -> Optional[ConsensusResult]:
+    """Escolhe o medoide do maior grupo e calcula o score de consenso.
+
+    `total` é o número de IAs consultadas (inclui as que falharam); o score é a
+    fração de IAs no maior grupo multiplicada pela similaridade média interna.
+    """
+    if not responses:
+        return None
+    total = max(total or len(responses), len(responses))
+    similarity = similarity_matrix(responses)
+    clusters = cluster(similarity, threshold)
+
+    best = clusters[0]
+    block = similarity[np.ix_(best, best)]
+    medoid = best[int(np.argmax(block.sum(axis=1)))]
+    if len(best) > 1:
+        cohesion = (block.sum() - len(best)) / (len(best) * (len(best) - 1))
+    else:
+        cohesion = 1.0
+    score = float(np.clip(len(best) / total * cohesion, 0.0, 1.0))
+
+    return ConsensusResult(
+        answer=responses[medoid],
+        answer_index=medoid,
+        score=round(score, 4),
+        clusters=clusters,
+        similarity=similarity
+    )
+
+
+def largest_cluster_size(responses: List[str], threshold: float = DEFAULT_THRESHOLD) -> int:
+    """Compatível com `fanout.fan_out(agreeing=...)`"""
+    if not responses:
+        return 0
+    return len(cluster(similarity_matrix(responses), threshold)[0])
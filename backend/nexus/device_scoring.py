@@ -0,0 +1,274 @@
+"""Pontuação local de risco de falha de dispositivos, vetorizada com NumPy.
+
+Cada métrica de cada dispositivo tem uma linha de base EWMA (média e variância
+móveis) mantida entre lotes. O risco é o z-score da leitura atual contra a
+linha de base do próprio dispositivo; sem histórico suficiente, usa-se o
+z-score robusto (mediana/MAD) em relação à frota. Só os dispositivos mais
+suspeitos seguem para a IA.
+
+Os ids vêm do cliente: o número de dispositivos acompanhados é limitado
+(`max_devices`) e, ao passar dele, as linhas de base dos dispositivos vistos há
+mais tempo (LRU) são descartadas e suas linhas reaproveitadas.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_ALPHA = 0.1
+MIN_SAMPLES = 5
+Z_CLIP = 10.0
+MAX_DEVICES = 100000
+MAX_TOP_N = 100
+# 1 = valores altos indicam problema, -1 = valores baixos, 0 = ambos
+DEFAULT_DIRECTIONS = {
+    'cpu': 1, 'memory': 1, 'temperature': 1, 'latency': 1, 'jitter': 1, 'packet_loss': 1,
+    'errors': 1, 'crc_errors': 1, 'reboots': 1, 'signal': -1, 'snr': -1, 'uptime': -1,
+}
+
+
+@dataclass
+class ScoreResult:
+    device_ids: List[str]
+    metrics: List[str]
+    scores: np.ndarray
+    z: np.ndarray
+    values: np.ndarray
+    baseline: np.ndarray
+    top: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+    def describe(self, index: int, limit: int = 3) -> Dict:
+        """Resumo compacto de um dispositivo: score e métricas que mais contribuíram"""
+        row = self.z[index]
+        worst = np.argsort(-np.abs(row))[:limit]
+        return {
+            'device_id': self.device_ids[index],
+            'score': round(float(self.scores[index]), 3),
+            'metrics': [
+                {
+                    'metric': self.metrics[m],
+                    'value': _round(self.values[index, m]),
+                    'baseline': _round(self.baseline[index, m]),
+                    'z': round(float(row[m]), 2),
+                }
+                for m in worst if row[m] != 0
+            ],
+        }
+
+
+def _round(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def ewma_baseline(history: np.ndarray, alpha: float = DEFAULT_ALPHA):
+    """Média e variância EWMA de janelas (dispositivos x tempo), ignorando NaN"""
+    mean = np.full(history.shape[0], np.nan)
+    var = np.zeros(history.shape[0])
+    count = np.zeros(history.shape[0], dtype=np.int32)
+    for column in history.T:
+        mean, var, count = _ewma_step(mean, var, count, column, alpha)
+    return mean, var, count
+
+
+def _ewma_step(mean, var, count, values, alpha):
+    present = ~np.isnan(values)
+    first = present & (count == 0)
+    delta = np.where(present, values - np.where(first, values, mean), 0.0)
+    mean = np.where(first, values, mean + alpha * delta)
+    var = np.where(present, (1 - alpha) * (var + alpha * delta * delta), var)
+    return mean, var, count + present
+
+
+class DeviceRiskModel:
+    """Linhas de base EWMA por dispositivo e métrica, em arrays contíguos"""
+
+    def __init__(self, alpha: float = DEFAULT_ALPHA, min_samples: int = MIN_SAMPLES,
+                 directions: Optional[Dict[str, int]] = None, capacity: int = 1024,
+                 max_devices: int = MAX_DEVICES, max_top_n: int = MAX_TOP_N):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.directions = {**DEFAULT_DIRECTIONS, **(directions or {})}
+        self.max_devices = max_devices
+        self.max_top_n = max_top_n
+        self._index: Dict[str, int] = {}
+        self._devices: List[Optional[str]] = []  # linha -> id do dispositivo
+        self._capacity = min(capacity, max_devices)
+        self._seen = np.zeros(self._capacity, dtype=np.int64)  # último lote em que a linha apareceu
+        self._tick = 0
+        self.evicted = 0
+        self._mean: Dict[str, np.ndarray] = {}
+        self._var: Dict[str, np.ndarray] = {}
+        self._count: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def stats(self) -> Dict:
+        return {'devices': len(self._index), 'max_devices': self.max_devices, 'evicted': self.evicted,
+                'metrics': sorted(self._mean)}
+
+    def _rows(self, device_ids: Sequence[str]) -> np.ndarray:
+        index = self._index
+        get = index.get
+        rows = [get(device_id) for device_id in device_ids]
+        if None in rows:
+            new = list(dict.fromkeys(device_ids[position] for position, row in enumerate(rows) if row is None))
+            free = self._evict(len(index) + len(new) - self.max_devices,
+                               [row for row in rows if row is not None])
+            self._grow(len(self._devices) + len(new) - len(free))
+            for device_id in new:
+                if free:
+                    row = free.pop()
+                    self._devices[row] = device_id
+                else:
+                    row = len(self._devices)
+                    self._devices.append(device_id)
+                index[device_id] = row
+            rows = [index[device_id] for device_id in device_ids]
+        rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        self._tick += 1
+        self._seen[rows] = self._tick
+        return rows
+
+    def _evict(self, count: int, keep: List[int]) -> List[int]:
+        """Libera as `count` linhas vistas há mais tempo (fora de `keep`) e as devolve"""
+        if count <= 0:
+            return []
+        seen = self._seen[:len(self._devices)].copy()
+        seen[keep] = np.iinfo(np.int64).max
+        if len(self._index) - len(set(keep)) < count:
+            raise ValueError(f'Lote com mais de {self.max_devices} dispositivos distintos')
+        rows = np.argpartition(seen, count - 1)[:count]
+        for name in self._mean:
+            self._mean[name][rows], self._var[name][rows], self._count[name][rows] = np.nan, 0.0, 0
+        for row in rows.tolist():
+            del self._index[self._devices[row]]
+            self._devices[row] = None
+        self.evicted += count
+        return rows.tolist()
+
+    def _grow(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+        capacity = min(max(size, 2 * self._capacity), self.max_devices)
+        self._seen = _resize(self._seen, capacity, 0)
+        for name in self._mean:
+            self._mean[name] = _resize(self._mean[name], capacity, np.nan)
+            self._var[name] = _resize(self._var[name], capacity, 0.0)
+            self._count[name] = _resize(self._count[name], capacity, 0)
+        self._capacity = capacity
+
+    def _metric(self, name: str):
+        if name not in self._mean:
+            self._mean[name] = np.full(self._capacity, np.nan)
+            self._var[name] = np.zeros(self._capacity)
+            self._count[name] = np.zeros(self._capacity, dtype=np.int32)
+        return self._mean[name], self._var[name], self._count[name]
+
+    def score(self, device_ids: Sequence[str], metrics: Dict[str, Sequence[float]],
+              history: Optional[Dict[str, Sequence[Sequence[float]]]] = None,
+              directions: Optional[Dict[str, int]] = None, top_n: int = 10,
+              update: bool = True) -> ScoreResult:
+        """Pontua um lote colunar; `metrics[nome][i]` é a leitura atual de `device_ids[i]`.
+
+        `history[nome]` (dispositivos x tempo) substitui a linha de base guardada.
+        Com `update`, as leituras atuais entram na linha de base depois da pontuação.
+        """
+        n = len(device_ids)
+        names = list(metrics)
+        directions = {**self.directions, **(directions or {})}
+        values = np.empty((n, len(names)))
+        baseline = np.empty((n, len(names)))
+        z = np.zeros((n, len(names)))
+
+        # Validação antes de tocar no estado: lote inválido não cria linhas de base
+        windows = {}
+        for m, name in enumerate(names):
+            column = np.asarray(metrics[name], dtype=np.float64)
+            if column.shape != (n,):
+                raise ValueError(f'Métrica {name}: esperados {n} valores, recebidos {column.size}')
+            values[:, m] = column
+            if history and name in history:
+                window = np.asarray(history[name], dtype=np.float64)
+                if window.ndim != 2 or window.shape[0] != n:
+                    raise ValueError(f'Histórico de {name}: esperada matriz {n} x T')
+                windows[name] = window
+
+        with self._lock:
+            rows = self._rows(device_ids)
+            for m, name in enumerate(names):
+                column = values[:, m]
+                state_mean, state_var, state_count = self._metric(name)
+                if name in windows:
+                    mean, var, count = ewma_baseline(windows[name], self.alpha)
+                else:
+                    mean, var, count = state_mean[rows], state_var[rows], state_count[rows]
+
+                z[:, m] = self._zscore(column, mean, var, count, directions.get(name, 0))
+                baseline[:, m] = mean
+
+                if update:
+                    # Dispositivos repetidos no lote: vale a última leitura
+                    new_mean, new_var, new_count = _ewma_step(mean, var, count, column, self.alpha)
+                    state_mean[rows], state_var[rows], state_count[rows] = new_mean, new_var, new_count
+
+        # Score: raiz da média dos quadrados dos z (já filtrados pela direção de cada métrica)
+        scores = np.sqrt(np.mean(z * z, axis=1)) if names else np.zeros(n)
+        top_n = min(max(top_n, 0), n, self.max_top_n)
+        if top_n:
+            candidates = np.argpartition(-scores, top_n - 1)[:top_n]
+            top = candidates[np.argsort(-scores[candidates], kind='stable')]
+        else:
+            top = np.empty(0, dtype=np.int64)
+        return ScoreResult(list(device_ids), names, scores, z, values, baseline, top)
+
+    def _zscore(self, column, mean, var, count, direction):
+        z = np.zeros_like(column)
+        present = ~np.isnan(column)
+
+        # Dispositivos com histórico próprio suficiente
+        own = present & (count >= self.min_samples)
+        std = np.sqrt(var[own])
+        floor = np.maximum(np.abs(mean[own]) * 0.01, 1e-6)
+        z[own] = (column[own] - mean[own]) / np.maximum(std, floor)
+
+        # Demais: z-score robusto em relação à frota (mediana e MAD)
+        fleet = present & ~own
+        if fleet.any():
+            reference = column[present]
+            median = np.median(reference)
+            mad = np.median(np.abs(reference - median)) * 1.4826
+            scale = max(mad, abs(median) * 0.01, 1e-6)
+            z[fleet] = (column[fleet] - median) / scale
+
+        if direction > 0:
+            np.maximum(z, 0, out=z)
+        elif direction < 0:
+            np.minimum(z, 0, out=z)
+        return np.clip(z, -Z_CLIP, Z_CLIP)
+
+
+def _resize(array: np.ndarray, size: int, fill) -> np.ndarray:
+    grown = np.full(size, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def build_prompt(result: ScoreResult, limit: Optional[int] = None) -> str:
+    """Prompt compacto com os dispositivos mais suspeitos"""
+    top = result.top[:limit] if limit else result.top
+    lines = [
+        f"Entre {len(result.device_ids)} dispositivos, os {len(top)} abaixo têm as leituras mais anômalas "
+        "em relação ao próprio histórico (EWMA) ou à frota. Preveja possíveis falhas, causas prováveis "
+        "e ações preventivas para cada um.",
+        "",
+    ]
+    for index in top:
+        item = result.describe(int(index))
+        details = ', '.join(
+            f"{m['metric']}={m['value']} (base {m['baseline']}, z={m['z']})" for m in item['metrics']
+        )
+        lines.append(f"- {item['device_id']}: score {item['score']}; {details or 'sem desvios'}")
+    return '\n'.join(lines)
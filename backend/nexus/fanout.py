@@ -0,0 +1,168 @@
+"""Estratégias de fan-out do orquestrador: quórum, orçamento de latência e hedging.
+
+`fan_out` dispara as consultas em paralelo e retorna assim que um quórum de
+respostas concordantes (ver consensus.py) é atingido ou o orçamento de latência expira, cancelando
+as consultas restantes. Com hedging, um provedor que passa do seu p95 recebe
+uma requisição duplicada em um provedor reserva; a primeira a terminar vence.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+from prompts import Prompt, prompt_for
+
+
+@dataclass
+class FanOutPolicy:
+    strategy: str = 'all'  # all, quorum
+    quorum: int = 2
+    latency_budget: Optional[float] = None
+    hedge: bool = False
+    max_primaries: Optional[int] = None
+    agreement_threshold: float = 0.35  # consensus.DEFAULT_THRESHOLD (importado só no quorum: numpy)
+
+    @classmethod
+    def from_env(cls) -> 'FanOutPolicy':
+        budget = os.getenv('NEXUS_LATENCY_BUDGET')
+        primaries = os.getenv('NEXUS_FANOUT_PRIMARIES')
+        return cls(
+            strategy=os.getenv('NEXUS_FANOUT_STRATEGY', 'all'),
+            quorum=int(os.getenv('NEXUS_QUORUM', '2')),
+            latency_budget=float(budget) if budget else None,
+            hedge=os.getenv('NEXUS_HEDGE', '0').lower() in ('1', 'true', 'yes'),
+            max_primaries=int(primaries) if primaries else None,
+            agreement_threshold=float(os.getenv('NEXUS_CONSENSUS_THRESHOLD', str(cls.agreement_threshold))),
+        )
+
+    def cache_tag(self) -> str:
+        return f'{self.strategy}:{self.quorum}:{self.latency_budget}:{self.hedge}:{self.max_primaries}'
+
+
+@dataclass
+class FanOutResult:
+    responses: Dict[str, str] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    latencies: Dict[str, float] = field(default_factory=dict)
+    completed: List[str] = field(default_factory=list)
+    cancelled: List[str] = field(default_factory=list)
+    hedged: Dict[str, str] = field(default_factory=dict)
+    quorum_reached: bool = False
+
+
+class LatencyTracker:
+    """Janela deslizante de latências por provedor para estimar o p95"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, name: str, latency: float) -> None:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(latency)
+
+    def percentile(self, name: str, q: float = 0.95) -> Optional[float]:
+        samples = self._samples.get(name)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def fan_out(connectors: Dict[str, object], prompt: Union[str, Prompt], context: Optional[Dict] = None,
+                  policy: Optional[FanOutPolicy] = None, tracker: Optional[LatencyTracker] = None,
+                  agreeing: Optional[Callable[[List[str], float], int]] = None,
+                  default_hedge_delay: float = 2.0) -> FanOutResult:
+    policy = policy or FanOutPolicy()
+    tracker = tracker or LatencyTracker()
+    if agreeing is None and policy.strategy == 'quorum':
+        from consensus import largest_cluster_size as agreeing
+    result = FanOutResult()
+
+    names = list(connectors)
+    primaries = names[:policy.max_primaries] if policy.max_primaries else names
+    spares = [n for n in names if n not in primaries]
+
+    start = time.perf_counter()
+    deadline = start + policy.latency_budget if policy.latency_budget else None
+    tasks: Dict[asyncio.Task, tuple] = {}
+    slots: Dict[str, List[asyncio.Task]] = {}
+    hedge_at: Dict[str, float] = {}
+
+    def launch(name: str, slot: str) -> None:
+        task = asyncio.ensure_future(connectors[name].query(prompt_for(prompt, connectors[name]), context))
+        tasks[task] = (name, slot, time.perf_counter())
+        slots.setdefault(slot, []).append(task)
+
+    for name in primaries:
+        launch(name, name)
+        if policy.hedge and spares:
+            hedge_at[name] = start + (tracker.percentile(name) or default_hedge_delay)
+
+    try:
+        while tasks:
+            now = time.perf_counter()
+            wakeups = list(hedge_at.values())
+            if deadline is not None:
+                wakeups.append(deadline)
+            timeout = max(0.0, min(wakeups) - now) if wakeups else None
+
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            now = time.perf_counter()
+
+            for task in done:
+                entry = tasks.pop(task, None)
+                if entry is None:
+                    # Par primário/hedge concluído no mesmo despertar: o irmão já venceu
+                    continue
+                name, slot, started = entry
+                latency = now - started
+                result.latencies[name] = round(latency, 4)
+                try:
+                    response = task.result()
+                except Exception as e:
+                    result.errors[name] = str(e) or type(e).__name__
+                    result.completed.append(name)
+                    continue
+                tracker.record(name, latency)
+                result.responses[name] = response
+                result.completed.append(name)
+                hedge_at.pop(slot, None)
+                # Primeira resposta do par primário/hedge vence; a outra é cancelada
+                for sibling in slots.get(slot, []):
+                    if sibling in tasks:
+                        sibling_name, _, sibling_started = tasks.pop(sibling)
+                        sibling.cancel()
+                        result.cancelled.append(sibling_name)
+                        result.latencies[sibling_name] = round(now - sibling_started, 4)
+
+            if policy.strategy == 'quorum' and \
+                    agreeing(list(result.responses.values()), policy.agreement_threshold) >= policy.quorum:
+                result.quorum_reached = True
+                break
+            if deadline is not None and now >= deadline:
+                break
+
+            # Dispara hedges para primários que passaram do p95
+            for slot, due in list(hedge_at.items()):
+                if now >= due:
+                    del hedge_at[slot]
+                    if spares and any(t in tasks for t in slots[slot]):
+                        spare = spares.pop(0)
+                        result.hedged[slot] = spare
+                        launch(spare, slot)
+    finally:
+        for task, (name, _, started) in list(tasks.items()):
+            task.cancel()
+            result.cancelled.append(name)
+            result.latencies.setdefault(name, round(time.perf_counter() - started, 4))
+        cancelled_tasks = [t for t in tasks] + [t for slot in slots.values() for t in slot if t.cancelled()]
+        if cancelled_tasks:
+            await asyncio.gather(*cancelled_tasks, return_exceptions=True)
+
+    return result
@@ -0,0 +1,108 @@
+"""Instrumentação opcional do Nexus: histogramas por rota e por conector,
+/metrics no formato texto do Prometheus e profiler por amostragem.
+
+Ativada com NEXUS_METRICS=1. Com NEXUS_PROFILE_SLOW_MS > 0 uma thread amostra,
+a cada NEXUS_PROFILE_INTERVAL_MS, a pilha de cada requisição em andamento: o
+frame da thread do event loop quando a task está executando, ou a cadeia de
+`await` da coroutine quando está suspensa. As pilhas das requisições mais
+lentas que o limite ficam disponíveis no formato "collapsed" (flamegraph.pl,
+speedscope). Histogramas, contadores e o profiler vêm de backend/shared/metrics_core.py.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# backend/shared (no repositório) ou /shared (imagem Docker): módulos comuns aos dois serviços
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+
+from metrics_core import BaseInstrumentation, Gauge, Histogram  # noqa: E402
+
+
+def task_frame_getter(task, thread_id):
+    """Pilha atual de uma task asyncio: a da thread do loop se executando, senão a cadeia de await"""
+    def frames_of(frames):
+        coro = task.get_coro()
+        if getattr(coro, 'cr_running', False):
+            return frames.get(thread_id)
+        chain = []
+        while coro is not None:
+            current = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None) or getattr(coro, 'ag_frame', None)
+            if current is None:
+                break
+            chain.append(current)
+            coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None) or getattr(coro, 'ag_await', None)
+        return chain or None
+    return frames_of
+
+
+class Instrumentation(BaseInstrumentation):
+    def __init__(self, prefix='nexus', slow_threshold=0.0, interval=0.005):
+        super().__init__(prefix, slow_threshold, interval)
+        self.requests = self.add(Histogram(f'{prefix}_http_request_duration_seconds', 'Duração das requisições HTTP',
+                                           ('method', 'route', 'status')))
+        self.connectors = self.add(Histogram(f'{prefix}_connector_request_duration_seconds',
+                                             'Duração de cada tentativa de consulta a um provedor',
+                                             ('connector', 'outcome')))
+        self.connector_wait = self.add(Histogram(f'{prefix}_connector_wait_seconds',
+                                                 'Espera por vaga de concorrência/taxa do provedor', ('connector',)))
+        self.stages = self.add(Histogram(f'{prefix}_orchestrate_stage_seconds', 'Duração das etapas da orquestração',
+                                         ('stage',)))
+        self.in_flight = self.add(Gauge(f'{prefix}_http_requests_in_flight', 'Requisições HTTP em andamento'))
+
+    @classmethod
+    def from_env(cls, prefix='nexus'):
+        return super().from_env(prefix)
+
+    def observe_connector(self, name, seconds, outcome):
+        """Observador dos conectores: outcome = ok, retry, error ou wait"""
+        if outcome == 'wait':
+            self.connector_wait.observe(seconds, name)
+        else:
+            self.connectors.observe(seconds, name, outcome)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: tempo por rota (template do path) e amostragem das requisições lentas"""
+
+    def __init__(self, app, instrumentation: Instrumentation):
+        self.app = app
+        self.instrumentation = instrumentation
+
+    def _route(self, scope):
+        from starlette.routing import Match
+
+        router = scope.get('router') or getattr(scope.get('app'), 'router', None)
+        for route in getattr(router, 'routes', ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, 'path', scope['path'])
+        return 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        metrics = self.instrumentation
+        status = {'code': 500}
+        profiler = metrics.profiler
+        token = profiler.begin(task_frame_getter(asyncio.current_task(), threading.get_ident())) if profiler else None
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        metrics.in_flight.inc(1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Inclui o corpo: respostas em streaming contam até o último trecho
+            duration = time.perf_counter() - start
+            metrics.in_flight.inc(-1)
+            route = self._route(scope)
+            metrics.requests.observe(duration, scope['method'], route, str(status['code']))
+            if token is not None:
+                profiler.end(token, f"{scope['method']} {route}", duration)
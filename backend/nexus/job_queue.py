@@ -0,0 +1,344 @@
+"""Fila persistente de análises longas: SQLite local, pool de workers asyncio e retenção de resultados.
+
+Os jobs sobrevivem a reinícios e podem ser compartilhados por vários processos
+(uvicorn --workers) apontando para o mesmo arquivo. Cada job é reservado por
+um worker com uma concessão (lease) de `timeout` segundos; jobs de um processo
+que morreu voltam à fila quando a concessão expira. A prioridade vem do modo
+(menor número sai primeiro) e, dentro da mesma prioridade, a ordem é FIFO.
+Um job que falha volta à fila com `run_after` em backoff exponencial, para não
+gastar as tentativas em sequência contra um provedor que já está falhando.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+DEFAULT_PRIORITIES = {'voip_analysis': 0, 'general': 1, 'development': 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL,
+    run_after REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_pending ON jobs (status, priority, created_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs (finished_at);
+"""
+# Colunas adicionadas depois da primeira versão: ALTER TABLE em bancos já existentes
+_MIGRATIONS = {'run_after': 'ALTER TABLE jobs ADD COLUMN run_after REAL'}
+_COLUMNS = ('id', 'kind', 'mode', 'priority', 'status', 'attempts', 'created_at', 'started_at', 'finished_at')
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class QueueFull(Exception):
+    pass
+
+
+def parse_priorities(value: Optional[str]) -> Dict[str, int]:
+    """"voip_analysis=0,general=1" -> {'voip_analysis': 0, 'general': 1} sobre os padrões"""
+    priorities = dict(DEFAULT_PRIORITIES)
+    for item in (value or '').split(','):
+        if '=' in item:
+            mode, priority = item.split('=', 1)
+            priorities[mode.strip()] = int(priority)
+    return priorities
+
+
+class JobQueue:
+    def __init__(self, path: str, workers: int = 4, timeout: float = 600.0, max_attempts: int = 3,
+                 max_queued: int = 10000, retention: float = 86400.0, max_results: int = 10000,
+                 priorities: Optional[Dict[str, int]] = None, poll_interval: float = 1.0,
+                 retry_backoff: float = 5.0, retry_backoff_cap: float = 300.0):
+        self.path = path
+        self.workers = workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.max_queued = max_queued
+        self.retention = retention
+        self.max_results = max_results
+        self.priorities = priorities or dict(DEFAULT_PRIORITIES)
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_cap = retry_backoff_cap
+        self.handlers: Dict[str, Tuple[Handler, str]] = {}
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'retried': 0, 'rejected': 0, 'evicted': 0}
+        # Todas as operações no SQLite passam por uma única thread: sem bloquear o event loop nem travas extras
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nexus-jobs')
+        self._db: Optional[sqlite3.Connection] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_env(cls) -> 'JobQueue':
+        """Configuração via NEXUS_JOBS_DB, _WORKERS, _TIMEOUT, _MAX_ATTEMPTS, _MAX_QUEUED, _RETENTION,
+        _MAX_RESULTS, _PRIORITIES ("modo=prioridade,...") e _RETRY_BACKOFF/_RETRY_BACKOFF_CAP (s)"""
+        env = os.environ.get
+        return cls(
+            env('NEXUS_JOBS_DB', 'data/nexus_jobs.db'),
+            workers=int(env('NEXUS_JOBS_WORKERS', '4')),
+            timeout=float(env('NEXUS_JOBS_TIMEOUT', '600')),
+            max_attempts=int(env('NEXUS_JOBS_MAX_ATTEMPTS', '3')),
+            max_queued=int(env('NEXUS_JOBS_MAX_QUEUED', '10000')),
+            retention=float(env('NEXUS_JOBS_RETENTION', '86400')),
+            max_results=int(env('NEXUS_JOBS_MAX_RESULTS', '10000')),
+            priorities=parse_priorities(env('NEXUS_JOBS_PRIORITIES')),
+            retry_backoff=float(env('NEXUS_JOBS_RETRY_BACKOFF', '5')),
+            retry_backoff_cap=float(env('NEXUS_JOBS_RETRY_BACKOFF_CAP', '300')),
+        )
+
+    def register(self, kind: str, handler: Handler, mode: str = 'general') -> None:
+        """Associa um tipo de job à corrotina que o executa; `mode` é o padrão para a prioridade"""
+        self.handlers[kind] = (handler, mode)
+
+    # -- acesso ao banco (sempre na thread do executor) --
+
+    async def _call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._open()
+        return self._db
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.executescript(SCHEMA)
+        columns = {row['name'] for row in db.execute('PRAGMA table_info(jobs)')}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                db.execute(statement)
+        self._db = db
+
+    def _insert(self, job: Dict[str, Any]) -> bool:
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            queued = db.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                return False
+            db.execute('INSERT INTO jobs (id, kind, mode, priority, status, payload, created_at) '
+                       'VALUES (:id, :kind, :mode, :priority, :status, :payload, :created_at)', job)
+            return True
+        finally:
+            db.execute('COMMIT')
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Reserva o próximo job: pendente (após o backoff) ou com concessão expirada (processo que morreu)"""
+        now = time.time()
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT id FROM jobs WHERE (status = ? AND (run_after IS NULL OR run_after <= ?)) '
+                'OR (status = ? AND lease_until < ?) '
+                'ORDER BY priority, created_at LIMIT 1', (QUEUED, now, RUNNING, now)).fetchone()
+            if row is None:
+                return None
+            return db.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ?, run_after = NULL '
+                'WHERE id = ? RETURNING id, kind, mode, payload, attempts',
+                (RUNNING, now, now + self.timeout + 30, row['id'])).fetchall()[0]
+        finally:
+            db.execute('COMMIT')
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]) -> None:
+        self._connect().execute('UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL '
+                         'WHERE id = ? AND status = ?', (status, result, error, time.time(), job_id, RUNNING))
+
+    def _requeue(self, job_id: str, error: Optional[str], count_attempt: bool = True, delay: float = 0.0) -> None:
+        """Devolve o job à fila; só é reservado de novo após `delay` segundos"""
+        self._connect().execute('UPDATE jobs SET status = ?, error = ?, lease_until = NULL, run_after = ?, '
+                         'attempts = attempts - ? WHERE id = ? AND status = ?',
+                         (QUEUED, error, time.time() + delay if delay else None, 0 if count_attempt else 1,
+                          job_id, RUNNING))
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Backoff exponencial com jitter: base * 2^(tentativas - 1), limitado ao teto"""
+        delay = min(self.retry_backoff_cap, self.retry_backoff * 2 ** max(attempts - 1, 0))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _get(self, job_id: str, with_result: bool) -> Optional[Dict[str, Any]]:
+        columns = ', '.join(_COLUMNS + ('error',) + (('result',) if with_result else ()))
+        row = self._connect().execute(f'SELECT {columns} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['status'] == QUEUED:
+            job['position'] = self._connect().execute(
+                'SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority < ? OR (priority = ? AND created_at < ?))',
+                (QUEUED, job['priority'], job['priority'], job['created_at'])).fetchone()[0]
+        return job
+
+    def _cancel(self, job_id: str) -> Optional[str]:
+        cursor = self._connect().execute('UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+                                  (CANCELLED, time.time(), job_id, QUEUED))
+        if cursor.rowcount:
+            return CANCELLED
+        row = self._connect().execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['status'] if row else None
+
+    def _evict(self) -> int:
+        """Remove resultados mais antigos que a retenção e o excedente além de max_results"""
+        db = self._connect()
+        placeholders = ', '.join('?' * len(FINISHED))
+        removed = db.execute(f'DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?',
+                             (*FINISHED, time.time() - self.retention)).rowcount
+        removed += db.execute(
+            f'DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN ({placeholders}) '
+            'ORDER BY finished_at DESC LIMIT -1 OFFSET ?)', (*FINISHED, self.max_results)).rowcount
+        return removed
+
+    def _counts(self) -> Dict[str, int]:
+        return {row['status']: row['total']
+                for row in self._connect().execute('SELECT status, COUNT(*) AS total FROM jobs GROUP BY status')}
+
+    # -- API assíncrona --
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        await self._call(self._connect)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._evictor()))
+
+    async def stop(self) -> None:
+        """Para os workers; jobs interrompidos voltam à fila sem consumir tentativa"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._db is not None:
+            await self._call(self._db.close)
+            self._db = None
+
+    async def submit(self, kind: str, payload: Dict[str, Any], mode: Optional[str] = None,
+                     priority: Optional[int] = None) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        mode = mode or self.handlers[kind][1]
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'mode': mode,
+            'priority': priority if priority is not None else self.priorities.get(mode, max(self.priorities.values()) + 1),
+            'status': QUEUED,
+            'payload': json.dumps(payload, ensure_ascii=False, default=str),
+            'created_at': time.time(),
+        }
+        if not await self._call(self._insert, job):
+            self.stats['rejected'] += 1
+            raise QueueFull(f'Fila cheia ({self.max_queued} jobs pendentes)')
+        self.stats['submitted'] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return {key: job[key] for key in ('id', 'kind', 'mode', 'priority', 'status', 'created_at')}
+
+    async def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        job = await self._call(self._get, job_id, with_result)
+        if job is not None and job.get('result') is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """Cancela um job pendente ou em execução neste processo; retorna o status final"""
+        status = await self._call(self._cancel, job_id)
+        task = self._running.get(job_id)
+        if status == RUNNING and task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self._call(self._finish, job_id, CANCELLED, None, None)
+            status = CANCELLED
+        return status
+
+    async def evict(self) -> int:
+        removed = await self._call(self._evict)
+        self.stats['evicted'] += removed
+        return removed
+
+    async def info(self) -> Dict[str, Any]:
+        counts = await self._call(self._counts)
+        return {'workers': self.workers, 'active': len(self._running), 'jobs': counts, **self.stats}
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self._call(self._claim)
+            except sqlite3.OperationalError:
+                job = None  # banco ocupado por outro processo além do timeout: tenta de novo adiante
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: sqlite3.Row) -> None:
+        handler, _ = self.handlers.get(job['kind'], (None, None))
+        if handler is None:
+            await self._call(self._finish, job['id'], FAILED, None, f"Tipo de job desconhecido: {job['kind']}")
+            self.stats['failed'] += 1
+            return
+        if job['attempts'] > self.max_attempts:
+            # Concessão expirada repetidamente (processo morrendo durante o job)
+            await self._call(self._finish, job['id'], FAILED, None, 'Tentativas esgotadas')
+            self.stats['failed'] += 1
+            return
+        task = asyncio.ensure_future(asyncio.wait_for(handler(json.loads(job['payload'])), self.timeout))
+        self._running[job['id']] = task
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # Worker parado (shutdown): o job volta à fila para outro processo ou o próximo início
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await self._call(self._requeue, job['id'], None, False)
+                raise
+            return  # cancelado via cancel(), que registra o status
+        except Exception as e:
+            error = 'Tempo limite excedido' if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            if job['attempts'] < self.max_attempts:
+                self.stats['retried'] += 1
+                await self._call(self._requeue, job['id'], error, True, self._retry_delay(job['attempts']))
+            else:
+                self.stats['failed'] += 1
+                await self._call(self._finish, job['id'], FAILED, None, error)
+        else:
+            self.stats['completed'] += 1
+            await self._call(self._finish, job['id'], DONE, json.dumps(result, ensure_ascii=False, default=str), None)
+        finally:
+            self._running.pop(job['id'], None)
+
+    async def _evictor(self, interval: float = 60.0) -> None:
+        while True:
+            await self.evict()
+            await asyncio.sleep(interval)
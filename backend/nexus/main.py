@@ -1,15 +1,43 @@
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import asyncio
-import aiohttp
+import hmac
 import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
 from datetime import datetime
 import json
+from connectors import AIConnector, create_session
+from fanout import FanOutPolicy, LatencyTracker, fan_out
+from response_cache import cache_from_env, make_cache_key
+import sip_analyzer
+from instrumentation import Instrumentation, MetricsMiddleware
+from prompts import Prompt
+from job_queue import FINISHED, JobQueue, QueueFull
+from routing import AdaptiveRouter
 
-app = FastAPI(title="Nexus AI", description="Sistema de Orquestração Multi-IA", version="3.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sessão HTTP compartilhada por todos os conectores durante a vida do processo
+    await get_orchestrator().startup()
+    await jobs.start()
+    yield
+    await jobs.stop()
+    await orchestrator.shutdown()
+
+app = FastAPI(title="Nexus AI", description="Sistema de Orquestração Multi-IA", version="3.0.0", lifespan=lifespan)
+
+# Métricas por rota/conector e profiler por amostragem (opcionais: NEXUS_METRICS=1)
+instrumentation = Instrumentation.from_env('nexus')
+if instrumentation is not None:
+    app.add_middleware(MetricsMiddleware, instrumentation=instrumentation)
 
 # CORS
 app.add_middleware(
@@ -25,6 +53,11 @@ class OrchestrateRequest(BaseModel):
     prompt: str
     mode: str = "general"  # general, development, voip_analysis
     context: Optional[Dict[str, Any]] = None
+    strategy: Optional[str] = None  # all, quorum (padrão: NEXUS_FANOUT_STRATEGY)
+    quorum: Optional[int] = None
+    latency_budget: Optional[float] = None  # segundos
+    hedge: Optional[bool] = None
+    quality: Optional[float] = None  # probabilidade alvo do roteamento adaptativo (padrão por modo)
 
 class OrchestrateResponse(BaseModel):
     result: str
@@ -32,40 +65,133 @@ class OrchestrateResponse(BaseModel):
     ais_consulted: List[str]
     processing_time: float
     timestamp: str
+    cached: bool = False
+    completed: List[str] = []
+    cancelled: List[str] = []
+    hedged: Dict[str, str] = {}
+    latencies: Dict[str, float] = {}
+    quorum_reached: bool = False
+    prompt_tokens: int = 0
+    truncated_for: List[str] = []
+    skipped: List[str] = []
+    failed: List[str] = []  # conectores que responderam com erro
 
-class AIConnector:
-    def __init__(self, name: str, api_key: str = None):
-        self.name = name
-        self.api_key = api_key
-        self.enabled = bool(api_key)
-    
-    async def query(self, prompt: str, context: Dict = None) -> str:
-        """Simular consulta à IA"""
-        if not self.enabled:
-            return f"[{self.name}] API não configurada"
-        
-        # Aqui seria a implementação real das APIs
-        await asyncio.sleep(0.5)  # Simular latência
-        return f"[{self.name}] Resposta simulada para: {prompt[:50]}..."
+class DeviceBatchRequest(BaseModel):
+    device_ids: List[str]
+    metrics: Dict[str, List[Optional[float]]]  # colunar: metrics[nome][i] é a leitura de device_ids[i]
+    history: Optional[Dict[str, List[List[Optional[float]]]]] = None  # dispositivos x tempo
+    directions: Optional[Dict[str, int]] = None  # 1 = alto é ruim, -1 = baixo é ruim, 0 = ambos
+    top_n: int = 10
+    escalate: bool = True
+    update_baseline: bool = True
+    include_scores: bool = False
+
+class JobSubmitRequest(BaseModel):
+    kind: str  # orchestrate, analyze_sip, predict_device_failure, auto_correction
+    payload: Dict[str, Any]
+    priority: Optional[int] = None  # padrão: prioridade do modo (NEXUS_JOBS_PRIORITIES)
 
 class NexusOrchestrator:
     def __init__(self):
         self.connectors = {
-            'gemini': AIConnector('Google Gemini', os.getenv('GOOGLE_GEMINI_API_KEY')),
-            'gpt': AIConnector('OpenAI GPT', os.getenv('OPENAI_API_KEY')),
-            'claude': AIConnector('Anthropic Claude', os.getenv('ANTHROPIC_API_KEY')),
-            'qwen': AIConnector('Alibaba Qwen', os.getenv('ALIBABA_QWEN_API_KEY')),
-            'grok': AIConnector('xAI Grok', os.getenv('XAI_GROK_API_KEY')),
+            'gemini': AIConnector.from_env('gemini', 'Google Gemini', 'GOOGLE_GEMINI_API_KEY'),
+            'gpt': AIConnector.from_env('gpt', 'OpenAI GPT', 'OPENAI_API_KEY'),
+            'claude': AIConnector.from_env('claude', 'Anthropic Claude', 'ANTHROPIC_API_KEY'),
+            'qwen': AIConnector.from_env('qwen', 'Alibaba Qwen', 'ALIBABA_QWEN_API_KEY'),
+            'grok': AIConnector.from_env('grok', 'xAI Grok', 'XAI_GROK_API_KEY'),
         }
         
         self.dev_connectors = {
-            'code_llama': AIConnector('Code Llama', os.getenv('CODE_LLAMA_API_KEY')),
-            'alphacode': AIConnector('AlphaCode', os.getenv('ALPHACODE_API_KEY')),
-            'copilot': AIConnector('GitHub Copilot', os.getenv('COPILOT_API_KEY')),
+            'code_llama': AIConnector.from_env('code_llama', 'Code Llama', 'CODE_LLAMA_API_KEY'),
+            'alphacode': AIConnector.from_env('alphacode', 'AlphaCode', 'ALPHACODE_API_KEY'),
+            'copilot': AIConnector.from_env('copilot', 'GitHub Copilot', 'COPILOT_API_KEY'),
+        }
+        
+        self.cache = cache_from_env()
+        self.session = None
+        self.policy = FanOutPolicy.from_env()
+        self.latency_tracker = LatencyTracker()
+        self.router = AdaptiveRouter.from_env()
+        
+        if instrumentation is not None:
+            for connector in {**self.connectors, **self.dev_connectors}.values():
+                connector.observer = instrumentation.observe_connector
+    
+    async def startup(self):
+        """Cria a sessão HTTP compartilhada e a associa a todos os conectores"""
+        if self.session is None:
+            self.session = create_session()
+            for connector in {**self.connectors, **self.dev_connectors}.values():
+                connector.bind(self.session)
+    
+    async def shutdown(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.cache.backend is not None:
+            await self.cache.backend.close()
+    
+    def _policy_for(self, request: OrchestrateRequest) -> FanOutPolicy:
+        """Política padrão do ambiente com sobrescritas da requisição"""
+        overrides = {
+            name: getattr(request, name)
+            for name in ('strategy', 'quorum', 'latency_budget', 'hedge')
+            if getattr(request, name) is not None
         }
+        return replace(self.policy, **overrides)
     
-    async def orchestrate(self, request: OrchestrateRequest) -> OrchestrateResponse:
-        start_time = datetime.utcnow()
+    def _route(self, request: OrchestrateRequest, policy: FanOutPolicy,
+               enabled_connectors: Dict[str, AIConnector]) -> Tuple[Dict[str, AIConnector], FanOutPolicy, List[str]]:
+        """Subconjunto escolhido pelo roteador (reservas ao final, para hedging) e conectores pulados"""
+        target = self.router.target(request.mode)
+        overrides = {"latency_target": policy.latency_budget or target.latency_target}
+        if policy.strategy == "quorum":
+            overrides["min_providers"] = max(target.min_providers, policy.quorum)
+        if request.quality is not None:
+            overrides["quality"] = request.quality
+        chosen, spares = self.router.select(list(enabled_connectors), replace(target, **overrides))
+        if policy.hedge and spares:
+            policy = replace(policy, max_primaries=min(policy.max_primaries or len(chosen), len(chosen)))
+        else:
+            spares = []
+        routed = {name: enabled_connectors[name] for name in chosen + spares}
+        return routed, policy, [name for name in enabled_connectors if name not in chosen]
+    
+    def _record_fanout(self, fanout, policy: FanOutPolicy, elapsed: float, tokens: int) -> None:
+        """Alimenta o roteador; cancelados pelo orçamento de latência contam como falha"""
+        for name in fanout.completed:
+            ok = name in fanout.responses
+            self.router.record(name, fanout.latencies.get(name), ok, tokens if ok else 0)
+        timed_out = policy.latency_budget and not fanout.quorum_reached and elapsed >= policy.latency_budget
+        for name in fanout.cancelled:
+            if timed_out and fanout.latencies.get(name, 0) >= policy.latency_budget * 0.99:
+                self.router.record(name, None, False)
+            else:
+                self.router.release(name)
+    
+    async def orchestrate(self, request: OrchestrateRequest, prompt: Optional[Prompt] = None) -> OrchestrateResponse:
+        """Orquestra com cache e coalescência de requisições idênticas em andamento.
+        
+        `prompt` (montado uma vez pelo endpoint) é cortado pelo orçamento de cada conector;
+        sem ele, o texto de `request.prompt` é usado.
+        """
+        policy = self._policy_for(request)
+        key = make_cache_key(request.prompt, f"{request.mode}|{policy.cache_tag()}|{request.quality}", request.context)
+        
+        async def compute():
+            response = await self._orchestrate_uncached(request, policy, prompt or Prompt.from_text(request.prompt))
+            return response.model_dump()
+        
+        # Só respostas completas vão ao cache: ao menos um sucesso e nenhum conector com erro
+        value, origin = await self.cache.get_or_compute(
+            key, compute, cacheable=lambda value: bool(value['ais_consulted']) and not value['failed']
+        )
+        return OrchestrateResponse(**{**value, 'cached': origin != 'miss'})
+    
+    async def _orchestrate_uncached(self, request: OrchestrateRequest, policy: FanOutPolicy,
+                                    prompt: Prompt) -> OrchestrateResponse:
+        start = time.perf_counter()
+        await self.startup()
         
         # Selecionar IAs baseado no modo
         if request.mode == "development":
@@ -85,72 +211,209 @@ class NexusOrchestrator:
                 timestamp=datetime.utcnow().isoformat()
             )
         
-        # Consultar IAs em paralelo
-        tasks = []
-        for name, connector in enabled_connectors.items():
-            tasks.append(self._query_ai(connector, request.prompt, request.context))
+        # Roteamento adaptativo: menor subconjunto saudável que atende ao alvo do modo
+        routed_connectors, policy, skipped = self._route(request, policy, enabled_connectors)
         
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        # Consultar IAs em paralelo (quórum, orçamento de latência e hedging conforme a política)
+        fanout = await fan_out(routed_connectors, prompt, request.context,
+                               policy=policy, tracker=self.latency_tracker)
+        fanout_done = time.perf_counter()
+        self._record_fanout(fanout, policy, fanout_done - start, prompt.tokens)
         
         # Processar respostas
         valid_responses = []
         ais_consulted = []
         
-        for i, (name, response) in enumerate(zip(enabled_connectors.keys(), responses)):
+        for name in fanout.completed:
             ais_consulted.append(name)
-            if isinstance(response, Exception):
-                valid_responses.append(f"[{name}] Erro: {str(response)}")
+            if name in fanout.errors:
+                valid_responses.append(f"[{name}] Erro: {fanout.errors[name]}")
             else:
-                valid_responses.append(response)
+                valid_responses.append(fanout.responses[name])
         
-        # Gerar consenso (simplificado)
+        # Gerar consenso entre as respostas válidas (falhas contam no total consultado)
+        successful = [fanout.responses[name] for name in fanout.completed if name in fanout.responses]
         if valid_responses:
-            # Em uma implementação real, aqui seria o algoritmo de consenso
-            consensus_result = self._generate_consensus(valid_responses, request.prompt)
-            consensus_score = 0.85  # Score simulado
+            consensus_result, consensus_score = self._generate_consensus(
+                successful, request.prompt, total=len(valid_responses), threshold=policy.agreement_threshold
+            )
         else:
             consensus_result = "Não foi possível gerar resposta."
             consensus_score = 0.0
         
-        processing_time = (datetime.utcnow() - start_time).total_seconds()
+        end = time.perf_counter()
+        processing_time = end - start
+        if instrumentation is not None:
+            instrumentation.stages.observe(fanout_done - start, 'fanout')
+            instrumentation.stages.observe(end - fanout_done, 'consensus')
         
         return OrchestrateResponse(
             result=consensus_result,
             consensus_score=consensus_score,
             ais_consulted=ais_consulted,
             processing_time=processing_time,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=datetime.utcnow().isoformat(),
+            completed=fanout.completed,
+            cancelled=fanout.cancelled,
+            hedged=fanout.hedged,
+            latencies=fanout.latencies,
+            quorum_reached=fanout.quorum_reached,
+            prompt_tokens=prompt.tokens,
+            truncated_for=[name for name, connector in routed_connectors.items() if prompt.truncated_for(connector)],
+            skipped=skipped,
+            failed=[name for name in fanout.completed if name in fanout.errors]
         )
     
-    async def _query_ai(self, connector: AIConnector, prompt: str, context: Dict = None) -> str:
+    async def orchestrate_stream(self, request: OrchestrateRequest, queue_size: int = 64):
+        """Gera eventos (token, done, error, consensus) conforme cada IA responde.
+        
+        Cada conector roda em sua própria task e publica numa fila limitada, de modo
+        que um consumidor lento aplica backpressure aos provedores. Ao fechar o
+        gerador (cliente desconectado) todas as tasks pendentes são canceladas.
+        """
+        start = time.perf_counter()
+        await self.startup()
+        policy = self._policy_for(request)
+        prompt = Prompt.from_text(request.prompt)
+        
+        if request.mode == "development":
+            active_connectors = {**self.connectors, **self.dev_connectors}
+        else:
+            active_connectors = self.connectors
+        enabled_connectors = {k: v for k, v in active_connectors.items() if v.enabled}
+        
+        if not enabled_connectors:
+            yield {"type": "consensus", "result": "Nenhuma IA configurada. Configure as API Keys no painel de configurações.",
+                   "consensus_score": 0.0, "ais_consulted": []}
+            return
+        
+        # Sem hedging no streaming: as reservas do roteador não são usadas
+        enabled_connectors, _, skipped = self._route(request, replace(policy, hedge=False), enabled_connectors)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        if policy.strategy == "quorum":
+            from consensus import largest_cluster_size
+        
+        async def pump(name: str, connector: AIConnector):
+            started = time.perf_counter()
+            parts = []
+            try:
+                async for chunk in connector.stream(prompt.for_connector(connector), request.context):
+                    parts.append(chunk)
+                    await queue.put({"type": "token", "provider": name, "text": chunk})
+                latency = time.perf_counter() - started
+                self.latency_tracker.record(name, latency)
+                self.router.record(name, latency, True, prompt.tokens)
+                await queue.put({"type": "done", "provider": name, "text": "".join(parts),
+                                 "latency": round(latency, 4)})
+            except asyncio.CancelledError:
+                self.router.release(name)
+                raise
+            except Exception as e:
+                self.router.record(name, time.perf_counter() - started, False)
+                await queue.put({"type": "error", "provider": name, "error": str(e) or type(e).__name__,
+                                 "latency": round(time.perf_counter() - started, 4)})
+        
+        tasks = {name: asyncio.ensure_future(pump(name, connector))
+                 for name, connector in enabled_connectors.items()}
+        deadline = start + policy.latency_budget if policy.latency_budget else None
+        responses: Dict[str, str] = {}
+        failed = set()
+        completed: List[str] = []
+        latencies: Dict[str, float] = {}
+        quorum_reached = False
+        
         try:
-            return await connector.query(prompt, context)
-        except Exception as e:
-            return f"Erro ao consultar {connector.name}: {str(e)}"
+            while len(completed) < len(tasks):
+                timeout = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event["type"] in ("done", "error"):
+                    completed.append(event["provider"])
+                    latencies[event["provider"]] = event["latency"]
+                    if event["type"] == "done":
+                        responses[event["provider"]] = event.pop("text")
+                    else:
+                        failed.add(event["provider"])
+                        responses[event["provider"]] = f"[{event['provider']}] Erro: {event['error']}"
+                yield event
+                
+                if policy.strategy == "quorum" and event["type"] == "done" and largest_cluster_size(
+                        [responses[n] for n in completed if n not in failed],
+                        policy.agreement_threshold) >= policy.quorum:
+                    quorum_reached = True
+                    break
+        finally:
+            cancelled = [name for name, task in tasks.items() if not task.done()]
+            for name in cancelled:
+                tasks[name].cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        successful = [responses[name] for name in completed if name not in failed]
+        consensus_result, consensus_score = self._generate_consensus(
+            successful, request.prompt, total=len(completed), threshold=policy.agreement_threshold
+        )
+        yield {
+            "type": "consensus",
+            "result": consensus_result,
+            "consensus_score": consensus_score,
+            "ais_consulted": completed,
+            "cancelled": cancelled,
+            "skipped": skipped,
+            "latencies": latencies,
+            "quorum_reached": quorum_reached,
+            "processing_time": round(time.perf_counter() - start, 4),
+            "timestamp": datetime.utcnow().isoformat()
+        }
     
-    def _generate_consensus(self, responses: List[str], prompt: str) -> str:
-        """Gerar consenso a partir das respostas (implementação simplificada)"""
-        if not responses:
-            return "Nenhuma resposta válida obtida."
+    def _generate_consensus(self, responses: List[str], prompt: str, total: int = None,
+                            threshold: float = None) -> Tuple[str, float]:
+        """Gerar consenso a partir das respostas: medoide do maior grupo concordante e score"""
+        from consensus import build_consensus
+        kwargs = {"threshold": threshold} if threshold is not None else {}
+        consensus = build_consensus(responses, total, **kwargs)
+        if consensus is None:
+            return "Nenhuma resposta válida obtida.", 0.0
         
-        # Em uma implementação real, aqui seria um algoritmo sofisticado de consenso
-        return f"""
+        agreeing = consensus.clusters[0]
+        result = f"""
 ## Resposta Consensual do Nexus AI
 
 **Prompt analisado:** {prompt}
 
-**Análise integrada de {len(responses)} IAs:**
+**Análise integrada de {total or len(responses)} IAs ({len(agreeing)} em acordo):**
 
-{chr(10).join([f"• {response}" for response in responses[:3]])}
+{chr(10).join([f"• {responses[i]}" for i in agreeing[:3]])}
 
 **Consenso Final:**
-Baseado na análise das múltiplas inteligências artificiais consultadas, a resposta mais alinhada e validada é uma síntese das perspectivas apresentadas, considerando aspectos de precisão técnica, relevância contextual e alinhamento ético.
+{consensus.answer}
 
 *Esta resposta foi gerada através do sistema de consenso do Nexus AI v3.0*
         """.strip()
+        return result, consensus.score
 
 # Instância global do orquestrador
-orchestrator = NexusOrchestrator()
+# Criados no primeiro uso (lifespan ou endpoint), não na importação: ler o ambiente,
+# montar conectores e importar numpy (consenso, pontuação de dispositivos) fica fora
+# do caminho de quem só importa o módulo
+orchestrator: Optional[NexusOrchestrator] = None
+device_model = None
+jobs = JobQueue.from_env()
+
+def get_orchestrator() -> NexusOrchestrator:
+    global orchestrator
+    if orchestrator is None:
+        orchestrator = NexusOrchestrator()
+    return orchestrator
+
+def get_device_model():
+    global device_model
+    if device_model is None:
+        from device_scoring import MAX_DEVICES, MAX_TOP_N, DeviceRiskModel
+        device_model = DeviceRiskModel(max_devices=int(os.getenv("NEXUS_DEVICE_MAX_TRACKED", MAX_DEVICES)),
+                                       max_top_n=int(os.getenv("NEXUS_DEVICE_MAX_TOP_N", MAX_TOP_N)))
+    return device_model
 
 # Endpoints
 @app.get("/")
@@ -164,6 +427,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    orchestrator = get_orchestrator()
     enabled_ais = [name for name, connector in orchestrator.connectors.items() if connector.enabled]
     enabled_dev_ais = [name for name, connector in orchestrator.dev_connectors.items() if connector.enabled]
     
@@ -172,53 +436,268 @@ async def health_check():
         "enabled_ais": enabled_ais,
         "enabled_dev_ais": enabled_dev_ais,
         "total_enabled": len(enabled_ais) + len(enabled_dev_ais),
+        "cache": orchestrator.cache.stats(),
+        "device_model": device_model.stats() if device_model is not None else {"devices": 0, "metrics": []},
+        "jobs": await jobs.info(),
+        "routing": orchestrator.router.stats(),
+        "connectors": {
+            name: connector.stats
+            for name, connector in {**orchestrator.connectors, **orchestrator.dev_connectors}.items()
+            if connector.enabled
+        },
         "timestamp": datetime.utcnow().isoformat()
     }
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def _require_metrics(request: Request) -> Instrumentation:
+    """Métricas ativas e, com METRICS_TOKEN, 'Authorization: Bearer <token>'"""
+    if instrumentation is None:
+        raise HTTPException(status_code=404, detail="Métricas desativadas (NEXUS_METRICS=1)")
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    return instrumentation
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(metrics: Instrumentation = Depends(_require_metrics)):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/profile")
+async def metrics_profile(format: str = "collapsed", metrics: Instrumentation = Depends(_require_metrics)):
+    """Pilhas das requisições lentas (collapsed para flamegraph.pl/speedscope, ou json)"""
+    profiler = metrics.profiler
+    if format == "json":
+        return {
+            "enabled": profiler is not None,
+            "slow_ms": profiler.slow_threshold * 1000 if profiler else 0,
+            "samples": profiler.samples if profiler else 0,
+            "slow_requests": profiler.slow_requests() if profiler else []
+        }
+    return PlainTextResponse(profiler.collapsed() if profiler else "")
+
+@app.post("/metrics/profile")
+async def toggle_profiler(slow_ms: float = 0, metrics: Instrumentation = Depends(_require_metrics)):
+    """Liga o profiler para requisições acima de slow_ms (0 desliga)"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=403, detail="Configure METRICS_TOKEN para alterar o profiler")
+    metrics.set_profiler(max(slow_ms, 0) / 1000)
+    return {"enabled": metrics.profiler is not None, "slow_ms": slow_ms if metrics.profiler else 0}
+
 @app.post("/orchestrate", response_model=OrchestrateResponse)
 async def orchestrate_ais(request: OrchestrateRequest):
     try:
-        result = await orchestrator.orchestrate(request)
+        result = await get_orchestrator().orchestrate(request)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na orquestração: {str(e)}")
 
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.post("/orchestrate/stream")
+async def orchestrate_stream(request: OrchestrateRequest):
+    """Server-Sent Events com os trechos de cada IA e, por fim, o consenso"""
+    async def events():
+        stream = get_orchestrator().orchestrate_stream(request)
+        try:
+            async for event in stream:
+                yield _sse(event)
+        finally:
+            # Desconexão do cliente: fecha o gerador e cancela as consultas pendentes
+            await stream.aclose()
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/orchestrate/ws")
+async def orchestrate_ws(websocket: WebSocket):
+    """WebSocket: cada mensagem recebida é um OrchestrateRequest; os eventos são enviados em JSON"""
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = OrchestrateRequest(**await websocket.receive_json())
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({"type": "error", "error": f"Requisição inválida: {e}"})
+                continue
+            stream = get_orchestrator().orchestrate_stream(request)
+            try:
+                async for event in stream:
+                    await websocket.send_json(event)
+            finally:
+                await stream.aclose()
+    except WebSocketDisconnect:
+        pass
+
+async def _sip_report(result: Dict[str, Any], anomalies: int) -> Dict[str, Any]:
+    """Envia à IA apenas o resumo dos diálogos anômalos"""
+    analysis = None
+    if result["anomalies"]:
+        request = OrchestrateRequest(
+            prompt=sip_analyzer.build_prompt(result, limit=anomalies),
+            mode="voip_analysis",
+            context={"analysis_type": "sip_log"}
+        )
+        analysis = await get_orchestrator().orchestrate(request)
+    return {"stats": result["stats"], "anomalies": result["anomalies"], "analysis": analysis}
+
+async def analyze_sip(file_content: str):
+    result = sip_analyzer.analyze_chunks([file_content.encode("utf-8")])
+    if not result["stats"]["messages"]:
+        # Conteúdo sem mensagens SIP reconhecíveis: segue direto para a IA
+        prompt = Prompt.from_text(file_content, "Analise este log SIP e forneça diagnóstico detalhado:")
+        request = OrchestrateRequest(
+            prompt=prompt.text,
+            mode="voip_analysis",
+            context={"analysis_type": "sip_log"}
+        )
+        return await get_orchestrator().orchestrate(request, prompt)
+    return await _sip_report(result, anomalies=30)
+
 @app.post("/analyze_sip")
 async def analyze_sip_log(file_content: str):
     """Análise de logs SIP via Nexus AI"""
-    request = OrchestrateRequest(
-        prompt=f"Analise este log SIP e forneça diagnóstico detalhado:\n\n{file_content}",
-        mode="voip_analysis",
-        context={"analysis_type": "sip_log"}
+    return await analyze_sip(file_content)
+
+@app.post("/analyze_sip/upload")
+async def analyze_sip_upload(file: UploadFile = File(...), anomalies: int = Query(30, ge=1),
+                             pdd_threshold: float = 5.0, max_open_dialogs: int = Query(50000, ge=1)):
+    """Análise em streaming de arquivos de log SIP grandes"""
+    # O upload fica em arquivo temporário; a leitura via mmap não bloqueia o event loop
+    result = await run_in_threadpool(
+        sip_analyzer.analyze_file, file.file,
+        pdd_threshold=pdd_threshold, max_open_dialogs=max_open_dialogs, max_anomalies=anomalies
     )
-    
-    result = await orchestrator.orchestrate(request)
-    return result
+    await file.close()
+    return await _sip_report(result, anomalies=anomalies)
 
-@app.post("/predict_device_failure")
-async def predict_device_failure(device_data: Dict[str, Any]):
-    """Análise preditiva de falhas de dispositivos"""
+async def predict_device_failure(device_data: Dict[str, Any]) -> OrchestrateResponse:
+    prompt = Prompt.from_data("Analise os dados do dispositivo e preveja possíveis falhas:", device_data)
     request = OrchestrateRequest(
-        prompt=f"Analise os dados do dispositivo e preveja possíveis falhas:\n\n{json.dumps(device_data, indent=2)}",
+        prompt=prompt.text,
         mode="general",
         context={"analysis_type": "predictive_maintenance"}
     )
     
-    result = await orchestrator.orchestrate(request)
+    result = await get_orchestrator().orchestrate(request, prompt)
     return result
 
-@app.post("/auto_correction")
-async def auto_correction(error_data: Dict[str, Any]):
-    """Sistema de auto-correção"""
+@app.post("/predict_device_failure")
+async def predict_device_failure_endpoint(device_data: Dict[str, Any]):
+    """Análise preditiva de falhas de dispositivos"""
+    return await predict_device_failure(device_data)
+
+@app.post("/predict_device_failure/batch")
+async def predict_device_failure_batch(batch: DeviceBatchRequest):
+    """Pontuação local de um lote de dispositivos; só os mais suspeitos vão para a IA"""
+    start_time = time.perf_counter()
+    # Leituras ausentes (null) viram NaN na conversão para NumPy e são ignoradas
+    try:
+        result = await run_in_threadpool(
+            get_device_model().score, batch.device_ids, batch.metrics, history=batch.history, directions=batch.directions,
+            top_n=batch.top_n, update=batch.update_baseline
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    scoring_time = time.perf_counter() - start_time
+
+    analysis = None
+    if batch.escalate and len(result.top) and result.scores[result.top[0]] > 0:
+        from device_scoring import build_prompt as build_device_prompt
+        request = OrchestrateRequest(
+            prompt=build_device_prompt(result),
+            mode="general",
+            context={"analysis_type": "predictive_maintenance"}
+        )
+        analysis = await get_orchestrator().orchestrate(request)
+
+    response = {
+        "scored": len(batch.device_ids),
+        "scoring_time": round(scoring_time, 4),
+        "top": [result.describe(int(i)) for i in result.top],
+        "analysis": analysis,
+    }
+    if batch.include_scores:
+        response["scores"] = [round(float(v), 3) for v in result.scores]
+    return response
+
+async def auto_correction(error_data: Dict[str, Any]) -> OrchestrateResponse:
+    prompt = Prompt.from_data("Analise este erro do sistema e gere código de correção:", error_data)
     request = OrchestrateRequest(
-        prompt=f"Analise este erro do sistema e gere código de correção:\n\n{json.dumps(error_data, indent=2)}",
+        prompt=prompt.text,
         mode="development",
         context={"analysis_type": "auto_correction"}
     )
     
-    result = await orchestrator.orchestrate(request)
+    result = await get_orchestrator().orchestrate(request, prompt)
     return result
 
+@app.post("/auto_correction")
+async def auto_correction_endpoint(error_data: Dict[str, Any]):
+    """Sistema de auto-correção"""
+    return await auto_correction(error_data)
+
+# Fila persistente: as mesmas análises, executadas fora da requisição HTTP
+
+def _job_handler(function):
+    async def handler(payload: Dict[str, Any]) -> Any:
+        return jsonable_encoder(await function(payload))
+    return handler
+
+jobs.register("orchestrate", _job_handler(lambda payload: get_orchestrator().orchestrate(OrchestrateRequest(**payload))))
+jobs.register("analyze_sip", _job_handler(lambda payload: analyze_sip(payload["file_content"])), "voip_analysis")
+jobs.register("predict_device_failure", _job_handler(predict_device_failure), "general")
+jobs.register("auto_correction", _job_handler(auto_correction), "development")
+
+async def _get_job(job_id: str, with_result: bool = False) -> Dict[str, Any]:
+    job = await jobs.get(job_id, with_result)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado (inexistente ou expirado)")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def submit_job(job: JobSubmitRequest):
+    """Enfileira uma análise; acompanhe em /jobs/{id} e obtenha o resultado em /jobs/{id}/result"""
+    if job.kind not in jobs.handlers:
+        raise HTTPException(status_code=422, detail=f"Tipo de job desconhecido: {job.kind}")
+    mode = None
+    if job.kind == "orchestrate":
+        try:
+            mode = OrchestrateRequest(**job.payload).mode
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Payload inválido: {e}")
+    elif job.kind == "analyze_sip" and not isinstance(job.payload.get("file_content"), str):
+        raise HTTPException(status_code=422, detail="Payload inválido: file_content é obrigatório")
+    try:
+        return await jobs.submit(job.kind, job.payload, mode=mode, priority=job.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return await _get_job(job_id)
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """200 com o resultado; 202 enquanto pendente; 500 se falhou; 410 se cancelado"""
+    job = await _get_job(job_id, with_result=True)
+    if job["status"] not in FINISHED:
+        return JSONResponse(job, status_code=202)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Erro na orquestração: {job['error']}")
+    if job["status"] == "cancelled":
+        raise HTTPException(status_code=410, detail="Job cancelado")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    status = await jobs.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado (inexistente ou expirado)")
+    if status != "cancelled":
+        raise HTTPException(status_code=409, detail=f"Job não pode ser cancelado (status: {status})")
+    return {"id": job_id, "status": status}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
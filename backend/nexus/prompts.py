@@ -0,0 +1,174 @@
+"""Montagem de prompts: serialização compacta, deduplicação e corte pelo orçamento de cada conector.
+
+Um `Prompt` é montado uma vez por requisição (instrução + dados). Os dados
+estruturados são compactados (listas de objetos viram tabelas columns/rows e
+itens idênticos consecutivos viram {"_repeat": n, "_item": ...}) e serializados
+sem indentação. Cada conector recebe a versão que cabe no seu orçamento de
+tokens; versões cortadas são memorizadas por orçamento e compartilhadas.
+"""
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+# Estimativa conservadora para JSON e texto em português (~3,5 caracteres por token)
+CHARS_PER_TOKEN = 3.5
+COMPACT_NOTE = ('Formato dos dados: listas de objetos estão como tabela {"columns": [...], "rows": [[...]]}; '
+                '{"_repeat": n, "_item": x} indica n itens idênticos consecutivos.')
+# Níveis de corte tentados em ordem: (itens por lista, caracteres por texto)
+SHRINK_LEVELS = [(200, 2000), (50, 500), (20, 200), (8, 100), (3, 60), (1, 40)]
+
+
+def dumps(value: Any) -> str:
+    """JSON compacto (orjson quando disponível)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _collapse_runs(items: List[Any]) -> Tuple[List[Any], bool]:
+    collapsed, changed = [], False
+    index = 0
+    while index < len(items):
+        item = items[index]
+        run = 1
+        while index + run < len(items) and items[index + run] == item:
+            run += 1
+        if run > 1:
+            collapsed.append({'_repeat': run, '_item': item})
+            changed = True
+        else:
+            collapsed.append(item)
+        index += run
+    return collapsed, changed
+
+
+def compact(value: Any) -> Tuple[Any, bool]:
+    """Deduplica estruturas repetidas; retorna (valor, se o formato compacto foi usado)"""
+    if isinstance(value, dict):
+        used = False
+        result = {}
+        for key, item in value.items():
+            result[key], inner = compact(item)
+            used = used or inner
+        return result, used
+    if isinstance(value, (list, tuple)):
+        items, used = [], False
+        for item in value:
+            item, inner = compact(item)
+            items.append(item)
+            used = used or inner
+        if len(items) > 1 and all(isinstance(item, dict) for item in items):
+            columns = list(items[0])
+            if columns and all(list(item) == columns for item in items):
+                rows, _ = _collapse_runs([[item[column] for column in columns] for item in items])
+                return {'columns': columns, 'rows': rows}, True
+        items, collapsed = _collapse_runs(items)
+        return items, used or collapsed
+    return value, False
+
+
+def shrink(value: Any, max_items: int, max_chars: int) -> Any:
+    """Corta listas longas (início e fim) e textos longos, marcando o que foi omitido"""
+    if isinstance(value, dict):
+        return {key: shrink(item, max_items, max_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > max_items:
+            head = max(1, max_items - max_items // 3)
+            tail = max_items - head
+            kept = value[:head] + [f'[... {len(value) - head - tail} itens omitidos ...]'] + (value[-tail:] if tail else [])
+        else:
+            kept = value
+        return [shrink(item, max_items, max_chars) for item in kept]
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + f'[... {len(value) - max_chars} caracteres omitidos]'
+    return value
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """Mantém o início e o fim (60/40) cortando em fim de linha; útil para logs"""
+    if len(text) <= max_chars:
+        return text
+    marker = '\n[... {} linhas omitidas ...]\n'
+    budget = max(max_chars - len(marker) - 8, 0)
+    head_end = text.rfind('\n', 0, int(budget * 0.6))
+    head_end = head_end if head_end > 0 else int(budget * 0.6)
+    tail_start = text.find('\n', len(text) - (budget - head_end))
+    tail_start = tail_start + 1 if 0 <= tail_start < len(text) else len(text) - (budget - head_end)
+    omitted = text.count('\n', head_end, tail_start)
+    return text[:head_end] + marker.format(omitted) + text[tail_start:]
+
+
+class Prompt:
+    """Prompt montado uma vez; `render(max_tokens)` devolve a versão que cabe no orçamento"""
+
+    def __init__(self, instruction: str, data: Any = None, text: Optional[str] = None):
+        self.instruction = instruction
+        self._data = None
+        self._body = ''
+        header = instruction
+        if data is not None:
+            self._data, used = compact(data)
+            if used:
+                header = f'{instruction}\n{COMPACT_NOTE}'
+            self._body = dumps(self._data)
+        elif text is not None:
+            self._body = text
+        self._header = header
+        self.text = f'{header}\n\n{self._body}' if self._body else header
+        self.tokens = estimate_tokens(self.text)
+        self._rendered: Dict[int, str] = {}
+
+    @classmethod
+    def from_data(cls, instruction: str, data: Any) -> 'Prompt':
+        return cls(instruction, data=data)
+
+    @classmethod
+    def from_text(cls, text: str, instruction: str = '') -> 'Prompt':
+        if not instruction:
+            return cls(text)
+        return cls(instruction, text=text)
+
+    def render(self, max_tokens: Optional[int] = None) -> str:
+        if not max_tokens or self.tokens <= max_tokens:
+            return self.text
+        rendered = self._rendered.get(max_tokens)
+        if rendered is None:
+            rendered = self._rendered[max_tokens] = self._truncate(max_tokens)
+        return rendered
+
+    def _truncate(self, max_tokens: int) -> str:
+        max_chars = int(max_tokens * CHARS_PER_TOKEN)
+        note = '\n[Dados reduzidos para caber no contexto do modelo]'
+        available = max_chars - len(self._header) - len(note) - 2
+        if available <= 0:
+            return truncate_text(self.text, max_chars)
+        if self._data is not None:
+            for max_items, max_str in SHRINK_LEVELS:
+                body = dumps(shrink(self._data, max_items, max_str))
+                if len(body) <= available:
+                    return f'{self._header}{note}\n\n{body}'
+            return f'{self._header}{note}\n\n{truncate_text(body, available)}'
+        if not self._body:
+            return truncate_text(self.text, max_chars)
+        return f'{self._header}{note}\n\n{truncate_text(self._body, available)}'
+
+    def for_connector(self, connector) -> str:
+        return self.render(getattr(connector, 'prompt_budget', None))
+
+    def truncated_for(self, connector) -> bool:
+        budget = getattr(connector, 'prompt_budget', None)
+        return bool(budget) and self.tokens > budget
+
+
+def prompt_for(prompt, connector) -> str:
+    """Texto do prompt para um conector (aceita str ou Prompt)"""
+    return prompt.for_connector(connector) if isinstance(prompt, Prompt) else prompt
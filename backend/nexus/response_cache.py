@@ -0,0 +1,189 @@
+"""Cache de respostas do orquestrador com coalescência de requisições em andamento.
+
+A chave combina prompt normalizado, modo e hash do contexto. Os backends são
+plugáveis: memória do processo (LRU com TTL e limite de tamanho) ou um
+servidor compatível com Redis (REDIS_URL).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE_RE.sub(' ', prompt).strip()
+
+
+def make_cache_key(prompt: str, mode: str, context: Optional[Dict[str, Any]] = None) -> str:
+    context_hash = hashlib.sha256(
+        json.dumps(context or {}, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    raw = '\x1f'.join([normalize_prompt(prompt), mode, context_hash])
+    return 'nexus:orchestrate:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+class MemoryCacheBackend:
+    """LRU em memória com TTL, limitado por número de entradas e bytes"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        if key in self._entries:
+            self._drop(key)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self.evictions}
+
+
+class RedisCacheBackend:
+    """Backend compatível com Redis (requer o pacote `redis`)"""
+
+    name = 'redis'
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError('Backend redis requer o pacote "redis" instalado') from e
+        self.url = url
+        self._client = aioredis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'url': self.url}
+
+
+class ResponseCache:
+    """Cache com TTL e single-flight: requisições idênticas simultâneas compartilham uma execução"""
+
+    def __init__(self, backend=None, ttl: float = 300.0):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]],
+                             cacheable: Callable[[Dict[str, Any]], bool] = lambda value: True):
+        """Retorna (valor, origem) onde origem é 'hit', 'coalesced' ou 'miss'"""
+        if self.backend is not None:
+            try:
+                cached = await self.backend.get(key)
+            except Exception:
+                cached = None
+                self.errors += 1
+            if cached is not None:
+                self.hits += 1
+                return json.loads(cached), 'hit'
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            origin = 'coalesced'
+        else:
+            self.misses += 1
+            origin = 'miss'
+            # Executa em task própria: o cancelamento de um chamador não afeta os demais
+            task = asyncio.ensure_future(self._compute_and_store(key, compute, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), origin
+
+    async def _compute_and_store(self, key, compute, cacheable):
+        value = await compute()
+        if self.backend is not None and cacheable(value):
+            try:
+                await self.backend.set(key, json.dumps(value), self.ttl)
+            except Exception:
+                self.errors += 1
+        return value
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Marca a exceção como recuperada quando nenhum chamador aguardava
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'backend': self.backend.name if self.backend is not None else None,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'inflight': len(self._inflight),
+            'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            **(self.backend.stats() if self.backend is not None else {}),
+        }
+
+
+def cache_from_env() -> ResponseCache:
+    """NEXUS_CACHE_BACKEND=memory|redis|none, NEXUS_CACHE_TTL, NEXUS_CACHE_MAX_ENTRIES, NEXUS_CACHE_MAX_BYTES"""
+    backend_name = os.getenv('NEXUS_CACHE_BACKEND', 'memory').lower()
+    ttl = float(os.getenv('NEXUS_CACHE_TTL', '300'))
+    if backend_name == 'none':
+        backend = None
+    elif backend_name == 'redis':
+        backend = RedisCacheBackend(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+    else:
+        backend = MemoryCacheBackend(
+            max_entries=int(os.getenv('NEXUS_CACHE_MAX_ENTRIES', '1024')),
+            max_bytes=int(os.getenv('NEXUS_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+    return ResponseCache(backend, ttl)
@@ -0,0 +1,232 @@
+"""Roteamento adaptativo dos conectores: latência e taxa de erro por EWMA, custo e circuit breaker.
+
+A cada orquestração o roteador escolhe o menor subconjunto de conectores que,
+pelas estatísticas observadas, atinge o alvo do modo: pelo menos
+`min_providers` respostas dentro de `latency_target` com probabilidade
+`quality`. Cada conector tem probabilidade estimada de sucesso
+(1 - taxa de erro) x P(latência <= alvo), com a latência aproximada por uma
+normal de média e desvio EWMA. Conectores ainda sem amostras suficientes
+entram sempre (aprendizado) e, com probabilidade `explore`, um conector fora
+da seleção é incluído para que suas estatísticas não envelheçam.
+
+O circuit breaker abre após `failures` erros seguidos ou taxa de erro acima de
+`max_error_rate`; depois de `cooldown` segundos (dobrando a cada reabertura)
+uma única consulta de teste decide se ele fecha. Se todos os conectores
+estiverem com o circuito aberto, todos são consultados (fail-open).
+"""
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+# Custo estimado (USD por 1k tokens de prompt) por conector; NEXUS_<KEY>_COST sobrescreve
+DEFAULT_COSTS = {
+    'gemini': 0.00125, 'gpt': 0.0025, 'claude': 0.003, 'qwen': 0.0004, 'grok': 0.002,
+    'code_llama': 0.0002, 'alphacode': 0.001, 'copilot': 0.001,
+}
+
+
+def _env(name: str, default: str) -> str:
+    return os.getenv(name) or default
+
+
+@dataclass
+class RoutingTarget:
+    min_providers: int = 2
+    latency_target: float = 10.0  # segundos
+    quality: float = 0.95  # probabilidade desejada de obter min_providers respostas no prazo
+
+    @classmethod
+    def from_env(cls, mode: str) -> 'RoutingTarget':
+        """NEXUS_ROUTING_MIN_PROVIDERS, _LATENCY_TARGET e _QUALITY, com sobrescrita por modo
+        (ex.: NEXUS_ROUTING_DEVELOPMENT_LATENCY_TARGET)"""
+        def value(field: str, default: str) -> str:
+            return _env(f'NEXUS_ROUTING_{mode.upper()}_{field}', _env(f'NEXUS_ROUTING_{field}', default))
+        return cls(
+            min_providers=int(value('MIN_PROVIDERS', '2')),
+            latency_target=float(value('LATENCY_TARGET', '30' if mode == 'development' else '10')),
+            quality=float(value('QUALITY', '0.95')),
+        )
+
+
+class ConnectorHealth:
+    """Estatísticas EWMA e estado do circuit breaker de um conector"""
+
+    def __init__(self, cost: float = 0.0, alpha: float = 0.2):
+        self.cost = cost
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.deviation = 0.0
+        self.error_rate = 0.0
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.probing = 0.0  # início da consulta de teste em andamento (circuito meio-aberto)
+        self.selected = 0
+        self.skipped = 0
+        self.spent = 0.0
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        if latency is not None and ok:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                error = latency - self.latency
+                self.latency += self.alpha * error
+                self.deviation += self.alpha * (abs(error) - self.deviation)
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        self.samples += 1
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    def success_probability(self, latency_target: float) -> float:
+        if self.latency is None:
+            on_time = 1.0
+        else:
+            spread = max(self.deviation * 1.25, self.latency * 0.1, 1e-3)  # desvio médio -> desvio padrão
+            on_time = 0.5 * (1 + math.erf((latency_target - self.latency) / (spread * math.sqrt(2))))
+        return (1.0 - self.error_rate) * on_time
+
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'deviation_ms': round(self.deviation * 1000, 1),
+            'error_rate': round(self.error_rate, 4),
+            'cost_per_1k_tokens': self.cost,
+            'samples': self.samples,
+            'consecutive_failures': self.consecutive_failures,
+            'selected': self.selected,
+            'skipped': self.skipped,
+            'estimated_spend': round(self.spent, 6),
+        }
+
+
+def at_least(probabilities: List[float], k: int) -> float:
+    """P(pelo menos k sucessos) para tentativas independentes (Poisson-binomial)"""
+    if k <= 0:
+        return 1.0
+    distribution = [1.0] + [0.0] * len(probabilities)
+    for n, p in enumerate(probabilities, 1):
+        for successes in range(n, 0, -1):
+            distribution[successes] = distribution[successes] * (1 - p) + distribution[successes - 1] * p
+        distribution[0] *= 1 - p
+    return sum(distribution[k:])
+
+
+class AdaptiveRouter:
+    def __init__(self, costs: Optional[Dict[str, float]] = None, enabled: bool = True, alpha: float = 0.2,
+                 min_samples: int = 5, failures: int = 5, max_error_rate: float = 0.5,
+                 cooldown: float = 30.0, max_cooldown: float = 600.0, explore: float = 0.05):
+        self.costs = costs or {}
+        self.enabled = enabled
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.failures = failures
+        self.max_error_rate = max_error_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.explore = explore
+        self.health: Dict[str, ConnectorHealth] = {}
+        self._targets: Dict[str, RoutingTarget] = {}
+
+    @classmethod
+    def from_env(cls) -> 'AdaptiveRouter':
+        """NEXUS_ROUTING (adaptive ou all), NEXUS_BREAKER_FAILURES, _ERROR_RATE, _COOLDOWN e
+        NEXUS_ROUTING_EXPLORE; custo por conector em NEXUS_<KEY>_COST"""
+        return cls(
+            costs={key: float(_env(f'NEXUS_{key.upper()}_COST', str(cost))) for key, cost in DEFAULT_COSTS.items()},
+            enabled=_env('NEXUS_ROUTING', 'adaptive') == 'adaptive',
+            failures=int(_env('NEXUS_BREAKER_FAILURES', '5')),
+            max_error_rate=float(_env('NEXUS_BREAKER_ERROR_RATE', '0.5')),
+            cooldown=float(_env('NEXUS_BREAKER_COOLDOWN', '30')),
+            explore=float(_env('NEXUS_ROUTING_EXPLORE', '0.05')),
+        )
+
+    def target(self, mode: str) -> RoutingTarget:
+        target = self._targets.get(mode)
+        if target is None:
+            target = self._targets[mode] = RoutingTarget.from_env(mode)
+        return target
+
+    def _health(self, name: str) -> ConnectorHealth:
+        health = self.health.get(name)
+        if health is None:
+            health = self.health[name] = ConnectorHealth(self.costs.get(name, 0.0), self.alpha)
+        return health
+
+    def _available(self, health: ConnectorHealth, now: float) -> bool:
+        if health.state == OPEN and now - health.opened_at >= health.cooldown:
+            health.state = HALF_OPEN
+            health.probing = 0.0
+        # Uma única consulta de teste por vez; uma que nunca reportou resultado expira após o cooldown
+        if health.state == HALF_OPEN and (not health.probing or now - health.probing >= health.cooldown):
+            health.probing = now
+            return True
+        return health.state == CLOSED
+
+    def select(self, names: List[str], target: RoutingTarget) -> Tuple[List[str], List[str]]:
+        """(conectores escolhidos em ordem de preferência, demais disponíveis como reserva)"""
+        now = time.monotonic()
+        healthy = [name for name in names if self._available(self._health(name), now)]
+        if not healthy:
+            healthy = list(names)
+        if not self.enabled:
+            chosen, spares = healthy, []
+        else:
+            learning = [name for name in healthy if self.health[name].samples < self.min_samples
+                        or self.health[name].state == HALF_OPEN]
+            ranked = sorted(
+                (name for name in healthy if name not in learning),
+                key=lambda name: (-round(self.health[name].success_probability(target.latency_target), 2),
+                                  self.health[name].cost, self.health[name].latency or 0.0))
+            chosen = list(learning)
+            probabilities = [self.health[name].success_probability(target.latency_target) for name in chosen]
+            for name in ranked:
+                if len(chosen) >= target.min_providers and at_least(probabilities, target.min_providers) >= target.quality:
+                    break
+                chosen.append(name)
+                probabilities.append(self.health[name].success_probability(target.latency_target))
+            spares = [name for name in ranked if name not in chosen]
+            if spares and random.random() < self.explore:
+                chosen.append(spares.pop(random.randrange(len(spares))))
+        for name in names:
+            if name in chosen:
+                self.health[name].selected += 1
+            else:
+                self.health[name].skipped += 1
+        return chosen, spares
+
+    def record(self, name: str, latency: Optional[float], ok: bool, tokens: int = 0) -> None:
+        health = self._health(name)
+        health.record(latency, ok)
+        if ok:
+            health.spent += health.cost * tokens / 1000
+            if health.state != CLOSED:
+                health.state, health.cooldown = CLOSED, 0.0
+        elif health.state == HALF_OPEN or health.consecutive_failures >= self.failures or (
+                health.samples >= self.min_samples and health.error_rate > self.max_error_rate):
+            self._open(health)
+        health.probing = 0.0
+
+    def release(self, name: str) -> None:
+        """Consulta cancelada sem resultado: libera a vaga de teste do circuito meio-aberto"""
+        self._health(name).probing = 0.0
+
+    def _open(self, health: ConnectorHealth) -> None:
+        reopened = health.state in (OPEN, HALF_OPEN)
+        health.cooldown = min(health.cooldown * 2, self.max_cooldown) if reopened and health.cooldown \
+            else self.base_cooldown
+        health.state = OPEN
+        health.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            'mode': 'adaptive' if self.enabled else 'all',
+            'targets': {mode: vars(target) for mode, target in self._targets.items()},
+            'connectors': {name: health.snapshot() for name, health in self.health.items()},
+        }
@@ -0,0 +1,470 @@
+"""Análise incremental de logs SIP (dumps de texto do ngrep, sngrep, tshark, Kamailio).
+
+As mensagens são lidas em blocos (arquivo, mmap ou qualquer iterável de
+bytes) e agrupadas por Call-ID em diálogos. As estatísticas (histograma de
+códigos de resposta, retransmissões, PDD, INVITEs com falha) são calculadas
+localmente; apenas resumos compactos dos diálogos anômalos seguem para a IA.
+A memória é limitada pelo número de diálogos abertos e de anomalias guardadas.
+"""
+import heapq
+import mmap
+import os
+import random
+import re
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Linha inicial de requisição ou resposta, com prefixos opcionais de ferramentas de captura.
+# Os padrões começam por '\n' literal (busca rápida no re) em vez de '^' com MULTILINE.
+_START_RE = re.compile(
+    rb'\n[#> \t]*(?:([A-Z]{3,10}) (?:sips?|tel):[^\s]* SIP/2\.0|SIP/2\.0 (\d{3})(?: ([^\r\n]*?))?)[ \t]*\r?$',
+    re.MULTILINE
+)
+_HEADERS_END_RE = re.compile(rb'\n[ \t]*\r?\n')
+# Candidatos pela inicial; o nome exato é conferido em _HEADER_ALIASES (IGNORECASE é lento)
+_HEADER_RE = re.compile(rb'\n[> \t]*([CcIiVvFfTtUu][A-Za-z-]*)[ \t]*:[ \t]*([^\r\n]*)')
+_TIMESTAMP_RE = re.compile(
+    rb'(\d{4})[/-](\d{2})[/-](\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,6}))?'
+)
+_HEADER_ALIASES = {
+    b'call-id': 'call_id', b'i': 'call_id',
+    b'cseq': 'cseq',
+    b'via': 'via', b'v': 'via',
+    b'from': 'from', b'f': 'from',
+    b'to': 'to', b't': 'to',
+    b'user-agent': 'user_agent',
+}
+# Caminho rápido: nomes canônicos via bytes.find; formas compactas ou com outra
+# capitalização caem na expressão regular
+_REQUIRED_HEADERS = tuple((b'\n' + name + b':', key) for name, key in (
+    (b'Call-ID', 'call_id'), (b'CSeq', 'cseq'), (b'Via', 'via'),
+))
+# From/To/User-Agent só são usados no resumo do diálogo (extraídos do INVITE)
+_INVITE_HEADERS = _REQUIRED_HEADERS + tuple((b'\n' + name + b':', key) for name, key in (
+    (b'From', 'from'), (b'To', 'to'), (b'User-Agent', 'user_agent'),
+))
+# Mensagem sem fim de cabeçalhos além deste tamanho é considerada completa
+MAX_HEADER_BYTES = 64 * 1024
+CHUNK_SIZE = 4 * 2 ** 20
+_BRANCH_RE = re.compile(rb'branch=([^;,\s]+)')
+_URI_USER_RE = re.compile(rb'sips?:([^@;>\s]+)')
+
+# Desafios de autenticação não são falhas: o INVITE é reenviado com credenciais
+AUTH_CHALLENGES = {401, 407}
+
+
+class SipMessage:
+    __slots__ = ('timestamp', 'method', 'status', 'reason', 'headers')
+
+    def __init__(self, timestamp, method=None, status=None, reason=None):
+        self.timestamp = timestamp
+        self.method = method
+        self.status = status
+        self.reason = reason
+        self.headers: Dict[str, bytes] = {}
+
+    @property
+    def call_id(self) -> Optional[str]:
+        value = self.headers.get('call_id')
+        return value.decode('utf-8', 'replace') if value else None
+
+    @property
+    def cseq_method(self) -> Optional[str]:
+        parts = self.headers.get('cseq', b'').split()
+        return parts[1].decode('ascii', 'replace') if len(parts) > 1 else None
+
+    def header(self, name: str) -> Optional[str]:
+        value = self.headers.get(name)
+        return value.decode('utf-8', 'replace') if value is not None else None
+
+    def fingerprint(self) -> tuple:
+        branch = _BRANCH_RE.search(self.headers.get('via', b''))
+        return (self.method, self.status, self.headers.get('cseq'), branch.group(1) if branch else None)
+
+
+class _TimestampParser:
+    """Converte carimbos de data/hora em epoch, reaproveitando o último segundo convertido"""
+
+    def __init__(self):
+        self._second = None
+        self._epoch = 0.0
+
+    def __call__(self, match) -> float:
+        second = match.group(1, 2, 3, 4, 5, 6)
+        if second != self._second:
+            self._second = second
+            self._epoch = datetime(*map(int, second)).timestamp()
+        fraction = match.group(7)
+        return self._epoch + int(fraction) / (10 ** len(fraction)) if fraction else self._epoch
+
+
+def _extract_headers(headers: Dict[str, bytes], buffer: bytes, begin: int, end: int, wanted) -> None:
+    find = buffer.find
+    for token, key in wanted:
+        index = find(token, begin, end)
+        if index >= 0:
+            index += len(token)
+            eol = find(b'\n', index, end)
+            headers[key] = buffer[index:eol if eol >= 0 else end].strip()
+    if 'call_id' in headers and 'cseq' in headers and 'via' in headers:
+        return
+    for name, value in _HEADER_RE.findall(buffer, begin, end):
+        key = _HEADER_ALIASES.get(name.lower())
+        if key is not None and key not in headers:
+            headers[key] = value.strip()
+
+
+def iter_messages(chunks: Iterable[bytes]) -> Iterator[SipMessage]:
+    """Extrai mensagens SIP de blocos de bytes de tamanho arbitrário.
+
+    Cada bloco é varrido com expressões regulares (linhas iniciais, fim dos
+    cabeçalhos, cabeçalhos de interesse); apenas o trecho final incompleto é
+    guardado para o bloco seguinte. O horário de cada mensagem é o último
+    carimbo de data/hora visto antes da linha inicial (ex.: "U 2024/01/31
+    10:00:00.123456 ..." do ngrep).
+    """
+    parse_timestamp = _TimestampParser()
+    timestamp = None
+    pending = b'\n'
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        buffer = pending + chunk if chunk else pending
+        pending = b''
+        pos = 0
+        start = _START_RE.search(buffer)
+        while True:
+            # Carimbos de data/hora entre a mensagem anterior e a próxima
+            gap_end = start.start() if start else len(buffer)
+            if not start and not final:
+                # Mantém o '\n' da linha incompleta: os padrões dependem dele
+                gap_end = max(buffer.rfind(b'\n', pos), pos)
+            for found in _TIMESTAMP_RE.finditer(buffer, pos, gap_end):
+                timestamp = parse_timestamp(found)
+            if not start:
+                pending = buffer[gap_end:]
+                break
+
+            following = _START_RE.search(buffer, start.end())
+            headers_end = _HEADERS_END_RE.search(buffer, start.end(),
+                                                 following.start() if following else len(buffer))
+            if headers_end:
+                end = headers_end.start()
+            elif following:
+                end = following.start()
+            elif final or len(buffer) - start.start() > MAX_HEADER_BYTES:
+                end = len(buffer)
+            else:
+                pending = buffer[start.start():]
+                break
+
+            method, status, reason = start.groups()
+            if method:
+                message = SipMessage(timestamp, method=method.decode())
+            else:
+                message = SipMessage(timestamp, status=int(status),
+                                     reason=reason.decode('utf-8', 'replace') if reason else '')
+            _extract_headers(message.headers, buffer, start.end(), end,
+                             _INVITE_HEADERS if method == b'INVITE' else _REQUIRED_HEADERS)
+            yield message
+
+            pos = end
+            start = following
+
+
+class Dialog:
+    """Estado compacto de um diálogo (Call-ID)"""
+
+    __slots__ = ('call_id', 'caller', 'callee', 'user_agent', 'first_seen', 'last_seen', 'invite_at',
+                 'ringing_at', 'final_status', 'final_reason', 'bye_answered', 'messages', 'retransmissions',
+                 'fingerprints', 'events')
+
+    def __init__(self, call_id: bytes):
+        self.call_id = call_id
+        self.caller = self.callee = self.user_agent = None
+        self.first_seen = self.last_seen = None
+        self.invite_at = self.ringing_at = None
+        self.final_status = None
+        self.final_reason = None
+        self.bye_answered = False
+        self.messages = 0
+        self.retransmissions = 0
+        self.fingerprints = set()
+        self.events: List[str] = []
+
+    @property
+    def pdd(self) -> Optional[float]:
+        """Post-dial delay: INVITE até o primeiro 180/183 (ou 200 sem ringback)"""
+        if self.invite_at is None or self.ringing_at is None:
+            return None
+        return max(0.0, self.ringing_at - self.invite_at)
+
+    @property
+    def finished(self) -> bool:
+        return self.bye_answered or (self.final_status is not None and self.final_status >= 300)
+
+
+class SipLogAnalyzer:
+    """Agrega estatísticas e guarda os diálogos anômalos mais graves"""
+
+    def __init__(self, max_open_dialogs: int = 50000, max_anomalies: int = 200,
+                 pdd_threshold: float = 5.0, retransmission_threshold: int = 2,
+                 pdd_samples: int = 10000, closed_window: int = 10000, seed: int = 0):
+        self.max_open_dialogs = max_open_dialogs
+        self.max_anomalies = max_anomalies
+        self.pdd_threshold = pdd_threshold
+        self.retransmission_threshold = retransmission_threshold
+        self.pdd_samples = pdd_samples
+        self.closed_window = closed_window
+        self._rng = random.Random(seed)
+
+        self.open: "OrderedDict[bytes, Dialog]" = OrderedDict()
+        # Call-IDs encerrados há pouco: ACK e retransmissões tardias não abrem novo diálogo
+        self.closed: "OrderedDict[bytes, None]" = OrderedDict()
+        self.messages = 0
+        self.dialogs = 0
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+        self.invite_finals: Counter = Counter()
+        self.retransmissions = 0
+        self.failed_invites = 0
+        self.unanswered_invites = 0
+        self.anomalous_dialogs = 0
+        self._pdd: List[float] = []
+        self._pdd_seen = 0
+        self._anomalies: List[tuple] = []  # heap (gravidade, ordem, resumo)
+        self._order = 0
+
+    def feed(self, message: SipMessage) -> None:
+        self.messages += 1
+        if message.method:
+            self.requests[message.method] += 1
+        else:
+            self.responses[message.status] += 1
+
+        call_id = message.headers.get('call_id')
+        if not call_id:
+            return
+
+        dialog = self.open.get(call_id)
+        if dialog is None:
+            if call_id in self.closed:
+                return
+            dialog = self.open[call_id] = Dialog(call_id)
+            self.dialogs += 1
+            if len(self.open) > self.max_open_dialogs:
+                # Diálogo aberto há mais tempo é encerrado como está
+                self._close(self.open.popitem(last=False)[1])
+        else:
+            self.open.move_to_end(call_id)
+
+        self._update(dialog, message)
+        if dialog.finished:
+            self._close(self.open.pop(call_id))
+            self.closed[call_id] = None
+            if len(self.closed) > self.closed_window:
+                self.closed.popitem(last=False)
+
+    def _update(self, dialog: Dialog, message: SipMessage) -> None:
+        dialog.messages += 1
+        ts = message.timestamp
+        if ts is not None:
+            dialog.first_seen = ts if dialog.first_seen is None else dialog.first_seen
+            dialog.last_seen = ts
+
+        fingerprint = message.fingerprint()
+        if fingerprint in dialog.fingerprints:
+            dialog.retransmissions += 1
+            self.retransmissions += 1
+            return
+        if len(dialog.fingerprints) < 64:
+            dialog.fingerprints.add(fingerprint)
+
+        if message.method:
+            if len(dialog.events) < 32:
+                dialog.events.append(message.method)
+            if message.method == 'INVITE':
+                if dialog.caller is None:
+                    dialog.caller = _uri_user(message.headers.get('from'))
+                    dialog.callee = _uri_user(message.headers.get('to'))
+                    dialog.user_agent = message.header('user_agent')
+                if dialog.invite_at is None:
+                    dialog.invite_at = ts
+            return
+
+        status = message.status
+        if len(dialog.events) < 32:
+            dialog.events.append(str(status))
+        method = message.cseq_method
+        if method == 'BYE':
+            dialog.bye_answered = status >= 200
+            return
+        if method != 'INVITE':
+            return
+        if status in (180, 183, 200) and dialog.ringing_at is None:
+            dialog.ringing_at = ts
+        if status >= 200 and status not in AUTH_CHALLENGES and dialog.final_status is None:
+            dialog.final_status = status
+            dialog.final_reason = message.reason
+
+    def _close(self, dialog: Dialog) -> None:
+        pdd = dialog.pdd
+        if pdd is not None:
+            self._sample_pdd(pdd)
+
+        reasons = []
+        severity = 0
+        if dialog.invite_at is not None or 'INVITE' in dialog.events:
+            if dialog.final_status is None:
+                self.unanswered_invites += 1
+                reasons.append('INVITE sem resposta final')
+                severity += 3
+            else:
+                self.invite_finals[dialog.final_status] += 1
+                if dialog.final_status >= 300:
+                    self.failed_invites += 1
+                    reasons.append(f'falha {dialog.final_status} {dialog.final_reason or ""}'.strip())
+                    severity += 5 if dialog.final_status >= 500 else 3
+        if dialog.retransmissions >= self.retransmission_threshold:
+            reasons.append(f'{dialog.retransmissions} retransmissões')
+            severity += min(dialog.retransmissions, 5)
+        if pdd is not None and pdd > self.pdd_threshold:
+            reasons.append(f'PDD alto ({pdd:.1f}s)')
+            severity += 2
+
+        if reasons:
+            self.anomalous_dialogs += 1
+            self._order += 1
+            entry = (severity, self._order, self._summary(dialog, reasons))
+            if len(self._anomalies) < self.max_anomalies:
+                heapq.heappush(self._anomalies, entry)
+            elif entry[:2] > self._anomalies[0][:2]:
+                heapq.heapreplace(self._anomalies, entry)
+
+    def _summary(self, dialog: Dialog, reasons: List[str]) -> Dict[str, Any]:
+        pdd = dialog.pdd
+        duration = (dialog.last_seen - dialog.first_seen) if dialog.first_seen is not None else None
+        return {
+            'call_id': dialog.call_id.decode('utf-8', 'replace'),
+            'caller': dialog.caller,
+            'callee': dialog.callee,
+            'user_agent': dialog.user_agent,
+            'flow': ' '.join(dialog.events),
+            'final_status': dialog.final_status,
+            'pdd': round(pdd, 3) if pdd is not None else None,
+            'duration': round(duration, 3) if duration is not None else None,
+            'retransmissions': dialog.retransmissions,
+            'reasons': reasons,
+        }
+
+    def _sample_pdd(self, value: float) -> None:
+        # Reservoir sampling: percentis aproximados com memória constante
+        self._pdd_seen += 1
+        if len(self._pdd) < self.pdd_samples:
+            self._pdd.append(value)
+        else:
+            index = self._rng.randrange(self._pdd_seen)
+            if index < self.pdd_samples:
+                self._pdd[index] = value
+
+    def finish(self) -> Dict[str, Any]:
+        """Encerra os diálogos ainda abertos e retorna estatísticas e anomalias"""
+        while self.open:
+            self._close(self.open.popitem(last=False)[1])
+        return {'stats': self.stats(), 'anomalies': self.anomalies()}
+
+    def anomalies(self) -> List[Dict[str, Any]]:
+        return [entry[2] for entry in sorted(self._anomalies, key=lambda e: (-e[0], e[1]))]
+
+    def stats(self) -> Dict[str, Any]:
+        pdd = sorted(self._pdd)
+
+        def percentile(q):
+            return round(pdd[min(len(pdd) - 1, int(q * len(pdd)))], 3) if pdd else None
+
+        invites = self.requests.get('INVITE', 0)
+        return {
+            'messages': self.messages,
+            'dialogs': self.dialogs,
+            'requests': dict(self.requests.most_common()),
+            'responses': {str(code): count for code, count in sorted(self.responses.items())},
+            'invite_final_responses': {str(code): count for code, count in sorted(self.invite_finals.items())},
+            'retransmissions': self.retransmissions,
+            'retransmission_rate': round(self.retransmissions / self.messages, 4) if self.messages else 0.0,
+            'invites': invites,
+            'failed_invites': self.failed_invites,
+            'unanswered_invites': self.unanswered_invites,
+            'anomalous_dialogs': self.anomalous_dialogs,
+            'pdd': {'p50': percentile(0.5), 'p95': percentile(0.95), 'max': pdd[-1] if pdd else None},
+        }
+
+
+def _uri_user(value: Optional[bytes]) -> Optional[str]:
+    if not value:
+        return None
+    found = _URI_USER_RE.search(value)
+    return found.group(1).decode('utf-8', 'replace') if found else None
+
+
+def analyze_chunks(chunks: Iterable[bytes], **options) -> Dict[str, Any]:
+    analyzer = SipLogAnalyzer(**options)
+    for message in iter_messages(chunks):
+        analyzer.feed(message)
+    return analyzer.finish()
+
+
+def _iter_mapped_chunks(mapped: mmap.mmap, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Blocos de um mmap, devolvendo ao kernel as páginas já lidas (RSS limitado)"""
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    size = max(mmap.PAGESIZE, size // mmap.PAGESIZE * mmap.PAGESIZE)
+    for offset in range(0, len(mapped), size):
+        yield mapped[offset:offset + size]
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            mapped.madvise(mmap.MADV_DONTNEED, offset, min(size, len(mapped) - offset))
+
+
+def _iter_file_chunks(fileobj, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    return iter(lambda: fileobj.read(size), b'')
+
+
+def analyze_file(fileobj, use_mmap: bool = True, **options) -> Dict[str, Any]:
+    """Analisa um arquivo binário em blocos; usa mmap quando há descritor de arquivo real"""
+    fileno = None
+    if use_mmap:
+        try:
+            fileno = fileobj.fileno()
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    fileobj.seek(0)
+    if fileno is not None and os.fstat(fileno).st_size:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+            return analyze_chunks(_iter_mapped_chunks(mapped), **options)
+    return analyze_chunks(_iter_file_chunks(fileobj), **options)
+
+
+def build_prompt(result: Dict[str, Any], limit: int = 30) -> str:
+    """Prompt compacto: estatísticas agregadas e resumos dos diálogos mais anômalos"""
+    stats = result['stats']
+    lines = [
+        "Analise as estatísticas e os diálogos SIP anômalos abaixo e forneça diagnóstico detalhado "
+        "(causas prováveis, impacto e correções).",
+        "",
+        f"Mensagens: {stats['messages']} | Diálogos: {stats['dialogs']} | INVITEs: {stats['invites']} | "
+        f"Falhas: {stats['failed_invites']} | Sem resposta: {stats['unanswered_invites']} | "
+        f"Retransmissões: {stats['retransmissions']} ({stats['retransmission_rate']:.2%})",
+        f"Respostas finais de INVITE: {stats['invite_final_responses']}",
+        f"PDD p50/p95/max (s): {stats['pdd']['p50']}/{stats['pdd']['p95']}/{stats['pdd']['max']}",
+        "",
+        f"Diálogos anômalos ({min(limit, len(result['anomalies']))} de {stats['anomalous_dialogs']}):",
+    ]
+    for item in result['anomalies'][:limit]:
+        lines.append(
+            f"- {item['call_id']} {item['caller']} -> {item['callee']} [{item['flow']}] "
+            f"{'; '.join(item['reasons'])}" + (f" UA={item['user_agent']}" if item['user_agent'] else '')
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from connectors import AIConnector, ProviderError, RetryableError, create_session
+
+
+def test_backoff_releases_the_provider_slot():
+    async def scenario():
+        connector = AIConnector('stub', api_key='k', endpoint='http://stub', max_concurrency=1,
+                                backoff_base=0.0, backoff_cap=1.0)
+        connector.bind(object())
+        calls = []
+
+        async def post(prompt, context=None):
+            calls.append(prompt)
+            if prompt == 'lenta' and calls.count('lenta') == 1:
+                raise RetryableError('HTTP 429', retry_after=0.3)
+            return prompt
+
+        connector._post = post
+        slow = asyncio.ensure_future(connector.query('lenta'))
+        await asyncio.sleep(0.05)
+        # Durante o backoff da primeira consulta a única vaga do semáforo está livre
+        fast = await asyncio.wait_for(connector.query('rápida'), 0.2)
+        return fast, await slow, calls
+
+    fast, slow, calls = asyncio.run(scenario())
+    assert (fast, slow) == ('rápida', 'lenta')
+    assert calls == ['lenta', 'rápida', 'lenta']
+
+
+async def _stream_from(lines, content_type='application/x-ndjson'):
+    """Consome AIConnector.stream contra um servidor local que devolve `lines`"""
+    async def handler(request):
+        return web.Response(body=''.join(line + '\n' for line in lines), content_type=content_type)
+
+    app = web.Application()
+    app.router.add_post('/', handler)
+    async with TestServer(app) as server:
+        connector = AIConnector('stub', api_key='k', endpoint=str(server.make_url('/')))
+        async with create_session() as session:
+            connector.bind(session)
+            return [chunk async for chunk in connector.stream('prompt')]
+
+
+def test_stream_skips_metadata_and_done_events():
+    lines = ['{"model": "stub", "created": 1}', '{"text": "olá"}', '42', '"solto"',
+             '{"text": " mundo"}', '{"done": true}']
+    assert asyncio.run(_stream_from(lines)) == ['olá', ' mundo']
+
+
+def test_stream_sse_done_marker():
+    lines = ['data: {"id": "x"}', 'data: {"text": "a"}', 'data: [DONE]']
+    assert asyncio.run(_stream_from(lines, 'text/event-stream')) == ['a']
+
+
+def test_stream_without_text_fails():
+    with pytest.raises(ProviderError):
+        asyncio.run(_stream_from(['{"model": "stub"}', '{"done": true}']))
@@ -0,0 +1,91 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from consensus import build_consensus, cluster, largest_cluster_size, similarity_matrix
+
+WORD_RE = re.compile(rb'[0-9a-z_\x80-\xff]+')
+
+
+def reference_similarity(responses):
+    """TF-IDF de palavras e bigramas em Python puro, mesma fórmula do módulo"""
+    documents = []
+    for text in responses:
+        words = WORD_RE.findall(re.sub(r'^\s*\[[^\]]*\]\s*', '', text).lower().encode('utf-8'))
+        documents.append(Counter(words + list(zip(words, words[1:]))))
+    n = len(documents)
+    frequency = Counter(term for document in documents for term in document)
+    vectors = []
+    for document in documents:
+        vector = {term: math.log1p(count) * (math.log((1 + n) / (1 + frequency[term])) + 1)
+                  for term, count in document.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        vectors.append({term: v / norm for term, v in vector.items()})
+    matrix = np.array([[sum(v * b.get(term, 0.0) for term, v in a.items()) for b in vectors] for a in vectors])
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+
+RESPONSES = [
+    '[OpenAI] A latência do tronco SIP subiu por causa da perda de pacotes no enlace.',
+    '[Claude] Perda de pacotes no enlace elevou a latência do tronco SIP.',
+    'A latência do tronco SIP subiu: há perda de pacotes no enlace principal.',
+    'Reinicie o servidor de banco de dados e limpe o cache.',
+    'Reinicie o banco de dados; depois limpe o cache do servidor.',
+]
+
+
+def test_similarity_matches_reference_tfidf():
+    matrix = similarity_matrix(RESPONSES)
+    assert np.allclose(matrix, reference_similarity(RESPONSES))
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(np.diag(matrix), 1.0)
+
+
+def test_similarity_edge_cases():
+    assert np.allclose(similarity_matrix(['mesma resposta', '[X] Mesma resposta!']), 1.0)
+    disjoint = similarity_matrix(['alfa beta', 'gama delta'])
+    assert disjoint[0, 1] == 0.0
+    # Sem nenhuma palavra: matriz identidade, nenhuma resposta concorda com outra
+    assert np.array_equal(similarity_matrix(['...', '!!!']), np.eye(2))
+    # Bigrama não atravessa respostas: "b c" só existe juntando o fim de uma ao início da outra
+    assert np.allclose(similarity_matrix(['a b', 'c d', 'b c']), reference_similarity(['a b', 'c d', 'b c']))
+
+
+def test_cluster_is_transitive_and_sorted_by_size_then_cohesion():
+    similarity = np.array([
+        [1.0, 0.5, 0.0, 0.0, 0.0],
+        [0.5, 1.0, 0.4, 0.0, 0.0],
+        [0.0, 0.4, 1.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 1.0, 0.9],
+        [0.0, 0.0, 0.0, 0.9, 1.0],
+    ])
+    # 0 e 2 não se parecem, mas entram juntos pelo 1
+    assert cluster(similarity, 0.35) == [[0, 1, 2], [3, 4]]
+    assert cluster(similarity, 0.45) == [[3, 4], [0, 1], [2]]
+    assert cluster(similarity, 0.95) == [[0], [1], [2], [3], [4]]
+
+
+def test_consensus_picks_medoid_of_largest_group():
+    result = build_consensus(RESPONSES)
+    assert result.clusters[0] == [0, 1, 2]
+    assert result.agreeing == 3
+    block = result.similarity[np.ix_([0, 1, 2], [0, 1, 2])]
+    assert result.answer_index == int(np.argmax(block.sum(axis=1)))
+    assert result.answer == RESPONSES[result.answer_index]
+    cohesion = (block.sum() - 3) / 6
+    assert result.score == round(3 / 5 * cohesion, 4)
+    assert largest_cluster_size(RESPONSES) == 3
+
+
+def test_consensus_score_counts_failed_connectors():
+    single = build_consensus(['só uma resposta'], total=4)
+    assert single.answer_index == 0 and single.score == 0.25
+    agreeing = build_consensus(RESPONSES[:3])
+    assert build_consensus(RESPONSES[:3], total=6).score == round(agreeing.score / 2, 4)
+    # total menor que o número de respostas é ignorado
+    assert build_consensus(RESPONSES[:3], total=1).score == agreeing.score
+    assert build_consensus([]) is None
+    assert largest_cluster_size([]) == 0
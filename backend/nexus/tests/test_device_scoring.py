@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from device_scoring import DeviceRiskModel, build_prompt, ewma_baseline
+
+
+def test_ewma_baseline_ignores_nan():
+    history = np.array([[10.0, 10.0, np.nan, 10.0], [np.nan, np.nan, np.nan, np.nan]])
+    mean, var, count = ewma_baseline(history, alpha=0.5)
+    assert mean[0] == 10.0 and var[0] == 0.0 and count.tolist() == [3, 0]
+    assert np.isnan(mean[1])
+
+
+def test_own_baseline_after_min_samples():
+    model = DeviceRiskModel(alpha=0.5, min_samples=3)
+    for value in (50.0, 52.0, 48.0, 50.0):
+        model.score(['a', 'b'], {'cpu': [value, value]})
+    result = model.score(['a', 'b'], {'cpu': [95.0, 50.0]}, update=False)
+    assert result.z[0, 0] > 5 and abs(result.z[1, 0]) < 1
+    assert result.top.tolist()[0] == 0
+
+
+def test_direction_filters_z():
+    model = DeviceRiskModel(min_samples=100)
+    # Sem histórico: z robusto contra a frota; sinal baixo é ruim, alto é ignorado
+    result = model.score(['a', 'b', 'c', 'd'], {'signal': [-60.0, -61.0, -90.0, -30.0]}, update=False)
+    assert result.z[2, 0] < 0 and result.z[3, 0] == 0
+
+
+def test_top_n_is_clamped():
+    model = DeviceRiskModel(max_top_n=2)
+    result = model.score([str(i) for i in range(5)], {'cpu': [10.0, 11.0, 12.0, 13.0, 16.0]}, top_n=1000)
+    assert result.top.tolist() == [4, 3]
+    assert model.score(['x'], {'cpu': [1.0]}, top_n=-3).top.tolist() == []
+
+
+def test_tracked_devices_are_capped_with_lru_eviction():
+    model = DeviceRiskModel(capacity=2, max_devices=3, min_samples=1)
+    model.score(['a', 'b', 'c'], {'cpu': [10.0, 20.0, 30.0]})
+    model.score(['a'], {'cpu': [10.0]})  # 'a' volta a ser o mais recente
+    model.score(['d', 'e'], {'cpu': [40.0, 50.0]})
+    assert len(model) == 3 and set(model._index) == {'a', 'd', 'e'}
+    assert model.stats()['evicted'] == 2
+    # 'a' manteve a sua linha de base
+    assert model.score(['a'], {'cpu': [10.0]}, update=False).baseline[0, 0] == 10.0
+    # 'b' volta numa linha reaproveitada (de 'd' ou 'e', os menos recentes), sem linha de base
+    result = model.score(['b'], {'cpu': [99.0]}, update=False)
+    assert np.isnan(result.baseline[0, 0]) and len(model) == 3 and 'a' in model._index
+
+
+def test_batch_larger_than_cap_is_rejected_without_changes():
+    model = DeviceRiskModel(max_devices=2)
+    model.score(['a'], {'cpu': [1.0]})
+    with pytest.raises(ValueError):
+        model.score(['x', 'y', 'z'], {'cpu': [1.0, 2.0, 3.0]})
+    assert set(model._index) == {'a'}
+
+
+def test_invalid_batch_does_not_create_rows():
+    model = DeviceRiskModel()
+    with pytest.raises(ValueError):
+        model.score(['a', 'b'], {'cpu': [1.0]})
+    assert len(model) == 0
+
+
+def test_build_prompt_lists_top_devices():
+    model = DeviceRiskModel()
+    result = model.score(['a', 'b', 'c'], {'cpu': [1.0, 1.0, 90.0]}, top_n=1)
+    prompt = build_prompt(result)
+    assert 'Entre 3 dispositivos, os 1 abaixo' in prompt and '- c: score' in prompt
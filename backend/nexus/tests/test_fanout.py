@@ -0,0 +1,30 @@
+import asyncio
+
+from fanout import FanOutPolicy, fan_out
+
+
+class GatedConnector:
+    """Conector que só responde quando o evento compartilhado é disparado"""
+
+    def __init__(self, gate, text):
+        self.gate = gate
+        self.text = text
+
+    async def query(self, prompt, context=None):
+        await self.gate.wait()
+        return self.text
+
+
+def test_primary_and_hedge_finishing_together():
+    async def scenario():
+        gate = asyncio.Event()
+        connectors = {'a': GatedConnector(gate, 'resposta a'), 'b': GatedConnector(gate, 'resposta b')}
+        policy = FanOutPolicy(hedge=True, max_primaries=1)
+        # O hedge (b) sai em 0,05s; os dois terminam no mesmo despertar do asyncio.wait
+        asyncio.get_running_loop().call_later(0.15, gate.set)
+        return await fan_out(connectors, 'prompt', policy=policy, default_hedge_delay=0.05)
+
+    result = asyncio.run(scenario())
+    assert result.hedged == {'a': 'b'}
+    assert len(result.responses) == 1
+    assert set(result.responses) | set(result.cancelled) == {'a', 'b'}
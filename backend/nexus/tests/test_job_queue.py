@@ -0,0 +1,126 @@
+import asyncio
+import sqlite3
+import time
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def make_queue(tmp_path, **options):
+    return JobQueue(str(tmp_path / 'jobs.db'), **options)
+
+
+def insert(queue, job_id, priority=1, created_at=None):
+    queue._insert({'id': job_id, 'kind': 'echo', 'mode': 'general', 'priority': priority, 'status': QUEUED,
+                   'payload': '{}', 'created_at': created_at or time.time()})
+
+
+def test_claim_by_priority_then_fifo(tmp_path):
+    queue = make_queue(tmp_path)
+    insert(queue, 'late', priority=1, created_at=2)
+    insert(queue, 'early', priority=1, created_at=1)
+    insert(queue, 'urgent', priority=0, created_at=3)
+    assert [queue._claim()['id'] for _ in range(3)] == ['urgent', 'early', 'late']
+    assert queue._claim() is None
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue = make_queue(tmp_path, timeout=60)
+    insert(queue, 'a')
+    assert queue._claim()['attempts'] == 1
+    assert queue._claim() is None  # concessão ainda válida
+    queue._connect().execute('UPDATE jobs SET lease_until = ? WHERE id = ?', (time.time() - 1, 'a'))
+    job = queue._claim()
+    assert (job['id'], job['attempts']) == ('a', 2)
+
+
+def test_requeue_waits_for_backoff(tmp_path):
+    queue = make_queue(tmp_path)
+    insert(queue, 'a')
+    queue._claim()
+    queue._requeue('a', 'falhou', True, 60)
+    row = queue._get('a', False)
+    assert (row['status'], row['attempts'], row['error']) == (QUEUED, 1, 'falhou')
+    assert queue._claim() is None
+    queue._connect().execute('UPDATE jobs SET run_after = ? WHERE id = ?', (time.time() - 1, 'a'))
+    assert queue._claim()['attempts'] == 2
+
+
+def test_requeue_on_shutdown_keeps_attempts_and_no_delay(tmp_path):
+    queue = make_queue(tmp_path)
+    insert(queue, 'a')
+    queue._claim()
+    queue._requeue('a', None, False)
+    assert queue._claim()['attempts'] == 1
+
+
+def test_retry_delay_grows_and_is_capped(tmp_path):
+    queue = make_queue(tmp_path, retry_backoff=2, retry_backoff_cap=10)
+    assert 1 <= queue._retry_delay(1) <= 2
+    assert 4 <= queue._retry_delay(3) <= 8
+    assert 5 <= queue._retry_delay(10) <= 10
+
+
+def test_failing_job_backs_off_then_exhausts_attempts(tmp_path):
+    async def scenario():
+        queue = JobQueue(str(tmp_path / 'jobs.db'), workers=1, max_attempts=2, poll_interval=0.01,
+                         retry_backoff=0.2, retry_backoff_cap=0.2)
+        calls = []
+
+        async def failing(payload):
+            calls.append(time.monotonic())
+            raise RuntimeError('provedor indisponível')
+
+        queue.register('fail', failing)
+        await queue.start()
+        try:
+            job = await queue.submit('fail', {})
+            for _ in range(200):
+                status = (await queue.get(job['id']))['status']
+                if status == FAILED:
+                    break
+                await asyncio.sleep(0.01)
+            return calls, await queue.get(job['id']), queue.stats
+        finally:
+            await queue.stop()
+
+    calls, job, stats = asyncio.run(scenario())
+    assert (job['status'], job['attempts'], job['error']) == (FAILED, 2, 'provedor indisponível')
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.1  # backoff com jitter: 0,1 a 0,2 s
+    assert (stats['retried'], stats['failed']) == (1, 1)
+
+
+def test_successful_job(tmp_path):
+    async def scenario():
+        queue = JobQueue(str(tmp_path / 'jobs.db'), workers=1, poll_interval=0.01)
+
+        async def echo(payload):
+            return payload
+
+        queue.register('echo', echo)
+        await queue.start()
+        try:
+            job = await queue.submit('echo', {'x': 1})
+            for _ in range(200):
+                if (await queue.get(job['id']))['status'] == DONE:
+                    break
+                await asyncio.sleep(0.01)
+            return await queue.get(job['id'], with_result=True)
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(scenario())
+    assert (job['status'], job['result']) == (DONE, {'x': 1})
+
+
+def test_old_database_gets_run_after_column(tmp_path):
+    path = tmp_path / 'jobs.db'
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, mode TEXT NOT NULL, '
+               'priority INTEGER NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT, '
+               'attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, '
+               'finished_at REAL, lease_until REAL)')
+    db.close()
+    queue = JobQueue(str(path))
+    insert(queue, 'a')
+    assert queue._claim()['id'] == 'a'
+    assert queue._get('a', False)['status'] == RUNNING
@@ -0,0 +1,188 @@
+import itertools
+import math
+
+import pytest
+
+import routing
+from routing import CLOSED, HALF_OPEN, OPEN, AdaptiveRouter, ConnectorHealth, RoutingTarget, at_least
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(routing.time, 'monotonic', clock)
+    return clock
+
+
+def make_router(**options):
+    options.setdefault('explore', 0.0)
+    return AdaptiveRouter(**options)
+
+
+def train(router, name, latency, ok=True, times=5):
+    for _ in range(times):
+        router.record(name, latency if ok else None, ok)
+
+
+def test_health_ewma():
+    health = ConnectorHealth(alpha=0.5)
+    health.record(1.0, True)
+    assert (health.latency, health.deviation, health.error_rate) == (1.0, 0.0, 0.0)
+    health.record(3.0, True)
+    assert (health.latency, health.deviation) == (2.0, 1.0)
+    health.record(None, False)
+    assert health.latency == 2.0 and health.error_rate == 0.5 and health.consecutive_failures == 1
+    health.record(2.0, True)
+    assert health.consecutive_failures == 0 and health.samples == 4
+    assert 0 < health.success_probability(2.0) < health.success_probability(10.0) <= 1 - health.error_rate
+
+
+def test_at_least_matches_enumeration():
+    probabilities = [0.9, 0.5, 0.75, 0.2]
+    for k in range(6):
+        expected = sum(
+            math.prod(p if hit else 1 - p for p, hit in zip(probabilities, outcome))
+            for outcome in itertools.product([True, False], repeat=len(probabilities)) if sum(outcome) >= k)
+        assert at_least(probabilities, k) == pytest.approx(expected)
+    assert at_least([], 0) == 1.0
+
+
+def test_select_learns_then_picks_smallest_sufficient_subset(clock):
+    router = make_router(costs={'cheap': 0.1, 'pricey': 1.0, 'slow': 0.0})
+    target = RoutingTarget(min_providers=1, latency_target=2.0, quality=0.9)
+    # Sem amostras suficientes todos entram (aprendizado)
+    assert router.select(['cheap', 'pricey', 'slow'], target)[0] == ['cheap', 'pricey', 'slow']
+    train(router, 'cheap', 0.5)
+    train(router, 'pricey', 0.5)
+    train(router, 'slow', 8.0)
+    chosen, spares = router.select(['cheap', 'pricey', 'slow'], target)
+    # Mesma probabilidade: o mais barato vence; o lento fica como última reserva
+    assert chosen == ['cheap'] and spares == ['pricey', 'slow']
+    chosen, _ = router.select(['cheap', 'pricey', 'slow'], RoutingTarget(2, 2.0, 0.9))
+    assert chosen == ['cheap', 'pricey']
+    assert router.health['slow'].skipped == 2 and router.health['cheap'].selected == 3
+
+
+def test_unreachable_target_uses_every_healthy_connector(clock):
+    router = make_router()
+    for name in 'abc':
+        train(router, name, 5.0)
+    chosen, spares = router.select(list('abc'), RoutingTarget(min_providers=2, latency_target=1.0, quality=0.99))
+    assert sorted(chosen) == list('abc') and spares == []
+
+
+def test_disabled_router_selects_all(clock):
+    router = make_router(enabled=False)
+    train(router, 'a', 0.1)
+    train(router, 'b', 9.0)
+    assert router.select(['a', 'b'], RoutingTarget(1, 1.0, 0.5)) == (['a', 'b'], [])
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    router = make_router(failures=3, min_samples=50)
+    target = RoutingTarget(min_providers=1)
+    train(router, 'a', None, ok=False, times=2)
+    assert router.health['a'].state == CLOSED
+    router.record('a', None, False)
+    assert router.health['a'].state == OPEN and router.health['a'].cooldown == 30.0
+    assert router.select(['a', 'b'], target)[0] == ['b']
+
+
+def test_breaker_opens_on_error_rate(clock):
+    router = make_router(failures=100, min_samples=4, max_error_rate=0.3)
+    for ok in (True, False, True, False, True, False):
+        router.record('a', 0.1 if ok else None, ok)
+    assert router.health['a'].state == OPEN
+
+
+def test_half_open_allows_one_probe_and_closes_on_success(clock):
+    router = make_router(failures=1, cooldown=10)
+    target = RoutingTarget(min_providers=1)
+    train(router, 'b', 0.1)
+    router.record('a', None, False)
+    clock.now += 9.9
+    assert 'a' not in router.select(['a', 'b'], target)[0]
+    clock.now += 0.1
+    assert 'a' in router.select(['a', 'b'], target)[0]
+    assert router.health['a'].state == HALF_OPEN
+    # A consulta de teste está em andamento: outra orquestração não o usa
+    assert 'a' not in router.select(['a', 'b'], target)[0]
+    router.record('a', 0.2, True)
+    assert router.health['a'].state == CLOSED and router.health['a'].cooldown == 0.0
+    assert 'a' in router.select(['a', 'b'], target)[0]
+
+
+def test_failed_probe_reopens_with_doubled_cooldown(clock):
+    router = make_router(failures=1, cooldown=10, max_cooldown=25)
+    target = RoutingTarget(min_providers=1)
+    train(router, 'b', 0.1)
+    router.record('a', None, False)
+    cooldowns = []
+    for _ in range(3):
+        clock.now += router.health['a'].cooldown
+        assert 'a' in router.select(['a', 'b'], target)[0]
+        router.record('a', None, False)
+        assert router.health['a'].state == OPEN
+        cooldowns.append(router.health['a'].cooldown)
+    assert cooldowns == [20, 25, 25]
+    # Depois de fechar, a próxima abertura volta ao cooldown base
+    clock.now += 25
+    router.select(['a', 'b'], target)
+    router.record('a', 0.1, True)
+    router.record('a', None, False)
+    assert router.health['a'].cooldown == 10
+
+
+def test_released_or_stale_probe_frees_the_slot(clock):
+    router = make_router(failures=1, cooldown=10)
+    target = RoutingTarget(min_providers=1)
+    train(router, 'b', 0.1)
+    router.record('a', None, False)
+    clock.now += 10
+    assert 'a' in router.select(['a', 'b'], target)[0]
+    router.release('a')
+    assert 'a' in router.select(['a', 'b'], target)[0]
+    # Consulta de teste sem resultado expira após o cooldown
+    clock.now += 9
+    assert 'a' not in router.select(['a', 'b'], target)[0]
+    clock.now += 1
+    assert 'a' in router.select(['a', 'b'], target)[0]
+
+
+def test_all_open_fails_open(clock):
+    router = make_router(failures=1)
+    for name in 'ab':
+        router.record(name, None, False)
+    chosen, _ = router.select(['a', 'b'], RoutingTarget(min_providers=1))
+    assert sorted(chosen) == ['a', 'b']
+
+
+def test_explore_adds_a_spare(clock, monkeypatch):
+    router = make_router(explore=1.0)
+    for name in 'abc':
+        train(router, name, 0.1)
+    monkeypatch.setattr(routing.random, 'randrange', lambda n: n - 1)
+    chosen, spares = router.select(list('abc'), RoutingTarget(1, 5.0, 0.5))
+    assert len(chosen) == 2 and len(spares) == 1 and set(chosen + spares) == set('abc')
+
+
+def test_targets_and_stats_from_env(monkeypatch):
+    monkeypatch.setenv('NEXUS_ROUTING_MIN_PROVIDERS', '3')
+    monkeypatch.setenv('NEXUS_ROUTING_DEVELOPMENT_LATENCY_TARGET', '45')
+    monkeypatch.setenv('NEXUS_GPT_COST', '0.5')
+    router = AdaptiveRouter.from_env()
+    assert vars(router.target('development')) == {'min_providers': 3, 'latency_target': 45.0, 'quality': 0.95}
+    assert router.target('general').latency_target == 10.0
+    router.record('gpt', 0.25, True, tokens=2000)
+    stats = router.stats()
+    assert stats['mode'] == 'adaptive' and set(stats['targets']) == {'development', 'general'}
+    assert stats['connectors']['gpt']['latency_ms'] == 250.0
+    assert stats['connectors']['gpt']['estimated_spend'] == 1.0
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+from benchmarks.sip_analyzer import write_log
+from sip_analyzer import analyze_chunks, analyze_file, build_prompt
+
+
+@pytest.fixture(scope='module')
+def log_bytes(tmp_path_factory):
+    path = tmp_path_factory.mktemp('sip') / 'sip.log'
+    write_log(str(path), 40, seed=7)
+    return path.read_bytes()
+
+
+def _chunks(data, size):
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, 333, 4096])
+def test_same_result_for_any_chunk_size(log_bytes, size):
+    expected = analyze_chunks([log_bytes])
+    assert expected['stats']['messages'] > 0
+    assert analyze_chunks(_chunks(log_bytes, size)) == expected
+
+
+def test_file_with_and_without_mmap(log_bytes, tmp_path):
+    path = tmp_path / 'sip.log'
+    path.write_bytes(log_bytes)
+    with open(path, 'rb') as f:
+        mapped = analyze_file(f)
+    assert analyze_file(io.BytesIO(log_bytes)) == mapped == analyze_chunks([log_bytes])
+
+
+def test_anomaly_limit_and_prompt(log_bytes):
+    result = analyze_chunks([log_bytes], max_anomalies=2)
+    assert 0 < len(result['anomalies']) <= 2
+    assert build_prompt(result, limit=1).count('\n- ') <= 1
@@ -0,0 +1,214 @@
+"""Métricas no formato texto do Prometheus e profiler por amostragem, comuns ao
+Guardian e ao Nexus.
+
+Cada serviço mantém em instrumentation.py só o que lhe é próprio: o conjunto de
+métricas, a forma de achar o frame da requisição (greenlet ou task asyncio) e os
+ganchos (Flask ou middleware ASGI).
+"""
+import os
+import sys
+import threading
+from bisect import bisect_left
+from collections import Counter as StackCounter, deque
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _original(module):
+    """Módulo sem o monkey patch do eventlet: o amostrador precisa de uma thread real.
+
+    O eventlet só é consultado se já foi importado (worker do gunicorn): importá-lo
+    aqui custaria ~0,5s na inicialização dos scripts e do servidor de desenvolvimento.
+    """
+    if 'eventlet' not in sys.modules:
+        return __import__(module)
+    from eventlet import patcher
+    return patcher.original(module) if patcher.is_monkey_patched('thread') else __import__(module)
+
+
+_threading = _original('threading')
+_time = _original('time')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total!r}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines += [f'{self.name}{_labels(self.labelnames, labels)} {value!r}' for labels, value in items]
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+
+class SamplingProfiler:
+    """Amostra as pilhas das requisições em andamento; guarda as das lentas.
+
+    `begin` recebe uma função frames -> frame (sobe por f_back) ou lista de
+    frames da externa para a interna (cadeia de await de uma task).
+    """
+
+    def __init__(self, slow_threshold, interval=0.005, keep=100, max_depth=64):
+        self.slow_threshold = slow_threshold
+        self.interval = interval
+        self.max_depth = max_depth
+        self._active = {}
+        self._slow = deque(maxlen=keep)
+        self._lock = _threading.Lock()
+        self._thread = None
+        self.samples = 0
+
+    def begin(self, frame_getter):
+        token = object()
+        with self._lock:
+            self._active[token] = (frame_getter, StackCounter())
+            if self._thread is None:
+                self._thread = _threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        return token
+
+    def end(self, token, label, duration):
+        with self._lock:
+            _, stacks = self._active.pop(token, (None, None))
+            if stacks and self.slow_threshold and duration >= self.slow_threshold:
+                self._slow.append((label, duration, stacks))
+
+    def _run(self):
+        while True:
+            _time.sleep(self.interval)
+            with self._lock:
+                targets = list(self._active.values())
+            if not targets:
+                continue
+            frames = sys._current_frames()
+            for frame_getter, stacks in targets:
+                frame = frame_getter(frames)
+                if frame is not None:
+                    stacks[self._stack(frame)] += 1
+                    self.samples += 1
+
+    def _stack(self, frame):
+        if isinstance(frame, list):
+            frames = frame[-self.max_depth:]
+        else:
+            frames = []
+            while frame is not None and len(frames) < self.max_depth:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+        names = []
+        for item in frames:
+            code = item.f_code
+            path = code.co_filename.replace('\\', '/').rsplit('/', 2)
+            names.append(f"{code.co_name} ({'/'.join(path[-2:])}:{item.f_lineno})")
+        return ';'.join(names)
+
+    def slow_requests(self):
+        with self._lock:
+            return [{'route': label, 'duration': round(duration, 4), 'samples': sum(stacks.values())}
+                    for label, duration, stacks in self._slow]
+
+    def collapsed(self):
+        """Pilhas agregadas no formato "rota;frame;...;frame contagem" """
+        total = StackCounter()
+        with self._lock:
+            for label, _, stacks in self._slow:
+                for stack, count in stacks.items():
+                    total[f'{label};{stack}'] += count
+        return '\n'.join(f'{stack} {count}' for stack, count in total.most_common()) + '\n'
+
+
+class BaseInstrumentation:
+    """Registro de métricas e profiler de um serviço; as subclasses criam as métricas"""
+
+    def __init__(self, prefix, slow_threshold=0.0, interval=0.005):
+        self.prefix = prefix
+        self.metrics = []
+        self.interval = interval
+        self.profiler = SamplingProfiler(slow_threshold, interval) if slow_threshold else None
+
+    @classmethod
+    def from_env(cls, prefix):
+        """None se {PREFIX}_METRICS não estiver ativo"""
+        env = prefix.upper()
+        if os.environ.get(f'{env}_METRICS', '').strip().lower() not in ('1', 'true', 'yes', 'on'):
+            return None
+        return cls(prefix, float(os.environ.get(f'{env}_PROFILE_SLOW_MS', '0')) / 1000,
+                   float(os.environ.get(f'{env}_PROFILE_INTERVAL_MS', '5')) / 1000)
+
+    def set_profiler(self, slow_threshold):
+        """Liga/desliga o profiler em tempo de execução (0 desliga)"""
+        if not slow_threshold:
+            self.profiler = None
+        elif self.profiler is None:
+            self.profiler = SamplingProfiler(slow_threshold, self.interval)
+        else:
+            self.profiler.slow_threshold = slow_threshold
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
@@ -0,0 +1,63 @@
+from metrics_core import BaseInstrumentation, Counter, Gauge, Histogram, SamplingProfiler
+
+
+def test_histogram_buckets_are_cumulative_with_inf():
+    histogram = Histogram('req_seconds', 'Duração', ('route',), buckets=(0.5, 0.1, 1.0))
+    for value in (0.05, 0.1, 0.3, 0.7, 5.0):
+        histogram.observe(value, '/a')
+    lines = histogram.render()
+    assert lines[:2] == ['# HELP req_seconds Duração', '# TYPE req_seconds histogram']
+    assert lines[2:] == [
+        'req_seconds_bucket{route="/a",le="0.1"} 2',
+        'req_seconds_bucket{route="/a",le="0.5"} 3',
+        'req_seconds_bucket{route="/a",le="1.0"} 4',
+        'req_seconds_bucket{route="/a",le="+Inf"} 5',
+        'req_seconds_sum{route="/a"} 6.15',
+        'req_seconds_count{route="/a"} 5',
+    ]
+
+
+def test_histogram_series_sorted_by_labels():
+    histogram = Histogram('h', 'doc', ('route',), buckets=(1.0,))
+    histogram.observe(0.5, '/b')
+    histogram.observe(0.5, '/a')
+    buckets = [line for line in histogram.render() if '_bucket' in line]
+    assert buckets[0].startswith('h_bucket{route="/a"') and buckets[-1].startswith('h_bucket{route="/b"')
+
+
+def test_label_values_are_escaped():
+    counter = Counter('c_total', 'doc', ('path',))
+    counter.inc(2, 'a"b\\c\nd')
+    assert counter.render()[-1] == 'c_total{path="a\\"b\\\\c\\nd"} 2'
+
+
+def test_counter_without_labels_and_gauge_type():
+    gauge = Gauge('in_flight', 'doc')
+    gauge.inc(1)
+    gauge.inc(-1)
+    gauge.inc(1)
+    assert gauge.render() == ['# HELP in_flight doc', '# TYPE in_flight gauge', 'in_flight 1']
+
+
+def test_base_instrumentation_render_and_profiler_toggle(monkeypatch):
+    monkeypatch.setenv('SVC_METRICS', '1')
+    monkeypatch.setenv('SVC_PROFILE_SLOW_MS', '250')
+    instrumentation = BaseInstrumentation.from_env('svc')
+    assert instrumentation.profiler.slow_threshold == 0.25
+    instrumentation.add(Counter('svc_total', 'doc')).inc()
+    assert instrumentation.render().endswith('svc_total 1\n')
+    instrumentation.set_profiler(0)
+    assert instrumentation.profiler is None
+    monkeypatch.setenv('SVC_METRICS', '0')
+    assert BaseInstrumentation.from_env('svc') is None
+
+
+def test_profiler_collapsed_keeps_only_slow_requests():
+    profiler = SamplingProfiler(slow_threshold=0.1)
+    fast, slow = object(), object()
+    profiler._active[fast] = (None, {'main (a/b.py:1)': 3})
+    profiler._active[slow] = (None, {'main (a/b.py:1);work (a/c.py:9)': 4})
+    profiler.end(fast, 'GET /fast', 0.01)
+    profiler.end(slow, 'GET /slow', 0.5)
+    assert profiler.collapsed() == 'GET /slow;main (a/b.py:1);work (a/c.py:9) 4\n'
+    assert profiler.slow_requests() == [{'route': 'GET /slow', 'duration': 0.5, 'samples': 4}]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Tempo de importação dos módulos de entrada do Guardian e do Nexus (python -X importtime).
+
+Cada módulo é importado em um processo novo --repeat vezes. O script mostra a
+mediana do tempo cumulativo e os pacotes mais caros da melhor execução, e
+termina com código 1 se algum módulo passar do orçamento (ms). Orçamentos
+padrão abaixo; sobrescreva com --budget guardian:app=900 (repetível).
+
+Uso:
+    python scripts/import_time.py [--repeat 5] [--top 15] [--only guardian]
+    python scripts/import_time.py --budget nexus:main=800 --json bench/import.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (diretório, {módulo: orçamento em ms}): ~20% acima do medido em 1 vCPU (app 1,2s, models 0,5s, main 0,9s)
+TARGETS = {
+    'guardian': ('backend/guardian', {'app': 1500, 'models': 650}),
+    'nexus': ('backend/nexus', {'main': 1100}),
+}
+
+
+def measure(directory, module):
+    """[(self_us, cumulative_us, depth, nome)] de uma importação em processo novo"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=os.path.join(ROOT, directory), capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else module)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2, name.strip()))
+    return rows
+
+
+def total_ms(rows, module):
+    return next(cumulative for _, cumulative, depth, name in reversed(rows)
+                if depth == 0 and name == module) / 1000
+
+
+def report(service, module, runs, budget, top):
+    totals = [total_ms(rows, module) for rows in runs]
+    best = runs[totals.index(min(totals))]
+    median = statistics.median(totals)
+    status = 'ok' if median <= budget else 'ACIMA DO ORÇAMENTO'
+    print(f'\n{service}:{module}  mediana {median:.0f} ms (mín {min(totals):.0f}, máx {max(totals):.0f}) '
+          f'orçamento {budget} ms  {status}')
+    # Pacotes de primeiro nível da execução mais rápida, pelo custo cumulativo
+    direct = sorted((row for row in best if row[2] == 1), key=lambda row: -row[1])[:top]
+    for _, cumulative, _, name in direct:
+        print(f'  {cumulative / 1000:8.1f} ms  {name}')
+    return {'median_ms': round(median, 1), 'min_ms': round(min(totals), 1), 'max_ms': round(max(totals), 1),
+            'budget_ms': budget, 'top': {name: round(cumulative / 1000, 1) for _, cumulative, _, name in direct}}
+
+
+def _budgets(overrides):
+    budgets = {service: dict(modules) for service, (_, modules) in TARGETS.items()}
+    for item in overrides or []:
+        try:
+            target, value = item.split('=')
+            service, module = target.split(':')
+            budgets[service][module] = float(value)
+        except (KeyError, ValueError):
+            raise SystemExit(f'--budget inválido: {item} (formato serviço:módulo=ms)')
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Pacotes listados por módulo')
+    parser.add_argument('--only', action='append', choices=sorted(TARGETS))
+    parser.add_argument('--budget', action='append', metavar='SERVIÇO:MÓDULO=MS')
+    parser.add_argument('--json', help='Grava o resultado neste arquivo')
+    args = parser.parse_args()
+
+    budgets = _budgets(args.budget)
+    results, over = {}, []
+    for service, (directory, _) in TARGETS.items():
+        if args.only and service not in args.only:
+            continue
+        for module, budget in budgets[service].items():
+            runs = [measure(directory, module) for _ in range(args.repeat)]
+            result = results[f'{service}:{module}'] = report(service, module, runs, budget, args.top)
+            if result['median_ms'] > budget:
+                over.append(f'{service}:{module} {result["median_ms"]:.0f} ms > {budget} ms')
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if over:
+        print('\nAcima do orçamento:\n  ' + '\n  '.join(over))
+        sys.exit(1)
+    print('\nTodos os módulos dentro do orçamento')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Suíte de benchmarks do Guardian e do Nexus com resultado em JSON comparável entre execuções.
+
+Roda o teste de carga do Guardian (dataset sintético: usuários, 1M números,
+100k dispositivos, blocos IP; rotas de listagem e login) e o fan-out de
+/orchestrate do Nexus contra provedores simulados. Cada rota gera req/s,
+p50/p95/p99 e o pico de RSS do servidor.
+
+Uso:
+    python scripts/run_benchmarks.py --output bench/atual.json [--quick]
+    python scripts/run_benchmarks.py --output bench/novo.json --compare bench/atual.json --threshold 10
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = {
+    'full': {
+        'guardian': ['--users', '1000', '--phones', '1000000', '--devices', '100000', '--ip-blocks', '10000',
+                     '--duration', '30', '--concurrency', '50', '--logins', '50'],
+        'nexus': ['--duration', '30', '--concurrency', '50', '--latency', '0.2', '--jitter', '0.05',
+                  '--provider-concurrency', '64'],
+    },
+    'quick': {
+        'guardian': ['--users', '50', '--phones', '50000', '--devices', '10000', '--ip-blocks', '1000',
+                     '--duration', '5', '--concurrency', '20', '--logins', '10'],
+        'nexus': ['--duration', '5', '--concurrency', '20', '--latency', '0.05', '--jitter', '0.01',
+                  '--provider-concurrency', '64'],
+    },
+}
+BENCHMARKS = {
+    'guardian': ('backend/guardian', 'benchmarks.load_test'),
+    'nexus': ('backend/nexus', 'benchmarks.orchestrate_load'),
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(profile, only=None, extra=None):
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'profile': profile,
+        'python': platform.python_version(),
+        'machine': {'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'benchmarks': {},
+    }
+    for name, (directory, module) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            output = tmp.name
+        command = [sys.executable, '-m', module, '--json', output, *PROFILES[profile][name], *(extra or {}).get(name, [])]
+        print(f"== {name}: {' '.join(command[1:])}", flush=True)
+        started = time.perf_counter()
+        completed = subprocess.run(command, cwd=os.path.join(ROOT, directory))
+        if completed.returncode != 0:
+            results['benchmarks'][name] = {'error': f'saída {completed.returncode}'}
+        else:
+            with open(output) as f:
+                results['benchmarks'][name] = json.load(f)
+            results['benchmarks'][name]['wall_seconds'] = round(time.perf_counter() - started, 1)
+        os.remove(output)
+    return results
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(baseline, current, threshold):
+    """Imprime as diferenças por rota; retorna as regressões acima de `threshold` %"""
+    regressions = []
+    print(f"\nComparação com {baseline.get('commit')} ({baseline.get('timestamp')}), limite {threshold}%")
+    print(f"{'benchmark / rota':<64} {'req/s':>18} {'p99 ms':>22}")
+    for name, bench in current['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base or 'routes' not in base or 'routes' not in bench:
+            continue
+        for route, row in bench['routes'].items():
+            old = base['routes'].get(route)
+            if old is None:
+                continue
+            rps, p99 = _change(old['rps'], row['rps']), _change(old['p99_ms'], row['p99_ms'])
+            label = f'{name} {route}'
+            print(f"{label:<64} {old['rps']:>7} → {row['rps']:<7} {rps if rps is None else f'{rps:+.0f}%':>4} "
+                  f"{old['p99_ms']!s:>8} → {row['p99_ms']!s:<8} {p99 if p99 is None else f'{p99:+.0f}%':>4}")
+            if rps is not None and rps < -threshold:
+                regressions.append(f'{label}: req/s {rps:+.1f}%')
+            if p99 is not None and p99 > threshold:
+                regressions.append(f'{label}: p99 {p99:+.1f}%')
+        old_rss, new_rss = base.get('peak_rss_mb'), bench.get('peak_rss_mb')
+        rss = _change(old_rss, new_rss)
+        print(f"{name + ' pico de RSS (MB)':<64} {old_rss!s:>7} → {new_rss!s:<7} {rss if rss is None else f'{rss:+.0f}%':>4}")
+        if rss is not None and rss > threshold:
+            regressions.append(f'{name}: pico de RSS {rss:+.1f}%')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--quick', action='store_true', help='Dataset e duração reduzidos')
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS))
+    parser.add_argument('--compare', metavar='BASE.json', help='Resultado anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Variação (%%) considerada regressão')
+    args = parser.parse_args()
+
+    results = run_suite('quick' if args.quick else 'full', args.only)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados em {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print('\nRegressões:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print('\nSem regressões acima do limite')
+
+
+if __name__ == '__main__':
+    main()